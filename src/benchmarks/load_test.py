@@ -0,0 +1,156 @@
+"""
+End-to-end load test of `generate` with local backends and stub models, fully offline.
+
+The bucket is a local directory, projects live in memory and the translator echoes the text back.
+N jobs run with C of them at a time, the report has throughput, job latency percentiles
+and the time every pipeline stage took.
+
+Run from the src dir:
+    python3 -m benchmarks.load_test --jobs 20 --concurrency 4 --length 60 --speakers 2
+"""
+import argparse
+import json
+import os
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+DEFAULT_MEDIA_DIR = "tmp/benchmarks"
+LOAD_TEST_BLOB_DIR = "load-test"
+
+
+def set_load_test_environment():
+    # Backends are read from env on import of the configs, so this runs before any pipeline import
+    os.environ["STORAGE_BACKEND"] = "local"
+    os.environ["PROJECT_STORE_BACKEND"] = "memory"
+    os.environ["TRANSLATOR_BACKEND"] = "echo"
+    # Errors are raised without reporting them to Sentry
+    os.environ.setdefault("ENVIRONMENT", "development")
+
+
+def get_percentile(values: List[float], percent: float) -> float:
+    """Nearest-rank percentile."""
+    ordered_values = sorted(values)
+    rank = max(0, min(len(ordered_values) - 1, round(percent / 100 * len(ordered_values)) - 1))
+    return ordered_values[rank]
+
+
+def get_stage_durations() -> dict:
+    """Total and mean seconds per stage, from the stage duration histogram of this process."""
+    from prometheus_client import REGISTRY
+
+    sums, counts = {}, {}
+    for metric in REGISTRY.collect():
+        if metric.name != "dub_stage_duration_seconds":
+            continue
+        for sample in metric.samples:
+            stage = sample.labels.get("stage")
+            if sample.name.endswith("_sum"):
+                sums[stage] = sample.value
+            elif sample.name.endswith("_count"):
+                counts[stage] = sample.value
+
+    return {
+        stage: {"total": sums[stage], "mean": sums[stage] / counts[stage] if counts.get(stage) else 0.0}
+        for stage in sums
+    }
+
+
+def main():
+    set_load_test_environment()
+
+    parser = argparse.ArgumentParser(description="Load test the dubbing pipeline with local backends.")
+    parser.add_argument("--jobs", type=int, default=10, help="Number of jobs")
+    parser.add_argument("--concurrency", type=int, default=2, help="Jobs running at a time")
+    parser.add_argument("--length", type=float, default=60, help="Media length, seconds")
+    parser.add_argument("--speakers", type=int, default=2)
+    parser.add_argument("--language", default="english")
+    parser.add_argument("--media-dir", default=DEFAULT_MEDIA_DIR)
+    parser.add_argument("--output", help="Write the report to this JSON file")
+    args = parser.parse_args()
+
+    from benchmarks.stub_models import install_stub_models
+    install_stub_models()
+
+    from benchmarks.synthetic_media import SyntheticMedia
+    from constants.files import PROCESSING_FILES_DIR_PATH
+    from controllers.generate import generate
+    from models.project import ProjectStatus
+    from services.firebase.storage.get_bucket import get_bucket
+    from services.project_store.get_project_store import get_project_store
+
+    os.makedirs(PROCESSING_FILES_DIR_PATH, exist_ok=True)
+    os.makedirs(args.media_dir, exist_ok=True)
+    media = SyntheticMedia(media_dir=args.media_dir, duration=args.length, speakers_count=args.speakers)
+    media.write_files()
+
+    bucket = get_bucket()
+    project_store = get_project_store()
+    project_ids = [f"load-test-{job_index}" for job_index in range(args.jobs)]
+    for project_id in project_ids:
+        blob_path = f"{LOAD_TEST_BLOB_DIR}/{project_id}/source.mp4"
+        local_blob_path = os.path.join(bucket.root_dir, blob_path)
+        os.makedirs(os.path.dirname(local_blob_path), exist_ok=True)
+        shutil.copyfile(media.video_path, local_blob_path)
+        project_store.create_project(project_id, {"id": project_id, "status": ProjectStatus.TRANSLATING.value})
+
+    def run_job(project_id: str) -> dict:
+        start_time = time.perf_counter()
+        try:
+            generate(
+                project_id=project_id,
+                target_language=args.language,
+                original_file_location=f"{LOAD_TEST_BLOB_DIR}/{project_id}/source.mp4",
+                voice_ids=[],
+                is_cloning=True,
+                num_speakers=args.speakers
+            )
+            error = None
+        except Exception as e:
+            error = repr(e)
+        return {"project_id": project_id, "seconds": time.perf_counter() - start_time, "error": error}
+
+    start_time = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        jobs = list(executor.map(run_job, project_ids))
+    wall_time = time.perf_counter() - start_time
+
+    succeeded_jobs = [job for job in jobs if job["error"] is None]
+    failed_jobs = [job for job in jobs if job["error"] is not None]
+    latencies = [job["seconds"] for job in succeeded_jobs]
+    report = {
+        "jobs": args.jobs,
+        "concurrency": args.concurrency,
+        "media_seconds": args.length,
+        "wall_seconds": wall_time,
+        "throughput_jobs_per_minute": len(succeeded_jobs) / wall_time * 60,
+        "failed": len(failed_jobs),
+        "latency": {
+            f"p{percent}": get_percentile(latencies, percent) for percent in (50, 95, 99)
+        } if latencies else {},
+        "stages": get_stage_durations(),
+        "errors": [job["error"] for job in failed_jobs],
+    }
+
+    print(f"{len(succeeded_jobs)}/{args.jobs} jobs in {wall_time:.1f}s, concurrency {args.concurrency}")
+    print(f"Throughput: {report['throughput_jobs_per_minute']:.2f} jobs/min")
+    for name, seconds in report["latency"].items():
+        print(f"Latency {name}: {seconds:.2f}s")
+    print()
+    print("Stage time per job:")
+    for stage, durations in sorted(report["stages"].items(), key=lambda item: -item[1]["total"]):
+        print(f"{stage:<14} {durations['mean']:>9.3f}s mean {durations['total']:>10.3f}s total")
+    for error in report["errors"]:
+        print(f"Failed: {error}")
+
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump(report, output_file, indent=2)
+
+    if failed_jobs:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
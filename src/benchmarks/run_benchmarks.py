@@ -0,0 +1,147 @@
+"""
+Stage-level benchmarks on synthetic media with stub models.
+
+Every stage runs on media of growing length in a fresh process, which reports wall time and peak RSS.
+The scaling exponent of time against media length is fitted per stage: 1 is linear, 2 is quadratic.
+Exits with code 1 if any stage scales worse than --max-exponent.
+
+Run from the src dir:
+    python3 -m benchmarks.run_benchmarks --lengths 30 60 120 240 --speakers 1 2
+"""
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import resource
+import time
+from typing import List
+
+DEFAULT_MEDIA_DIR = "tmp/benchmarks"
+
+
+def set_benchmark_environment():
+    # Errors are raised without reporting them to Sentry and Firestore
+    os.environ.setdefault("ENVIRONMENT", "development")
+
+
+def get_peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_case(stage: str, media_dir: str, duration: float, speakers_count: int, repeat: int) -> dict:
+    """Runs in a fresh process, so the peak RSS belongs to this case only."""
+    set_benchmark_environment()
+
+    from benchmarks.stub_models import install_stub_models
+    install_stub_models()
+
+    from benchmarks.stages import STAGE_BENCHMARKS
+    from benchmarks.synthetic_media import SyntheticMedia
+    from constants.files import PROCESSING_FILES_DIR_PATH
+
+    os.makedirs(PROCESSING_FILES_DIR_PATH, exist_ok=True)
+
+    media = SyntheticMedia(media_dir=media_dir, duration=duration, speakers_count=speakers_count)
+    run_stage = STAGE_BENCHMARKS[stage](media)
+    rss_before_mb = get_peak_rss_mb()
+
+    timings = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        run_stage()
+        timings.append(time.perf_counter() - start_time)
+
+    peak_rss_mb = get_peak_rss_mb()
+    return {
+        "stage": stage,
+        "duration": duration,
+        "speakers": speakers_count,
+        "segments": len(media.text_segments),
+        "seconds": min(timings),
+        "peak_rss_mb": round(peak_rss_mb, 1),
+        "rss_growth_mb": round(peak_rss_mb - rss_before_mb, 1),
+    }
+
+
+def fit_scaling_exponent(results: List[dict]) -> float | None:
+    """Least squares slope of log(time) against log(media length)."""
+    points = [(math.log(result["duration"]), math.log(result["seconds"])) for result in results if result["seconds"] > 0]
+    if len(points) < 2:
+        return None
+
+    mean_x = sum(x for x, _ in points) / len(points)
+    mean_y = sum(y for _, y in points) / len(points)
+    variance = sum((x - mean_x) ** 2 for x, _ in points)
+    if variance == 0:
+        return None
+    return sum((x - mean_x) * (y - mean_y) for x, y in points) / variance
+
+
+def main():
+    set_benchmark_environment()
+
+    from benchmarks.stages import STAGE_BENCHMARKS
+    from benchmarks.synthetic_media import SyntheticMedia
+
+    parser = argparse.ArgumentParser(description="Benchmark pipeline stages on synthetic media.")
+    parser.add_argument("--stages", nargs="+", default=list(STAGE_BENCHMARKS), choices=list(STAGE_BENCHMARKS))
+    parser.add_argument("--lengths", nargs="+", type=float, default=[30, 60, 120, 240], help="Media lengths, seconds")
+    parser.add_argument("--speakers", nargs="+", type=int, default=[1, 2])
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per case, the fastest is reported")
+    parser.add_argument("--media-dir", default=DEFAULT_MEDIA_DIR)
+    parser.add_argument("--max-exponent", type=float, default=1.3, help="Fail above this scaling exponent")
+    parser.add_argument("--output", help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    os.makedirs(args.media_dir, exist_ok=True)
+    for duration in args.lengths:
+        for speakers_count in args.speakers:
+            SyntheticMedia(media_dir=args.media_dir, duration=duration, speakers_count=speakers_count).write_files()
+
+    context = multiprocessing.get_context("spawn")
+    results = []
+    for stage in args.stages:
+        for speakers_count in args.speakers:
+            for duration in args.lengths:
+                with context.Pool(processes=1) as pool:
+                    result = pool.apply(run_case, (stage, args.media_dir, duration, speakers_count, args.repeat))
+                results.append(result)
+                print(
+                    f"{stage:<26} {duration:>7.0f}s {speakers_count} spk {result['segments']:>5} seg "
+                    f"{result['seconds']:>9.3f}s {result['peak_rss_mb']:>8.1f} MB peak "
+                    f"{result['rss_growth_mb']:>8.1f} MB growth"
+                )
+
+    scaling = []
+    for stage in args.stages:
+        for speakers_count in args.speakers:
+            stage_results = [
+                result for result in results
+                if result["stage"] == stage and result["speakers"] == speakers_count
+            ]
+            exponent = fit_scaling_exponent(stage_results)
+            scaling.append({"stage": stage, "speakers": speakers_count, "exponent": exponent})
+
+    print()
+    print("Scaling exponent of time against media length (1 = linear, 2 = quadratic):")
+    regressions = []
+    for item in scaling:
+        if item["exponent"] is None:
+            continue
+        is_regression = item["exponent"] > args.max_exponent
+        if is_regression:
+            regressions.append(item)
+        print(f"{item['stage']:<26} {item['speakers']} spk {item['exponent']:>6.2f}{'  <-- superlinear' if is_regression else ''}")
+
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump({"results": results, "scaling": scaling}, output_file, indent=2)
+
+    if regressions:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Compares speech to text engines on one media file with the real models.
+
+Every engine transcribes the same decoded audio, the report has the model load time, the transcription
+time, the real-time factor (transcription seconds per media second) and the transcript of every engine.
+
+Run from the src dir:
+    python3 -m benchmarks.speech_to_text_engines --file tmp/interview.wav --engines whisper faster_whisper
+"""
+import argparse
+import json
+import time
+
+from constants.backends import SpeechToTextBackend
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare speech to text engines on a media file.")
+    parser.add_argument("--file", required=True, help="Media file to transcribe")
+    parser.add_argument(
+        "--engines",
+        nargs="+",
+        default=[backend.value for backend in SpeechToTextBackend],
+        choices=[backend.value for backend in SpeechToTextBackend]
+    )
+    parser.add_argument("--repeat", type=int, default=1, help="Transcriptions per engine, the fastest one is reported")
+    parser.add_argument("--output", help="Write the report to this JSON file")
+    args = parser.parse_args()
+
+    from whisper import load_audio
+    from constants.audio import SAMPLE_RATE
+    from constants.ml_models import MlModel
+    from services.ml_models.model_registry import MODEL_GETTERS
+    from services.speech_to_text.get_transcriber import get_transcriber
+
+    audio = load_audio(args.file)
+    media_seconds = len(audio) / SAMPLE_RATE
+
+    report = {"file": args.file, "media_seconds": media_seconds, "engines": {}}
+    for engine in args.engines:
+        backend = SpeechToTextBackend(engine)
+
+        start_time = time.perf_counter()
+        MODEL_GETTERS[MlModel(backend.value)]()
+        load_seconds = time.perf_counter() - start_time
+
+        transcriber = get_transcriber(backend)
+        timings = []
+        for _ in range(args.repeat):
+            start_time = time.perf_counter()
+            segments = transcriber.transcribe(audio, temperature=1.0, no_speech_threshold=0.2)
+            timings.append(time.perf_counter() - start_time)
+
+        report["engines"][engine] = {
+            "load_seconds": load_seconds,
+            "transcribe_seconds": min(timings),
+            "real_time_factor": min(timings) / media_seconds if media_seconds else 0.0,
+            "segments": len(segments),
+            "text": "".join(segment.text for segment in segments).strip(),
+        }
+
+    print(f"{args.file}: {media_seconds:.1f}s of media")
+    for engine, result in report["engines"].items():
+        print(
+            f"{engine:<16} load {result['load_seconds']:>7.2f}s  transcribe {result['transcribe_seconds']:>8.2f}s  "
+            f"RTF {result['real_time_factor']:.3f}  {result['segments']} segments"
+        )
+
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump(report, output_file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Benchmarked pipeline stages.
+
+Each `prepare_*` function loads the stage inputs from synthetic media and returns a function
+which runs only the stage, so input preparation is not measured.
+"""
+from typing import Callable, Dict
+
+from benchmarks.synthetic_media import SyntheticMedia
+
+BENCHMARK_PROJECT_ID = "benchmark"
+
+
+def prepare_combine_text_segments(media: SyntheticMedia) -> Callable:
+    from services.translation.combine_text_segments import combine_text_segments
+
+    return lambda: combine_text_segments(text_segments=media.text_segments, show_logs=False)
+
+
+def prepare_split_text_to_chunks(media: SyntheticMedia) -> Callable:
+    from services.translation.combine_text_segments import combine_text_segments
+    from services.translation.split_text_to_chunks import split_text_to_chunks
+
+    text = combine_text_segments(text_segments=media.text_segments, show_logs=False)
+    return lambda: split_text_to_chunks(text=text, project_id=BENCHMARK_PROJECT_ID, show_logs=False)
+
+
+def prepare_collect_voice_samples(media: SyntheticMedia) -> Callable:
+    from services.speech_to_text.load_whisper_audio import load_whisper_audio
+    from services.text_to_speech.voice_detect import collect_voice_samples
+
+    audio = load_whisper_audio(media.audio_path)
+    return lambda: collect_voice_samples(text_segments=media.text_segments, audio=audio)
+
+
+def prepare_lower_volume_in_segments(media: SyntheticMedia) -> Callable:
+    from pydub import AudioSegment
+    from services.overlay.lower_volume_in_segments import lower_volume_in_segments
+
+    audio = AudioSegment.from_file(media.audio_path)
+    return lambda: lower_volume_in_segments(audio, media.text_segments_with_audio_timestamp, 15)
+
+
+def prepare_overlay_audio_to_video(media: SyntheticMedia) -> Callable:
+    from benchmarks.synthetic_media import TTS_SAMPLE_RATE
+    from services.overlay.overlay_audio_to_video import overlay_audio_to_video
+    from utils.audio_buffer import AudioBuffer
+
+    translated_audio = AudioBuffer.from_file(media.translated_audio_path, sample_rate=TTS_SAMPLE_RATE)
+    return lambda: overlay_audio_to_video(
+        video_path=media.video_path,
+        translated_audio=translated_audio,
+        text_segments_with_audio_timestamp=media.text_segments_with_audio_timestamp,
+        project_id=BENCHMARK_PROJECT_ID,
+        speedup_slow_audio=False
+    )
+
+
+def prepare_text_to_speech(media: SyntheticMedia) -> Callable:
+    from services.speech_to_text.load_whisper_audio import load_whisper_audio
+    from services.text_to_speech.text_to_speech import text_to_speech
+
+    audio = load_whisper_audio(media.audio_path)
+    return lambda: text_to_speech(
+        text_segments=media.text_segments,
+        language="english",
+        project_id=BENCHMARK_PROJECT_ID,
+        is_cloning=True,
+        voice_ids=[],
+        audio=audio
+    )
+
+
+def prepare_speech_to_text(media: SyntheticMedia) -> Callable:
+    from services.speech_to_text.speech_to_text import speech_to_text
+
+    return lambda: speech_to_text(
+        file_path=media.video_path,
+        project_id=BENCHMARK_PROJECT_ID,
+        is_cloning=False,
+        num_speakers=media.speakers_count
+    )
+
+
+STAGE_BENCHMARKS: Dict[str, Callable[[SyntheticMedia], Callable]] = {
+    "combine_text_segments": prepare_combine_text_segments,
+    "split_text_to_chunks": prepare_split_text_to_chunks,
+    "collect_voice_samples": prepare_collect_voice_samples,
+    "lower_volume_in_segments": prepare_lower_volume_in_segments,
+    "overlay_audio_to_video": prepare_overlay_audio_to_video,
+    "text_to_speech": prepare_text_to_speech,
+    "speech_to_text": prepare_speech_to_text,
+}
@@ -0,0 +1,175 @@
+"""
+Deterministic stand-ins for Whisper, pyannote and XTTS.
+
+Stubs return output of the same shape as the real models almost instantly, so benchmarks
+measure the pipeline code around the models. Call `install_stub_models` before importing
+any pipeline module, the modules pick up the models at import time.
+"""
+import wave
+from typing import List
+
+import numpy as np
+
+# Whisper segments length, seconds
+STUB_TRANSCRIPT_SEGMENT_DURATION = 5.0
+# Diarization speaker turn length, seconds
+STUB_SPEAKER_TURN_DURATION = 4.0
+# Synthesized speech length per text character, seconds
+STUB_TTS_SECONDS_PER_CHARACTER = 0.06
+STUB_TTS_SAMPLE_RATE = 22050
+
+STUB_WORDS = ["lorem", "ipsum", "dolor", "sit", "amet", "consectetur", "adipiscing", "elit"]
+
+
+def make_stub_text(word_count: int, seed: int) -> str:
+    return " ".join(STUB_WORDS[(seed + index) % len(STUB_WORDS)] for index in range(max(word_count, 1)))
+
+
+def make_stub_speech(duration: float, sample_rate: int, pitch: float = 150.0) -> np.ndarray:
+    """Harmonic tone with syllable-like amplitude modulation, float32 in [-1, 1]."""
+    time = np.arange(int(duration * sample_rate), dtype=np.float32) / sample_rate
+    tone = sum(np.sin(2 * np.pi * pitch * harmonic * time) / harmonic for harmonic in range(1, 4))
+    envelope = 0.5 + 0.5 * np.sin(2 * np.pi * 4.0 * time)
+    return (0.3 * tone * envelope).astype(np.float32)
+
+
+class StubWhisperModel:
+    def transcribe(self, audio: np.ndarray, **kwargs) -> dict:
+        from whisper.audio import SAMPLE_RATE
+
+        duration = len(audio) / SAMPLE_RATE
+        segments = []
+        start = 0.0
+        while start < duration:
+            end = min(start + STUB_TRANSCRIPT_SEGMENT_DURATION, duration)
+            segments.append({
+                "start": start,
+                "end": end,
+                "text": " " + make_stub_text(int((end - start) * 2.5), seed=len(segments))
+            })
+            start = end
+
+        return {
+            "text": "".join(segment["text"] for segment in segments),
+            "segments": segments
+        }
+
+
+class StubFasterWhisperSegment:
+    def __init__(self, start: float, end: float, text: str):
+        self.start = start
+        self.end = end
+        self.text = text
+
+
+class StubFasterWhisperModel:
+    """faster-whisper returns lazy segments and transcription info instead of a dict."""
+
+    def __init__(self, *args, **kwargs):
+        self.whisper_model = StubWhisperModel()
+
+    def transcribe(self, audio: np.ndarray, **kwargs) -> tuple:
+        result = self.whisper_model.transcribe(audio)
+        segments = (
+            StubFasterWhisperSegment(segment["start"], segment["end"], segment["text"])
+            for segment in result["segments"]
+        )
+        return segments, None
+
+
+class StubSpeakerTurn:
+    def __init__(self, start: float, end: float):
+        self.start = start
+        self.end = end
+
+
+class StubDiarization:
+    def __init__(self, turns: List[tuple]):
+        self.turns = turns
+
+    def itertracks(self, yield_label: bool = False):
+        for track_index, (turn, speaker) in enumerate(self.turns):
+            if yield_label:
+                yield turn, track_index, speaker
+            else:
+                yield turn, track_index
+
+
+class StubDiarizationPipeline:
+    """Splits the file into equal speaker turns, speakers take turns in order."""
+
+    @classmethod
+    def from_pretrained(cls, *args, **kwargs) -> "StubDiarizationPipeline":
+        return cls()
+
+    def to(self, device):
+        return self
+
+    def __call__(self, audio_file, num_speakers: int = None) -> StubDiarization:
+        # A path or decoded audio, like pyannote takes
+        if isinstance(audio_file, dict):
+            duration = audio_file["waveform"].shape[-1] / audio_file["sample_rate"]
+        else:
+            with wave.open(audio_file, "rb") as wave_file:
+                duration = wave_file.getnframes() / wave_file.getframerate()
+
+        speakers_count = num_speakers or 1
+        turns = []
+        start = 0.0
+        while start < duration:
+            end = min(start + STUB_SPEAKER_TURN_DURATION, duration)
+            speaker = f"SPEAKER_{len(turns) % speakers_count:02d}"
+            turns.append((StubSpeakerTurn(start, end), speaker))
+            start = end
+
+        return StubDiarization(turns)
+
+
+class StubSynthesizer:
+    output_sample_rate = STUB_TTS_SAMPLE_RATE
+
+
+class StubTTS:
+    def __init__(self, model_name: str = None, gpu: bool = False, **kwargs):
+        self.model_name = model_name
+        self.synthesizer = StubSynthesizer()
+
+    def to(self, device):
+        return self
+
+    def download_model_by_name(self, model_name: str):
+        pass
+
+    def list_models(self):
+        return []
+
+    def tts(self, text: str, speaker_wav: str = None, language: str = None, **kwargs) -> List[float]:
+        pitch = 120.0 + 10.0 * (len(speaker_wav or "") % 8)
+        return make_stub_speech(len(text) * STUB_TTS_SECONDS_PER_CHARACTER, STUB_TTS_SAMPLE_RATE, pitch).tolist()
+
+    def tts_to_file(self, text: str, speaker_wav: str = None, language: str = None, file_path: str = None, **kwargs):
+        samples = np.asarray(self.tts(text=text, speaker_wav=speaker_wav, language=language), dtype=np.float32)
+        with wave.open(file_path, "wb") as audio_file:
+            audio_file.setnchannels(1)
+            audio_file.setsampwidth(2)
+            audio_file.setframerate(STUB_TTS_SAMPLE_RATE)
+            audio_file.writeframes((samples * 32767).astype(np.int16).tobytes())
+        return file_path
+
+
+def install_stub_models():
+    """Replaces the model classes and loaders in their libraries, before pipeline modules import them."""
+    import whisper
+    import pyannote.audio
+    import TTS.api
+
+    whisper.load_model = lambda *args, **kwargs: StubWhisperModel()
+    pyannote.audio.Pipeline = StubDiarizationPipeline
+    TTS.api.TTS = StubTTS
+
+    # The CPU engine is optional
+    try:
+        import faster_whisper
+    except ImportError:
+        return
+    faster_whisper.WhisperModel = StubFasterWhisperModel
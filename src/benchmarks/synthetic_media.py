@@ -0,0 +1,108 @@
+import os
+import subprocess
+import wave
+import numpy as np
+
+from benchmarks.stub_models import make_stub_speech, make_stub_text
+from models.segment_table import SegmentTable
+
+MEDIA_SAMPLE_RATE = 44100
+TTS_SAMPLE_RATE = 22050
+
+# Pause between synthesized segments, the same as in text_to_speech
+TTS_SEGMENT_PAUSE_IN_SECONDS = 3.0
+
+
+class SyntheticMedia:
+    """
+    Deterministic speech-like media of a set length and speaker count, with matching segments.
+
+    Speech bursts of 2-6 seconds are separated by 0.3-1.5 seconds of silence, speakers take turns.
+    Each speaker has its own pitch, so voice sample collection sees distinct voices.
+    """
+
+    def __init__(self, media_dir: str, duration: float, speakers_count: int, seed: int = 0):
+        self.duration = duration
+        self.speakers_count = speakers_count
+
+        name = f"synthetic-{int(duration)}s-{speakers_count}spk-{seed}"
+        self.audio_path = f"{media_dir}/{name}.wav"
+        self.video_path = f"{media_dir}/{name}.mp4"
+        self.translated_audio_path = f"{media_dir}/{name}-translated.wav"
+
+        self.text_segments = self.make_text_segments(np.random.default_rng(seed))
+        self.text_segments_with_audio_timestamp = self.make_audio_timestamps()
+
+    def make_text_segments(self, rng: np.random.Generator) -> SegmentTable:
+        starts, ends, texts, speakers = [], [], [], []
+        start = float(rng.uniform(0.3, 1.5))
+        while start < self.duration:
+            end = min(start + float(rng.uniform(2.0, 6.0)), self.duration)
+            starts.append(start)
+            ends.append(end)
+            texts.append(make_stub_text(int((end - start) * 2.5), seed=len(texts)))
+            speakers.append(len(speakers) % self.speakers_count)
+            start = end + float(rng.uniform(0.3, 1.5))
+        return SegmentTable(starts, ends, texts, speakers)
+
+    def make_audio_timestamps(self) -> SegmentTable:
+        """Translated audio holds one burst per segment, each followed by the text_to_speech pause."""
+        durations = self.text_segments.durations
+        audio_starts = np.concatenate(([0.0], np.cumsum(durations + TTS_SEGMENT_PAUSE_IN_SECONDS)[:-1]))
+        return self.text_segments.with_audio_timestamps(
+            audio_starts=audio_starts * 1000,
+            audio_ends=(audio_starts + durations) * 1000
+        )
+
+    def render_original_audio(self) -> np.ndarray:
+        samples = np.zeros(int(self.duration * MEDIA_SAMPLE_RATE), dtype=np.float32)
+        segments = self.text_segments
+        for start, end, speaker in zip(segments.starts.tolist(), segments.ends.tolist(), segments.speakers.tolist()):
+            burst = make_stub_speech(end - start, MEDIA_SAMPLE_RATE, pitch=110.0 + 40.0 * speaker)
+            offset = int(start * MEDIA_SAMPLE_RATE)
+            samples[offset:offset + len(burst)] = burst[:len(samples) - offset]
+        return samples
+
+    def render_translated_audio(self) -> np.ndarray:
+        segments = self.text_segments_with_audio_timestamp
+        last_end = segments.audio_ends[-1] / 1000
+        samples = np.zeros(int((last_end + TTS_SEGMENT_PAUSE_IN_SECONDS) * TTS_SAMPLE_RATE), dtype=np.float32)
+        for start, end in zip((segments.audio_starts / 1000).tolist(), (segments.audio_ends / 1000).tolist()):
+            burst = make_stub_speech(end - start, TTS_SAMPLE_RATE, pitch=130.0)
+            offset = int(start * TTS_SAMPLE_RATE)
+            samples[offset:offset + len(burst)] = burst
+        return samples
+
+    def write_files(self):
+        """Writes the audio, video and translated audio files, skipped for files which already exist."""
+        if not os.path.exists(self.audio_path):
+            write_wav(self.audio_path, self.render_original_audio(), MEDIA_SAMPLE_RATE, channels=2)
+
+        if not os.path.exists(self.translated_audio_path):
+            write_wav(self.translated_audio_path, self.render_translated_audio(), TTS_SAMPLE_RATE, channels=1)
+
+        if not os.path.exists(self.video_path):
+            subprocess.run(
+                [
+                    "ffmpeg", "-y", "-loglevel", "error",
+                    "-f", "lavfi", "-i", f"color=c=gray:s=320x240:r=25:d={self.duration}",
+                    "-i", self.audio_path,
+                    "-shortest",
+                    "-c:v", "libx264", "-preset", "ultrafast",
+                    "-c:a", "aac",
+                    self.video_path
+                ],
+                check=True
+            )
+
+
+def write_wav(file_path: str, samples: np.ndarray, sample_rate: int, channels: int):
+    frames = (np.clip(samples, -1, 1) * 32767).astype(np.int16)
+    if channels > 1:
+        frames = np.repeat(frames[:, np.newaxis], channels, axis=1)
+
+    with wave.open(file_path, "wb") as audio_file:
+        audio_file.setnchannels(channels)
+        audio_file.setsampwidth(2)
+        audio_file.setframerate(sample_rate)
+        audio_file.writeframes(frames.tobytes())
@@ -10,13 +10,126 @@ load_dotenv()
 ENVIRONMENT = os.getenv("ENVIRONMENT")
 IS_DEV_ENVIRONMENT = ENVIRONMENT == "development"
 
+# Logging
+# text or json, one JSON object per line with the job context fields
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+# Comma separated levels of log tags, e.g. "overlay_audio=WARNING,speech_to_text=DEBUG"
+LOG_TAG_LEVELS = dict(
+    tag_level.split("=", 1) for tag_level in os.getenv("LOG_TAG_LEVELS", "").split(",") if "=" in tag_level
+)
+# Per segment events are logged once every this many events of a job, 1 logs all of them
+LOG_SAMPLE_EVERY = int(os.getenv("LOG_SAMPLE_EVERY", 50))
+
 # Firebase
-CERTIFICATE_CONTENT = json.loads(os.getenv("FIREBASE_CERTIFICATE_CONTENT"))
+# Only required by Firebase backends, local backends run without it
+CERTIFICATE_CONTENT = json.loads(os.getenv("FIREBASE_CERTIFICATE_CONTENT") or "null")
 BUCKET_NAME = os.getenv("BUCKET_NAME")
 
 # Sentry
 SENTRY_DSN = os.getenv("SENTRY_DSN")
+# Share of jobs sent to Sentry performance tracing, from 0 to 1
+SENTRY_TRACES_SAMPLE_RATE = float(os.getenv("SENTRY_TRACES_SAMPLE_RATE", 0))
 
 # Microsoft Translator
 MICROSOFT_TRANSLATOR_API_KEY = os.getenv("MICROSOFT_TRANSLATOR_API_KEY")
 MICROSOFT_TRANSLATOR_REGION = os.getenv("MICROSOFT_TRANSLATOR_REGION")
+
+# Backends: firebase or local storage, firestore, memory or sqlite project store, google or echo translator
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "firebase")
+LOCAL_STORAGE_DIR = os.getenv("LOCAL_STORAGE_DIR")
+PROJECT_STORE_BACKEND = os.getenv("PROJECT_STORE_BACKEND", "firestore")
+SQLITE_PROJECT_STORE_PATH = os.getenv("SQLITE_PROJECT_STORE_PATH")
+TRANSLATOR_BACKEND = os.getenv("TRANSLATOR_BACKEND", "google")
+
+# Storage
+DOWNLOAD_CHUNK_SIZE = int(os.getenv("DOWNLOAD_CHUNK_SIZE", 16 * 1024 * 1024))
+DOWNLOAD_MAX_WORKERS = int(os.getenv("DOWNLOAD_MAX_WORKERS", 8))
+DOWNLOAD_MAX_RETRIES = int(os.getenv("DOWNLOAD_MAX_RETRIES", 3))
+DECODE_WHILE_DOWNLOADING = os.getenv("DECODE_WHILE_DOWNLOADING", "false") == "true"
+# Decode media once to raw PCM files in the job workspace, stages map them instead of holding decoded audio in memory
+PCM_MEMMAP_ENABLED = os.getenv("PCM_MEMMAP_ENABLED", "true") == "true"
+# Resumable upload chunk size, must be a multiple of 256 KiB
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", 8 * 1024 * 1024))
+UPLOAD_MAX_RETRIES = int(os.getenv("UPLOAD_MAX_RETRIES", 5))
+STREAMING_UPLOAD_ENABLED = os.getenv("STREAMING_UPLOAD_ENABLED", "false") == "true"
+
+# Voice activity pre-pass of speech to text: only speech regions of the audio are transcribed
+VAD_ENABLED = os.getenv("VAD_ENABLED", "true") == "true"
+# Frames this many dB above the noise floor of the audio are speech
+VAD_THRESHOLD_DB = float(os.getenv("VAD_THRESHOLD_DB", 10))
+# Shorter pauses are kept inside speech, shorter sounds are dropped, seconds
+VAD_MIN_SILENCE_SECONDS = float(os.getenv("VAD_MIN_SILENCE_SECONDS", 1.0))
+VAD_MIN_SPEECH_SECONDS = float(os.getenv("VAD_MIN_SPEECH_SECONDS", 0.25))
+# Audio kept around every speech region, seconds
+VAD_PADDING_SECONDS = float(os.getenv("VAD_PADDING_SECONDS", 0.2))
+
+# Models
+# Single local directory of whisper, XTTS and pyannote artifacts, the library caches are used if not set
+MODEL_STORE_DIR = os.getenv("MODEL_STORE_DIR")
+# Never download models, they must be pre-fetched to MODEL_STORE_DIR
+MODELS_OFFLINE = os.getenv("MODELS_OFFLINE", "false") == "true"
+# Speech to text engine: whisper (openai-whisper) or faster_whisper (CTranslate2, quantized on CPU)
+SPEECH_TO_TEXT_BACKEND = os.getenv("SPEECH_TO_TEXT_BACKEND", "whisper")
+# CTranslate2 weights type of faster_whisper: int8, int8_float16, float16 or float32
+FASTER_WHISPER_COMPUTE_TYPE = os.getenv("FASTER_WHISPER_COMPUTE_TYPE", "int8")
+# Whisper windows of 30 seconds decoded at once on long audio, 1 decodes them one after another
+SPEECH_TO_TEXT_BATCH_SIZE = int(os.getenv("SPEECH_TO_TEXT_BATCH_SIZE", 1))
+# Comma separated models loaded at startup: whisper, faster_whisper, diarization, tts. /ready answers once they are loaded
+WARM_UP_MODELS = [model for model in os.getenv("WARM_UP_MODELS", f"{SPEECH_TO_TEXT_BACKEND},tts").split(",") if model]
+
+# CPU budget
+# Cores given to one job for torch and ffmpeg threads, jobs wait for free cores. 0 disables the budget
+JOB_CPU_CORES = int(os.getenv("JOB_CPU_CORES", 0))
+# Pin the job thread and its ffmpeg processes to the cores of its budget
+CPU_AFFINITY_ENABLED = os.getenv("CPU_AFFINITY_ENABLED", "false") == "true"
+
+# Admission control, limits of this node
+ADMISSION_CONTROL_ENABLED = os.getenv("ADMISSION_CONTROL_ENABLED", "false") == "true"
+# Estimated memory of running jobs, 80% of the node memory if 0
+ADMISSION_MAX_MEMORY_MB = float(os.getenv("ADMISSION_MAX_MEMORY_MB", 0))
+# Estimated CPU seconds of running jobs, unlimited if 0
+ADMISSION_MAX_CPU_SECONDS = float(os.getenv("ADMISSION_MAX_CPU_SECONDS", 0))
+# Longest media accepted by this node, unlimited if 0
+ADMISSION_MAX_MEDIA_SECONDS = float(os.getenv("ADMISSION_MAX_MEDIA_SECONDS", 0))
+# Jobs waiting for resources at once, the incoming job included, more jobs are rejected with 429
+ADMISSION_MAX_QUEUED_JOBS = int(os.getenv("ADMISSION_MAX_QUEUED_JOBS", 4))
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", 600))
+
+# Job queue order: shortest media first within a priority class
+# Seconds of media a queued job is moved ahead by per second of waiting, so long jobs do not starve
+JOB_AGING_RATE = float(os.getenv("JOB_AGING_RATE", 1.0))
+# Seconds of media added to a job per running job of the same tenant
+JOB_TENANT_PENALTY = float(os.getenv("JOB_TENANT_PENALTY", 300))
+
+# Duplicate requests of a running job, same project and source file, wait for its result instead of running again
+JOB_DEDUPLICATION_ENABLED = os.getenv("JOB_DEDUPLICATION_ENABLED", "true") == "true"
+
+# Checkpoints of stage outputs in the job workspace, a failed job resumes from the first incomplete stage
+CHECKPOINTS_ENABLED = os.getenv("CHECKPOINTS_ENABLED", "true") == "true"
+# Mirror checkpoints to the bucket, so a job resumes on another node
+CHECKPOINTS_IN_BUCKET = os.getenv("CHECKPOINTS_IN_BUCKET", "false") == "true"
+
+# Job queue of workers: firestore, sqlite or memory
+JOB_QUEUE_BACKEND = os.getenv("JOB_QUEUE_BACKEND", "firestore")
+SQLITE_JOB_QUEUE_PATH = os.getenv("SQLITE_JOB_QUEUE_PATH")
+# A claimed job is reclaimed by another worker if its lease is not renewed in time
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", 60))
+JOB_HEARTBEAT_INTERVAL = float(os.getenv("JOB_HEARTBEAT_INTERVAL", 15))
+# Claims of a job before it is failed, e.g. when it crashes its workers
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", 3))
+WORKER_POLL_INTERVAL = float(os.getenv("WORKER_POLL_INTERVAL", 2))
+# Jobs run by one worker process at a time
+WORKER_CONCURRENCY = int(os.getenv("WORKER_CONCURRENCY", 1))
+
+# Profiling
+# Profile every job, a single job is profiled with the `profile` request flag
+JOB_PROFILING_ENABLED = os.getenv("JOB_PROFILING_ENABLED", "false") == "true"
+# sampling or deterministic
+JOB_PROFILER = os.getenv("JOB_PROFILER", "sampling")
+JOB_PROFILE_SAMPLE_INTERVAL = float(os.getenv("JOB_PROFILE_SAMPLE_INTERVAL", 0.01))
+JOB_PROFILE_TORCH = os.getenv("JOB_PROFILE_TORCH", "false") == "true"
+
+# Firestore
+# Minimal interval between project progress writes of one job
+PROJECT_PROGRESS_UPDATE_INTERVAL = float(os.getenv("PROJECT_PROGRESS_UPDATE_INTERVAL", 5))
@@ -1,33 +1,154 @@
 from __future__ import annotations
 
+import json
 import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Callable, Dict, Union
 
 import sentry_sdk
 
-from configs.env import IS_DEV_ENVIRONMENT
+from configs.env import IS_DEV_ENVIRONMENT, LOG_FORMAT, LOG_LEVEL, LOG_SAMPLE_EVERY, LOG_TAG_LEVELS
 from constants.log_tags import LogTag
 from models.project import ProjectStatus
 from services.sentry.init_sentry import init_sentry
 
-init_sentry()
+MESSAGE_FORMAT = "[%(asctime)s] %(levelname)s - %(tag_prefix)s%(message)s%(fields_suffix)s"
 
-MESSAGE_FORMAT = "[%(asctime)s] %(levelname)s - %(message)s"
+# A message or a function building it, called only if the log is written
+LogMessage = Union[str, Callable[[], str]]
+
+
+class LogContext:
+    """Fields added to every log of the job, e.g. its project id and current stage, and its sampling counters."""
+
+    def __init__(self, fields: Dict[str, object]):
+        self.fields = fields
+        self.sample_counts: Dict[object, int] = {}
+
+
+current_log_context: ContextVar[LogContext] = ContextVar("current_log_context", default=LogContext({}))
+
+
+@contextmanager
+def log_context(**fields):
+    """
+    Adds the fields to the logs written inside, on top of the fields of the outer context.
+    Can be used as a decorator.
+    """
+    context = LogContext({**current_log_context.get().fields, **fields})
+    token = current_log_context.set(context)
+    try:
+        yield context
+    finally:
+        current_log_context.reset(token)
+
+
+class LogContextFilter(logging.Filter):
+    """Copies the job context to the records, in the thread which writes them. Libraries' logs get it too."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.context = current_log_context.get().fields
+        return True
+
+
+def get_record_fields(record: logging.LogRecord) -> Dict[str, object]:
+    return {**getattr(record, "context", {}), **getattr(record, "fields", {})}
+
+
+class TextLogFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        tag = getattr(record, "tag", None)
+        fields = get_record_fields(record)
+        record.tag_prefix = f"({tag}) " if tag else ""
+        record.fields_suffix = (" | " + " ".join(f"{key}={value}" for key, value in fields.items())) if fields else ""
+        return super().format(record)
+
+
+class JsonLogFormatter(logging.Formatter):
+    """One JSON object per line: time, level, tag, message and the context fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "tag": getattr(record, "tag", record.name),
+            "message": record.getMessage(),
+            **get_record_fields(record)
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+log_handler = logging.StreamHandler()
+log_handler.addFilter(LogContextFilter())
+log_handler.setFormatter(JsonLogFormatter() if LOG_FORMAT == "json" else TextLogFormatter(MESSAGE_FORMAT))
 
 logging.basicConfig(
-    level=logging.INFO,
-    format=MESSAGE_FORMAT
+    level=LOG_LEVEL,
+    handlers=[log_handler]
 )
 
 
+@lru_cache
+def get_tag_logger(tag: LogTag) -> logging.Logger:
+    """Logger of the tag, its level is set by LOG_TAG_LEVELS, otherwise it is LOG_LEVEL."""
+    logger = logging.getLogger(f"dub.{tag.value}")
+    if tag.value in LOG_TAG_LEVELS:
+        logger.setLevel(LOG_TAG_LEVELS[tag.value].upper())
+    return logger
+
+
+def is_sampled_out(tag: LogTag, message: LogMessage) -> bool:
+    """
+    Whether the event is skipped by sampling: the first event and then every LOG_SAMPLE_EVERY-th one
+    of the same call site in the current context are written.
+    """
+    sample_counts = current_log_context.get().sample_counts
+    # Lambdas of one call site share their code, string messages are counted by their text
+    sample_key = (tag, getattr(message, "__code__", message))
+    count = sample_counts.get(sample_key, 0)
+    sample_counts[sample_key] = count + 1
+    return count % max(LOG_SAMPLE_EVERY, 1) != 0
+
+
+def print_log(tag: LogTag, level: int, message: LogMessage, sampled: bool = False, **fields):
+    """
+    Writes the log if the tag logs at the level. The message is built only then,
+    so pass a function for messages with large values, e.g. `lambda: f"Segments: {segments}"`.
+
+    :param sampled: The message is a per segment event, written once every LOG_SAMPLE_EVERY events.
+    :param fields: Structured fields of the event, e.g. segment_index=3.
+    """
+    logger = get_tag_logger(tag)
+    if not logger.isEnabledFor(level):
+        return
+    if sampled and is_sampled_out(tag, message):
+        return
+    if sampled:
+        fields["sampled_every"] = LOG_SAMPLE_EVERY
+    logger.log(level, message() if callable(message) else message, extra={"tag": tag.value, "fields": fields})
+
+
 def catch_error(
     tag: LogTag,
     error: Exception,
     project_id: str | None = None,
 ):
-    logging.error(msg=f"({tag.value}) {str(error)}")
+    # Errors of a cancelled job are not failures, the project is not marked and nothing is reported
+    from services.scheduling.job_cancellation import get_job_cancelled_error
+    cancelled_error = get_job_cancelled_error(error)
+    if cancelled_error is not None:
+        print_log(tag, logging.INFO, str(cancelled_error))
+        raise cancelled_error
+
+    print_log(tag, logging.ERROR, str(error))
 
     if not IS_DEV_ENVIRONMENT:
-        # Send error to Sentry
+        # Send error to Sentry, initialized here for scripts which do not start the app
+        init_sentry()
         sentry_sdk.capture_exception(error)
 
         # DO NOT MOVE THIS IMPORT unless error :)
@@ -44,8 +165,8 @@ def catch_error(
     raise error
 
 
-def print_info_log(tag: LogTag, message: str):
-    logging.info(msg=f"({tag.value}) {message}")
+def print_info_log(tag: LogTag, message: LogMessage, sampled: bool = False, **fields):
+    print_log(tag, logging.INFO, message, sampled=sampled, **fields)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,3 @@
+# Sample rate of audio decoded for whisper, the same as whisper.audio.SAMPLE_RATE.
+# Kept here so modules which only need the rate do not import whisper and torch.
+SAMPLE_RATE = 16000
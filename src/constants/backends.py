@@ -0,0 +1,28 @@
+from enum import Enum
+
+
+class StorageBackend(str, Enum):
+    FIREBASE = "firebase"
+    LOCAL = "local"
+
+
+class ProjectStoreBackend(str, Enum):
+    FIRESTORE = "firestore"
+    MEMORY = "memory"
+    SQLITE = "sqlite"
+
+
+class TranslatorBackend(str, Enum):
+    GOOGLE = "google"
+    ECHO = "echo"
+
+
+class SpeechToTextBackend(str, Enum):
+    WHISPER = "whisper"
+    FASTER_WHISPER = "faster_whisper"
+
+
+class JobQueueBackend(str, Enum):
+    FIRESTORE = "firestore"
+    SQLITE = "sqlite"
+    MEMORY = "memory"
@@ -7,6 +7,8 @@ current_dir = os.path.dirname(os.path.abspath(__file__))
 project_dir = os.path.dirname(current_dir)
 
 PROCESSING_FILES_DIR_PATH = f"{project_dir}/tmp"
+# Per-job directories, named by project id
+JOB_WORKSPACES_DIR_PATH = f"{PROCESSING_FILES_DIR_PATH}/jobs"
 
 VIDEO_SUPPORTED_EXTENSIONS = ["mp4", "avi"]
 AUDIO_SUPPORTED_EXTENSIONS = ["mp3"]
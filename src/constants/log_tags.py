@@ -23,3 +23,13 @@ class LogTag(Enum):
     MICROSOFT_PROVIDER = "microsoft_provider"
     OVERLAY_AUDIO = "overlay_audio"
     UPDATE_USER_TOKENS = "update_user_tokens"
+    PROFILE_JOB = "profile_job"
+    ML_MODELS = "ml_models"
+    CPU_BUDGET = "cpu_budget"
+    PROBE_MEDIA = "probe_media"
+    ADMISSION_CONTROL = "admission_control"
+    JOB_QUEUE = "job_queue"
+    WORKER = "worker"
+    CHECKPOINTS = "checkpoints"
+    JOB_DEDUPLICATION = "job_deduplication"
+    JOB_CANCELLATION = "job_cancellation"
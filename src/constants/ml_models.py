@@ -0,0 +1,15 @@
+from enum import Enum
+
+from constants.whisper_model import WhisperModel
+
+
+class MlModel(str, Enum):
+    WHISPER = "whisper"
+    FASTER_WHISPER = "faster_whisper"
+    DIARIZATION = "diarization"
+    TTS = "tts"
+
+
+WHISPER_MODEL_NAME = WhisperModel.BASE.value
+DIARIZATION_MODEL_NAME = "pyannote/speaker-diarization-3.1"
+TTS_MODEL_NAME = "tts_models/multilingual/multi-dataset/xtts_v2"
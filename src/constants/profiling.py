@@ -0,0 +1,8 @@
+from enum import Enum
+
+
+class JobProfilerMode(str, Enum):
+    # Stack samples of the job thread, flamegraph-ready
+    SAMPLING = "sampling"
+    # cProfile of every call in the job thread
+    DETERMINISTIC = "deterministic"
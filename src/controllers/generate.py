@@ -2,20 +2,37 @@ import os
 from datetime import datetime
 from typing import List
 
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException
 
+from configs.env import (
+    CHECKPOINTS_ENABLED, DECODE_WHILE_DOWNLOADING, STREAMING_UPLOAD_ENABLED, JOB_PROFILING_ENABLED, PCM_MEMMAP_ENABLED
+)
 from configs.logger import print_info_log, catch_error
 from constants.files import PROCESSING_FILES_DIR_PATH
 from constants.log_tags import LogTag
 from models.file_type import FileType
+from models.job_priority import JobPriority
+from models.pipeline_stage import PipelineStage
 from models.project import ProjectStatus
+from models.segment_table import SegmentTable
+from services.checkpoints.job_checkpoints import get_job_checkpoints
+from services.firebase.firestore.project_progress import ProjectProgressReporter
 from services.firebase.firestore.update_project import update_project_status_and_translated_link_by_id
 from services.firebase.storage.download_blob import download_blob
+from services.firebase.storage.streaming_upload import StreamingBlobUpload, STREAMABLE_MP4_FFMPEG_PARAMS
 from services.firebase.storage.upload_blob import upload_blob
-from services.overlay.overlay_audio_to_video import overlay_audio_to_video
-from services.speech_to_text.speech_to_text import speech_to_text
-from services.text_to_speech.text_to_speech import text_to_speech
-from services.translation.translate_text import translate_text
+from services.metrics.pipeline_metrics import track_job, track_stage, set_job_media_seconds
+from services.sentry.tracing import trace_job, set_job_trace_tags
+from services.profiling.job_profiler import profile_job
+from services.scheduling.admission_controller import admit_job, JobRejectedError
+from services.scheduling.cpu_budget import job_cpu_budget
+from services.scheduling.job_cancellation import cancellable_job, JobCancelledError
+from services.scheduling.job_deduplication import deduplicate_job
+from services.speech_to_text.load_whisper_audio import (
+    load_whisper_audio, get_whisper_pcm_file_path, remove_whisper_pcm_file
+)
+from services.speech_to_text.streaming_audio_decoder import StreamingAudioDecoder
+from utils.audio_buffer import AudioBuffer
 from utils.files import get_file_extension, get_file_type, get_file_dir, get_file_name
 
 dub_router = APIRouter(tags=["DUB"])
@@ -23,6 +40,94 @@ dub_router = APIRouter(tags=["DUB"])
 
 @dub_router.get("/")
 def generate(
+    project_id: str,
+    target_language: str,
+    original_file_location: str,
+    voice_ids: List[int],
+    is_cloning: bool,
+    num_speakers: int = None,
+    profile: bool = False,
+    priority: JobPriority = JobPriority.NORMAL
+):
+    """
+    Dubs the project, profiled if `profile` is set or JOB_PROFILING_ENABLED.
+    The profile is fetched afterwards from the /profile endpoints.
+
+    The job starts once admission control admits it. A job the node can not take now is rejected
+    with 429 and Retry-After, a job over the node limits with 413.
+    Queued jobs start by `priority` class, then shortest media first.
+    A request for the same project and source file as a running job waits for that job instead of starting another.
+    The job is stopped with 409 if it is cancelled from the /cancel endpoint.
+    """
+    def run_job():
+        with cancellable_job(project_id=project_id, show_logs=True):
+            return run_dub_job(
+                project_id=project_id,
+                target_language=target_language,
+                original_file_location=original_file_location,
+                voice_ids=voice_ids,
+                is_cloning=is_cloning,
+                num_speakers=num_speakers,
+                profile=profile,
+                priority=priority
+            )
+
+    try:
+        # A retried request of a running job gets the result of that job
+        return deduplicate_job(
+            project_id=project_id,
+            original_file_location=original_file_location,
+            job=run_job,
+            show_logs=True,
+            target_language=target_language,
+            voice_ids=voice_ids,
+            is_cloning=is_cloning,
+            num_speakers=num_speakers
+        )
+    except JobRejectedError as e:
+        headers = {"Retry-After": str(e.retry_after)} if e.retry_after else None
+        raise HTTPException(status_code=e.status_code, detail=str(e), headers=headers)
+    except JobCancelledError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
+def run_dub_job(
+    project_id: str,
+    target_language: str,
+    original_file_location: str,
+    voice_ids: List[int],
+    is_cloning: bool,
+    num_speakers: int = None,
+    profile: bool = False,
+    priority: JobPriority = JobPriority.NORMAL
+):
+    """
+    Dubs the project once admission control admits it, profiled if `profile` is set or JOB_PROFILING_ENABLED.
+    Jobs of the generate endpoint and of the workers run through it.
+
+    :raises JobRejectedError: If the node can not take the job.
+    """
+    with admit_job(
+        project_id=project_id,
+        original_file_location=original_file_location,
+        priority=priority,
+        show_logs=True
+    ):
+        with profile_job(project_id=project_id, enabled=profile or JOB_PROFILING_ENABLED, show_logs=True):
+            return dub_project(
+                project_id=project_id,
+                target_language=target_language,
+                original_file_location=original_file_location,
+                voice_ids=voice_ids,
+                is_cloning=is_cloning,
+                num_speakers=num_speakers
+            )
+
+
+@job_cpu_budget(show_logs=True)
+@track_job()
+@trace_job(name="generate")
+def dub_project(
     project_id: str,
     target_language: str,
     original_file_location: str,
@@ -43,6 +148,12 @@ def generate(
 
     Check if project_id and original_file_location exist in Firebase
     """
+    # Stage modules import torch, whisper, TTS and pyannote, which takes seconds,
+    # so they are imported by the first job instead of at app startup
+    from services.overlay.overlay_audio_to_video import overlay_audio_to_video
+    from services.speech_to_text.speech_to_text import speech_to_text
+    from services.text_to_speech.text_to_speech import text_to_speech, get_tts_pcm_file_path, remove_tts_pcm_file
+    from services.translation.translate_text import translate_text
 
     try:
         start_time = datetime.now()
@@ -50,6 +161,18 @@ def generate(
             tag=LogTag.MAIN,
             message=f"Job Started! Processing project with id {project_id}..."
         )
+        progress_reporter = ProjectProgressReporter(project_id=project_id)
+        set_job_trace_tags(project_id=project_id, target_language=target_language)
+        # Outputs of the stages finished by a previous attempt of this job
+        checkpoints = get_job_checkpoints(
+            project_id=project_id,
+            source_blob_path=original_file_location,
+            show_logs=True,
+            target_language=target_language,
+            voice_ids=voice_ids,
+            is_cloning=is_cloning,
+            num_speakers=num_speakers
+        )
 
         """Download project file from Cloud Storage"""
 
@@ -63,13 +186,27 @@ def generate(
         original_file_extension = get_file_extension(original_file_location)
         # Combine project_id with the extracted extension
         local_original_file_path = f"{PROCESSING_FILES_DIR_PATH}/{project_id}.{original_file_extension}"
-        # Download file
-        download_blob(
-            source_blob_path=source_blob_path,
-            destination_file_path=local_original_file_path,
-            project_id=project_id,
-            show_logs=True
-        )
+        # Decode audio from downloaded bytes while the rest of the file is downloading
+        audio_decoder = StreamingAudioDecoder(
+            show_logs=True,
+            pcm_file_path=get_whisper_pcm_file_path(project_id) if PCM_MEMMAP_ENABLED else None
+        ) if DECODE_WHILE_DOWNLOADING else None
+        try:
+            # Download file
+            with track_stage(PipelineStage.DOWNLOAD):
+                download_blob(
+                    source_blob_path=source_blob_path,
+                    destination_file_path=local_original_file_path,
+                    project_id=project_id,
+                    show_logs=True,
+                    on_bytes=audio_decoder.feed if audio_decoder else None
+                )
+            with track_stage(PipelineStage.DECODE):
+                decoded_audio = audio_decoder.result() if audio_decoder else None
+        finally:
+            # ffmpeg of a failed download would wait for more input forever
+            if audio_decoder:
+                audio_decoder.close()
 
         print_info_log(
             tag=LogTag.MAIN,
@@ -109,13 +246,35 @@ def generate(
             num_speakers = len(voice_ids)
 
         processed_project_is_video = get_file_type(local_original_file_path) == FileType.VIDEO
-        original_text_segments, audio = speech_to_text(
-            file_path=local_original_file_path,
-            project_id=project_id,
-            show_logs=True,
-            is_cloning=is_cloning,
-            num_speakers=num_speakers,
-            processed_project_is_video=processed_project_is_video
+        speech_to_text_checkpoint = checkpoints.load(PipelineStage.SPEECH_TO_TEXT)
+        if speech_to_text_checkpoint:
+            original_text_segments = SegmentTable.from_records(speech_to_text_checkpoint["data"]["segments"])
+            # Audio is still needed for voice samples of the speakers
+            audio = decoded_audio
+            if audio is None:
+                with track_stage(PipelineStage.DECODE):
+                    audio = load_whisper_audio(local_original_file_path, project_id=project_id)
+        else:
+            original_text_segments, audio = speech_to_text(
+                file_path=local_original_file_path,
+                project_id=project_id,
+                show_logs=True,
+                is_cloning=is_cloning,
+                num_speakers=num_speakers,
+                audio=decoded_audio,
+                progress_reporter=progress_reporter
+            )
+            checkpoints.save(
+                PipelineStage.SPEECH_TO_TEXT,
+                data={"segments": original_text_segments.to_records()}
+            )
+
+        media_duration = audio.duration
+        set_job_media_seconds(media_duration)
+        set_job_trace_tags(
+            media_duration=round(media_duration),
+            segment_count=len(original_text_segments),
+            speaker_count=len(original_text_segments.get_ordered_speakers())
         )
 
         print_info_log(
@@ -130,12 +289,22 @@ def generate(
             message="Translating text..."
         )
 
-        translated_text_segments = translate_text(
-            text_segments=original_text_segments,
-            language=target_language,
-            project_id=project_id,
-            show_logs=True
-        )
+        translation_checkpoint = checkpoints.load(PipelineStage.TRANSLATION)
+        if translation_checkpoint:
+            translated_text_segments = SegmentTable.from_records(translation_checkpoint["data"]["segments"])
+        else:
+            with track_stage(PipelineStage.TRANSLATION):
+                translated_text_segments = translate_text(
+                    text_segments=original_text_segments,
+                    language=target_language,
+                    project_id=project_id,
+                    show_logs=True,
+                    progress_reporter=progress_reporter
+                )
+            checkpoints.save(
+                PipelineStage.TRANSLATION,
+                data={"segments": translated_text_segments.to_records()}
+            )
 
         print_info_log(
             tag=LogTag.MAIN,
@@ -149,39 +318,103 @@ def generate(
             message="Text to speech..."
         )
 
-        local_translated_audio_path, translated_text_segments_with_audio_timestamp = text_to_speech(
-            text_segments=translated_text_segments,
-            language=target_language,
-            is_cloning=is_cloning,
-            voice_ids=voice_ids,
-            project_id=project_id,
-            show_logs=True,
-            audio=audio
-        )
+        # Lossless copy of the translated audio for its checkpoint
+        local_translated_audio_path = f"{PROCESSING_FILES_DIR_PATH}/{project_id}-translated.wav"
+        text_to_speech_checkpoint = checkpoints.load(PipelineStage.TEXT_TO_SPEECH)
+        if text_to_speech_checkpoint:
+            translated_audio = AudioBuffer.from_file(
+                text_to_speech_checkpoint["files"]["audio"],
+                # Checkpoints saved before the rate was recorded hold XTTS audio at 24 kHz
+                sample_rate=text_to_speech_checkpoint["data"].get("sample_rate", 24000),
+                pcm_file_path=get_tts_pcm_file_path(project_id) if PCM_MEMMAP_ENABLED else None
+            )
+            translated_text_segments_with_audio_timestamp = SegmentTable.from_records(
+                text_to_speech_checkpoint["data"]["segments"]
+            )
+        else:
+            with track_stage(PipelineStage.TEXT_TO_SPEECH):
+                translated_audio, translated_text_segments_with_audio_timestamp = text_to_speech(
+                    text_segments=translated_text_segments,
+                    language=target_language,
+                    is_cloning=is_cloning,
+                    voice_ids=voice_ids,
+                    project_id=project_id,
+                    show_logs=True,
+                    audio=audio,
+                    progress_reporter=progress_reporter
+                )
+            # Encoding the whole track only pays off when the checkpoint is kept
+            if CHECKPOINTS_ENABLED:
+                translated_audio.write(local_translated_audio_path)
+                checkpoints.save(
+                    PipelineStage.TEXT_TO_SPEECH,
+                    data={
+                        "sample_rate": translated_audio.sample_rate,
+                        "segments": translated_text_segments_with_audio_timestamp.to_records()
+                    },
+                    files={"audio": local_translated_audio_path}
+                )
 
         print_info_log(
             tag=LogTag.MAIN,
             message="Text to speech completed."
         )
 
+        # Extract the path and filename from the original_file_location
+        original_file_dir = get_file_dir(original_file_location)
+        original_file_name = get_file_name(original_file_location)
+        original_file_suffix = get_file_extension(original_file_location)
+
+        # Create the destination blob name with '-translated' appended to the filename
+        destination_blob_name = f"{original_file_dir}/{original_file_name}-translated.{original_file_suffix}"
+
         """Overlay audio to video"""
 
+        # The translated file is already uploaded, only the project status is left
+        upload_checkpoint = checkpoints.load(PipelineStage.UPLOAD)
+        file_public_link = upload_checkpoint["data"]["file_public_link"] if upload_checkpoint else None
+
+        if upload_checkpoint:
+            local_translated_file_path = None
         # Overlay audio if project is video
-        if processed_project_is_video:
+        elif processed_project_is_video:
             print_info_log(
                 tag=LogTag.MAIN,
                 message="Overlay audio to video..."
             )
 
-            local_translated_file_path = overlay_audio_to_video(
-                video_path=local_original_file_path,
-                audio_path=local_translated_audio_path,
-                text_segments_with_audio_timestamp=translated_text_segments_with_audio_timestamp,
-                project_id=project_id,
-                remove_original_audio=False,
-                speedup_slow_audio=False,
-                show_logs=True
-            )
+            # Upload the video while it is encoded
+            video_upload = None
+            if STREAMING_UPLOAD_ENABLED:
+                video_upload = StreamingBlobUpload(
+                    fifo_path=f"{PROCESSING_FILES_DIR_PATH}/{project_id}-translated.{original_file_suffix}",
+                    destination_blob_name=destination_blob_name,
+                    project_id=project_id,
+                    show_logs=True
+                )
+
+            try:
+                local_translated_file_path = overlay_audio_to_video(
+                    video_path=local_original_file_path,
+                    translated_audio=translated_audio,
+                    text_segments_with_audio_timestamp=translated_text_segments_with_audio_timestamp,
+                    project_id=project_id,
+                    remove_original_audio=False,
+                    speedup_slow_audio=False,
+                    show_logs=True,
+                    translated_video_path=video_upload.fifo_path if video_upload else None,
+                    ffmpeg_params=STREAMABLE_MP4_FFMPEG_PARAMS if video_upload else None,
+                    progress_reporter=progress_reporter
+                )
+            except Exception as e:
+                if video_upload:
+                    video_upload.abort()
+                raise e
+
+            if video_upload:
+                # Only the tail of the upload is left after encoding
+                with track_stage(PipelineStage.UPLOAD):
+                    file_public_link = video_upload.finish()
 
             print_info_log(
                 tag=LogTag.MAIN,
@@ -190,29 +423,28 @@ def generate(
 
         # Unless return translated audio
         else:
-            local_translated_file_path = local_translated_audio_path
+            local_translated_file_path = f"{PROCESSING_FILES_DIR_PATH}/{project_id}-translated.{original_file_suffix}"
+            translated_audio.write(local_translated_file_path)
 
         """Upload audio to cloud storage"""
 
-        # Extract the path and filename from the original_file_location
-        original_file_dir = get_file_dir(original_file_location)
-        original_file_name = get_file_name(original_file_location)
-        original_file_suffix = get_file_extension(original_file_location)
-
-        # Create the destination blob name with '-translated' appended to the filename
-        destination_blob_name = f"{original_file_dir}/{original_file_name}-translated.{original_file_suffix}"
-
-        print_info_log(
-            tag=LogTag.MAIN,
-            message="Uploading translated file to cloud storage..."
-        )
+        # Translated file is not uploaded while encoding
+        if file_public_link is None:
+            progress_reporter.report(PipelineStage.UPLOAD, 0, 1)
+            print_info_log(
+                tag=LogTag.MAIN,
+                message="Uploading translated file to cloud storage..."
+            )
 
-        file_public_link = upload_blob(
-            source_file_name=local_translated_file_path,
-            destination_blob_name=destination_blob_name,
-            project_id=project_id,
-            show_logs=True
-        )
+            with track_stage(PipelineStage.UPLOAD):
+                file_public_link = upload_blob(
+                    source_file_name=local_translated_file_path,
+                    destination_blob_name=destination_blob_name,
+                    project_id=project_id,
+                    show_logs=True
+                )
+        if not upload_checkpoint:
+            checkpoints.save(PipelineStage.UPLOAD, data={"file_public_link": file_public_link})
 
         print_info_log(
             tag=LogTag.MAIN,
@@ -226,14 +458,17 @@ def generate(
             message="Removing all project processed files..."
         )
 
-        # Remove original file
-        os.remove(local_original_file_path)
-        # Remove translated file
-        if processed_project_is_video:
-            os.remove(local_translated_file_path)
-            os.remove(local_translated_audio_path)
-        else:
-            os.remove(local_translated_file_path)
+        # Remove original and translated files, named pipe of the streaming upload is already removed
+        # and the translated file is not created again when its upload is resumed
+        for processed_file_path in {local_original_file_path, local_translated_audio_path, local_translated_file_path}:
+            if processed_file_path and os.path.exists(processed_file_path):
+                os.remove(processed_file_path)
+        # Mapped whisper audio, the file is not needed after text to speech
+        audio = None
+        remove_whisper_pcm_file(project_id)
+        # Mapped translated audio, it is already encoded to the translated file
+        translated_audio = None
+        remove_tts_pcm_file(project_id)
 
         print_info_log(
             tag=LogTag.MAIN,
@@ -242,6 +477,7 @@ def generate(
 
         """Change project status to "translated"""
 
+        progress_reporter.flush()
         print_info_log(
             tag=LogTag.MAIN,
             message="Updating project status to 'translated'..."
@@ -259,6 +495,8 @@ def generate(
             message="Project status updated."
         )
 
+        checkpoints.clear()
+
         end_time = datetime.now()
         time_difference = end_time - start_time
 
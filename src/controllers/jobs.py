@@ -0,0 +1,89 @@
+from typing import List
+
+from fastapi import APIRouter, HTTPException
+
+from configs.logger import print_info_log, catch_error
+from constants.log_tags import LogTag
+from models.dub_job import DubJobRequest
+from models.job_priority import JobPriority
+from services.firebase.storage.get_blob_signed_url import get_blob_signed_url
+from services.job_queue.get_job_queue import get_job_queue
+from services.scheduling.job_cancellation import cancel_job
+from utils.media_probe import probe_media
+
+jobs_router = APIRouter(tags=["JOBS"])
+
+
+@jobs_router.get("/enqueue")
+def enqueue(
+    project_id: str,
+    target_language: str,
+    original_file_location: str,
+    voice_ids: List[int],
+    is_cloning: bool,
+    num_speakers: int = None,
+    priority: JobPriority = JobPriority.NORMAL
+):
+    """
+    Queues the dubbing job for workers instead of running it in the request, takes the parameters of generate.
+    The media is probed first, so workers can run shorter jobs first.
+    """
+    try:
+        media_info = probe_media(get_blob_signed_url(original_file_location))
+    except Exception as e:
+        catch_error(
+            tag=LogTag.JOB_QUEUE,
+            error=e,
+            project_id=project_id
+        )
+
+    job = get_job_queue().enqueue(DubJobRequest(
+        project_id=project_id,
+        target_language=target_language,
+        original_file_location=original_file_location,
+        voice_ids=voice_ids,
+        is_cloning=is_cloning,
+        num_speakers=num_speakers,
+        priority=priority,
+        media_seconds=media_info.duration
+    ))
+
+    print_info_log(
+        tag=LogTag.JOB_QUEUE,
+        message=f"Job {job.id} of project {project_id} is queued"
+    )
+
+    return {"job_id": job.id, "status": job.status}
+
+
+@jobs_router.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    job = get_job_queue().get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"No job with id {job_id}")
+    return job
+
+
+@jobs_router.post("/jobs/{job_id}/cancel")
+def cancel_queued_job(job_id: str):
+    """Cancels the queued job, a running job is stopped by its worker on the next lease renewal."""
+    job = get_job_queue().cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"No job with id {job_id}")
+
+    print_info_log(
+        tag=LogTag.JOB_QUEUE,
+        message=f"Job {job_id} of project {job.project_id} is {job.status.value}"
+    )
+    return job
+
+
+@jobs_router.post("/cancel/{project_id}")
+def cancel(project_id: str):
+    """
+    Cancels the job of the project started by generate on this node, e.g. after the project was deleted.
+    Its ffmpeg processes are killed right away, the job stops at its next segment and its files are removed.
+    """
+    if not cancel_job(project_id=project_id, show_logs=True):
+        raise HTTPException(status_code=404, detail=f"No running job of project {project_id}")
+    return {"project_id": project_id, "status": "cancelled"}
@@ -0,0 +1,37 @@
+import os
+
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import FileResponse
+
+from services.profiling.job_profiler import get_job_profile_dir
+
+profile_router = APIRouter(prefix="/profile", tags=["PROFILE"])
+
+
+def get_profile_dir_or_404(project_id: str) -> str:
+    try:
+        profile_dir = get_job_profile_dir(project_id)
+    except ValueError:
+        raise HTTPException(status_code=404, detail=f"No profile of project {project_id}")
+
+    if not os.path.isdir(profile_dir):
+        raise HTTPException(status_code=404, detail=f"No profile of project {project_id}")
+    return profile_dir
+
+
+@profile_router.get("/{project_id}")
+def list_profile_files(project_id: str):
+    """Lists the profile files of the project job."""
+    profile_dir = get_profile_dir_or_404(project_id)
+    return {"project_id": project_id, "files": sorted(os.listdir(profile_dir))}
+
+
+@profile_router.get("/{project_id}/{file_name}")
+def get_profile_file(project_id: str, file_name: str):
+    """Returns a profile file of the project job, e.g. stacks.folded, memory.csv or profile.prof."""
+    profile_dir = get_profile_dir_or_404(project_id)
+    # Only files listed in the profile dir are served
+    if file_name not in os.listdir(profile_dir):
+        raise HTTPException(status_code=404, detail=f"No profile file {file_name} of project {project_id}")
+
+    return FileResponse(os.path.join(profile_dir, file_name), filename=file_name)
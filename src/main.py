@@ -1,8 +1,22 @@
+import threading
+
 import uvicorn
-from fastapi import FastAPI
+from anyio import to_thread
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 
+from configs.env import WARM_UP_MODELS
+from constants.ml_models import MlModel
 from controllers.generate import dub_router
+from controllers.jobs import jobs_router
+from controllers.profile import profile_router
+from services.metrics.pipeline_metrics import observe_thread_pool_queue
+from services.ml_models.model_registry import warm_up_models, is_model_loaded
+from services.sentry.init_sentry import init_sentry
+
+# Sentry instruments FastAPI only if it is initialized before the app is created
+init_sentry()
 
 app = FastAPI()
 
@@ -18,13 +32,43 @@ app.add_middleware(
 )
 
 app.include_router(dub_router)
+app.include_router(jobs_router)
+app.include_router(profile_router)
+
+
+@app.on_event("startup")
+async def register_queue_depth_metric():
+    # Jobs run in the thread pool of synchronous endpoints, waiting requests are the job queue
+    observe_thread_pool_queue(to_thread.current_default_thread_limiter())
+
+
+@app.on_event("startup")
+async def start_models_warm_up():
+    # Models load in the background, so the app answers health checks right away
+    models = [MlModel(model) for model in WARM_UP_MODELS]
+    threading.Thread(target=warm_up_models, args=(models, True), daemon=True).start()
 
 
 @app.get("/healthcheck")
-def health_check():
+async def health_check():
     return {"status": "ok"}
 
 
+@app.get("/ready")
+async def ready(response: Response):
+    """Answers 503 until the WARM_UP_MODELS are loaded."""
+    models = {model: is_model_loaded(MlModel(model)) for model in WARM_UP_MODELS}
+    is_ready = all(models.values())
+    if not is_ready:
+        response.status_code = 503
+    return {"status": "ready" if is_ready else "warming_up", "models": models}
+
+
+@app.get("/metrics")
+def metrics():
+    return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+
 if __name__ == "__main__":
     print("main started")
     uvicorn.run("main:app", host="0.0.0.0", port=8080, reload=True)
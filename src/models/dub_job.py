@@ -0,0 +1,40 @@
+from enum import Enum
+from typing import List
+
+from pydantic import BaseModel
+
+from models.job_priority import JobPriority
+
+
+class DubJobStatus(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+
+class DubJobRequest(BaseModel):
+    """Parameters of the generate endpoint, run later by a worker."""
+    project_id: str
+    target_language: str
+    original_file_location: str
+    voice_ids: List[int] = []
+    is_cloning: bool = False
+    num_speakers: int | None = None
+    priority: JobPriority = JobPriority.NORMAL
+    # Probed media duration, 0 if unknown
+    media_seconds: float = 0.0
+
+
+class DubJob(DubJobRequest):
+    id: str
+    status: DubJobStatus = DubJobStatus.QUEUED
+    enqueued_at: float
+    # Key of the job in the queue order, the lowest runs first, see `get_job_sort_key`
+    sort_key: float = 0.0
+    attempts: int = 0
+    worker_id: str | None = None
+    # Unix time the lease of the running job ends at, another worker may claim the job afterwards
+    lease_expires_at: float | None = None
+    error: str | None = None
@@ -0,0 +1,7 @@
+from enum import Enum
+
+
+class JobPriority(str, Enum):
+    HIGH = "high"
+    NORMAL = "normal"
+    LOW = "low"
@@ -0,0 +1,18 @@
+from pydantic import BaseModel
+
+
+class MediaInfo(BaseModel):
+    duration: float
+    has_video: bool
+    has_audio: bool
+    audio_sample_rate: int = 0
+    audio_channels: int = 0
+    video_width: int = 0
+    video_height: int = 0
+    video_fps: float = 0.0
+
+
+class JobCost(BaseModel):
+    """Estimated peak memory and CPU work of a job."""
+    memory_mb: float
+    cpu_seconds: float
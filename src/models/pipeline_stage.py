@@ -0,0 +1,13 @@
+from enum import Enum
+
+
+class PipelineStage(str, Enum):
+    DOWNLOAD = "download"
+    DECODE = "decode"
+    SPEECH_TO_TEXT = "speechToText"
+    DIARIZATION = "diarization"
+    TRANSLATION = "translation"
+    TEXT_TO_SPEECH = "textToSpeech"
+    OVERLAY = "overlay"
+    MUX = "mux"
+    UPLOAD = "upload"
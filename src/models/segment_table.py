@@ -0,0 +1,165 @@
+from __future__ import annotations
+
+from typing import Iterable, List, Sequence
+
+import numpy as np
+
+from models.text_segment import TextSegment, TextSegmentWithAudioTimestamp
+
+
+class SegmentTable:
+    """
+    Text segments of a job stored as columns instead of one pydantic model per segment.
+
+    `starts` and `ends` are the segment times in the original media in seconds, `audio_starts` and `audio_ends`
+    the times in the synthesized audio in milliseconds, NaN until text to speech. Tables are not changed in place,
+    operations return new tables which share the columns they do not change.
+
+    Pipeline stages pass tables to each other, pydantic models are only built at API boundaries,
+    e.g. transcriber results and checkpoint documents.
+    """
+
+    def __init__(
+        self,
+        starts: Sequence[float],
+        ends: Sequence[float],
+        texts: List[str],
+        speakers: Sequence[int] | None = None,
+        audio_starts: Sequence[float] | None = None,
+        audio_ends: Sequence[float] | None = None
+    ):
+        self.starts = np.asarray(starts, dtype=np.float64)
+        self.ends = np.asarray(ends, dtype=np.float64)
+        self.texts = texts
+        self.speakers = (
+            np.zeros(len(texts), dtype=np.int32) if speakers is None else np.asarray(speakers, dtype=np.int32)
+        )
+        self.audio_starts = (
+            np.full(len(texts), np.nan) if audio_starts is None else np.asarray(audio_starts, dtype=np.float64)
+        )
+        self.audio_ends = (
+            np.full(len(texts), np.nan) if audio_ends is None else np.asarray(audio_ends, dtype=np.float64)
+        )
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    def __repr__(self) -> str:
+        # Transcripts have thousands of segments, logs get the shape of the table instead of its text
+        if not len(self):
+            return "SegmentTable(0 segments)"
+        return (
+            f"SegmentTable({len(self)} segments, {len(np.unique(self.speakers))} speakers, "
+            f"{self.starts.min():.2f}-{self.ends.max():.2f}s)"
+        )
+
+    @property
+    def has_audio_timestamps(self) -> bool:
+        return bool(len(self)) and not np.isnan(self.audio_starts).any()
+
+    @property
+    def durations(self) -> np.ndarray:
+        return self.ends - self.starts
+
+    def get_ordered_speakers(self) -> List[int]:
+        """Speaker ids in the order of their first segment."""
+        unique_speakers, first_indices = np.unique(self.speakers, return_index=True)
+        return [int(speaker) for speaker in unique_speakers[np.argsort(first_indices)]]
+
+    def take(self, indices: slice | np.ndarray) -> SegmentTable:
+        """The segments at the indices, a slice, an index array or a boolean mask."""
+        texts = self.texts[indices] if isinstance(indices, slice) else [
+            self.texts[index] for index in np.arange(len(self))[indices]
+        ]
+        return SegmentTable(
+            starts=self.starts[indices],
+            ends=self.ends[indices],
+            texts=texts,
+            speakers=self.speakers[indices],
+            audio_starts=self.audio_starts[indices],
+            audio_ends=self.audio_ends[indices]
+        )
+
+    def with_texts(self, texts: List[str]) -> SegmentTable:
+        return SegmentTable(self.starts, self.ends, texts, self.speakers, self.audio_starts, self.audio_ends)
+
+    def with_times(self, starts: np.ndarray, ends: np.ndarray) -> SegmentTable:
+        return SegmentTable(starts, ends, self.texts, self.speakers, self.audio_starts, self.audio_ends)
+
+    def with_audio_timestamps(self, audio_starts: Sequence[float], audio_ends: Sequence[float]) -> SegmentTable:
+        """Segments with their times in the synthesized audio, in milliseconds."""
+        return SegmentTable(self.starts, self.ends, self.texts, self.speakers, audio_starts, audio_ends)
+
+    def shift(self, offset: float) -> SegmentTable:
+        """Moves the segments by `offset` seconds in the original media."""
+        return self.with_times(self.starts + offset, self.ends + offset)
+
+    def scale(self, factor: float) -> SegmentTable:
+        """Scales the segment times in the original media, e.g. after changing the media speed."""
+        return self.with_times(self.starts * factor, self.ends * factor)
+
+    def get_overlapping(self, start: float, end: float) -> np.ndarray:
+        """Indices of the segments which overlap the interval in the original media, seconds."""
+        return np.flatnonzero((self.starts < end) & (self.ends > start))
+
+    def get_overlap_mask(self, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+        """(segments, intervals) mask of the segments which overlap each of the intervals, seconds."""
+        return (self.starts[:, np.newaxis] < ends[np.newaxis, :]) & (self.ends[:, np.newaxis] > starts[np.newaxis, :])
+
+    @classmethod
+    def concatenate(cls, tables: Iterable[SegmentTable]) -> SegmentTable:
+        tables = list(tables)
+        return cls(
+            starts=np.concatenate([table.starts for table in tables]) if tables else [],
+            ends=np.concatenate([table.ends for table in tables]) if tables else [],
+            texts=[text for table in tables for text in table.texts],
+            speakers=np.concatenate([table.speakers for table in tables]) if tables else [],
+            audio_starts=np.concatenate([table.audio_starts for table in tables]) if tables else [],
+            audio_ends=np.concatenate([table.audio_ends for table in tables]) if tables else []
+        )
+
+    @classmethod
+    def from_segments(cls, segments: List[TextSegment]) -> SegmentTable:
+        audio_timestamps = [getattr(segment, "audio_timestamp", (np.nan, np.nan)) for segment in segments]
+        return cls(
+            starts=[segment.original_timestamp[0] for segment in segments],
+            ends=[segment.original_timestamp[1] for segment in segments],
+            texts=[segment.text for segment in segments],
+            speakers=[segment.speaker for segment in segments],
+            audio_starts=[audio_start for audio_start, _ in audio_timestamps],
+            audio_ends=[audio_end for _, audio_end in audio_timestamps]
+        )
+
+    def to_segments(self) -> List[TextSegment]:
+        """
+        The segments as pydantic models, TextSegmentWithAudioTimestamp once the audio times are set.
+        Values come from the table, so models are built without validation.
+        """
+        records = self.to_records()
+        model = TextSegmentWithAudioTimestamp if self.has_audio_timestamps else TextSegment
+        return [model.construct(**record) for record in records]
+
+    @classmethod
+    def from_records(cls, records: List[dict]) -> SegmentTable:
+        """Reads segments in the format of `to_records`, e.g. of a checkpoint, without building models."""
+        audio_timestamps = [record.get("audio_timestamp") or (np.nan, np.nan) for record in records]
+        return cls(
+            starts=[record["original_timestamp"][0] for record in records],
+            ends=[record["original_timestamp"][1] for record in records],
+            texts=[record["text"] for record in records],
+            speakers=[record.get("speaker", 0) for record in records],
+            audio_starts=[audio_start for audio_start, _ in audio_timestamps],
+            audio_ends=[audio_end for _, audio_end in audio_timestamps]
+        )
+
+    def to_records(self) -> List[dict]:
+        """JSON-serializable segments, the same as `dict()` of their pydantic models."""
+        starts, ends, speakers = self.starts.tolist(), self.ends.tolist(), self.speakers.tolist()
+        records = [
+            {"original_timestamp": (start, end), "text": text, "speaker": speaker}
+            for start, end, text, speaker in zip(starts, ends, self.texts, speakers)
+        ]
+        if self.has_audio_timestamps:
+            for record, audio_start, audio_end in zip(records, self.audio_starts.tolist(), self.audio_ends.tolist()):
+                record["audio_timestamp"] = (audio_start, audio_end)
+        return records
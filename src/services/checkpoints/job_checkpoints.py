@@ -0,0 +1,189 @@
+import hashlib
+import json
+import os
+import shutil
+from typing import Dict
+
+from configs.env import CHECKPOINTS_ENABLED, CHECKPOINTS_IN_BUCKET
+from configs.logger import print_info_log
+from constants.log_tags import LogTag
+from models.pipeline_stage import PipelineStage
+from services.firebase.storage.get_bucket import get_bucket
+from services.firebase.storage.get_blob_version import get_blob_version
+from utils.workspace import get_job_workspace_dir
+
+CHECKPOINTS_DIR_NAME = "checkpoints"
+CHECKPOINTS_BLOB_DIR = "checkpoints"
+FINGERPRINT_FILE_NAME = "fingerprint"
+
+
+class JobCheckpoints:
+    """
+    Outputs of finished stages of a job, kept in the `checkpoints` dir of the job workspace
+    and mirrored to the bucket with CHECKPOINTS_IN_BUCKET, so a retried job skips the stages already done.
+
+    A checkpoint is a JSON document plus files. Checkpoints belong to one fingerprint of the job inputs:
+    if the source media or the job parameters change, the old checkpoints are dropped.
+    """
+
+    def __init__(self, project_id: str, fingerprint: str, show_logs: bool = False):
+        self.project_id = project_id
+        self.fingerprint = fingerprint
+        self.show_logs = show_logs
+        self.checkpoints_dir = os.path.join(get_job_workspace_dir(project_id), CHECKPOINTS_DIR_NAME)
+        self.bucket = get_bucket() if CHECKPOINTS_IN_BUCKET else None
+
+        if self.read_fingerprint() != fingerprint:
+            self.clear()
+            os.makedirs(self.checkpoints_dir, exist_ok=True)
+            self.write_file(FINGERPRINT_FILE_NAME, fingerprint.encode())
+
+    def get_blob_name(self, file_name: str) -> str:
+        return f"{CHECKPOINTS_BLOB_DIR}/{self.project_id}/{file_name}"
+
+    def fetch_file(self, file_name: str) -> str | None:
+        """Returns the local path of the checkpoint file, downloaded from the bucket if it is only there."""
+        file_path = os.path.join(self.checkpoints_dir, file_name)
+        if os.path.exists(file_path):
+            return file_path
+
+        if self.bucket is not None:
+            blob = self.bucket.get_blob(self.get_blob_name(file_name))
+            if blob is not None:
+                os.makedirs(self.checkpoints_dir, exist_ok=True)
+                blob.download_to_filename(file_path)
+                return file_path
+        return None
+
+    def write_file(self, file_name: str, content: bytes):
+        file_path = os.path.join(self.checkpoints_dir, file_name)
+        # Written whole or not at all, a crash never leaves a partial checkpoint
+        with open(f"{file_path}.tmp", "wb") as file:
+            file.write(content)
+        os.replace(f"{file_path}.tmp", file_path)
+        self.mirror_file(file_name)
+
+    def copy_file(self, source_file_path: str, file_name: str):
+        file_path = os.path.join(self.checkpoints_dir, file_name)
+        shutil.copyfile(source_file_path, f"{file_path}.tmp")
+        os.replace(f"{file_path}.tmp", file_path)
+        self.mirror_file(file_name)
+
+    def mirror_file(self, file_name: str):
+        if self.bucket is not None:
+            self.bucket.blob(self.get_blob_name(file_name)).upload_from_filename(
+                os.path.join(self.checkpoints_dir, file_name)
+            )
+
+    def read_fingerprint(self) -> str | None:
+        file_path = self.fetch_file(FINGERPRINT_FILE_NAME)
+        if file_path is None:
+            return None
+        with open(file_path) as file:
+            return file.read()
+
+    def load(self, stage: PipelineStage) -> dict | None:
+        """
+        Returns the checkpoint of the stage, None if the stage has not finished.
+        Files of the checkpoint are under `files` by name, as local paths.
+        """
+        document_path = self.fetch_file(f"{stage.value}.json")
+        if document_path is None:
+            return None
+
+        with open(document_path) as document_file:
+            checkpoint = json.load(document_file)
+
+        file_paths = {}
+        for name, file_name in checkpoint.get("files", {}).items():
+            file_path = self.fetch_file(file_name)
+            if file_path is None:
+                return None
+            file_paths[name] = file_path
+        checkpoint["files"] = file_paths
+
+        if self.show_logs:
+            print_info_log(
+                tag=LogTag.CHECKPOINTS,
+                message=f"Stage {stage.value} of project {self.project_id} is resumed from its checkpoint"
+            )
+        return checkpoint
+
+    def save(self, stage: PipelineStage, data: dict, files: Dict[str, str] | None = None):
+        """
+        Saves the stage outputs. The JSON document is written last, so the checkpoint only exists with its files.
+
+        :param stage: The finished stage.
+        :param data: JSON-serializable outputs of the stage.
+        :param files: Output files of the stage by name, copied to the checkpoint.
+        """
+        os.makedirs(self.checkpoints_dir, exist_ok=True)
+        file_names = {}
+        for name, source_file_path in (files or {}).items():
+            file_name = f"{stage.value}-{name}{os.path.splitext(source_file_path)[1]}"
+            self.copy_file(source_file_path, file_name)
+            file_names[name] = file_name
+
+        self.write_file(f"{stage.value}.json", json.dumps({"data": data, "files": file_names}).encode())
+
+        if self.show_logs:
+            print_info_log(
+                tag=LogTag.CHECKPOINTS,
+                message=f"Checkpoint of stage {stage.value} of project {self.project_id} is saved"
+            )
+
+    def clear(self):
+        """Removes all checkpoints of the project, e.g. once the job is done."""
+        if os.path.exists(self.checkpoints_dir):
+            shutil.rmtree(self.checkpoints_dir)
+
+        if self.bucket is not None:
+            for blob in self.bucket.list_blobs(prefix=f"{CHECKPOINTS_BLOB_DIR}/{self.project_id}/"):
+                blob.delete()
+
+
+class DisabledJobCheckpoints:
+    """Stands in for checkpoints when CHECKPOINTS_ENABLED is off, nothing is loaded or saved."""
+
+    def load(self, stage: PipelineStage) -> dict | None:
+        return None
+
+    def save(self, stage: PipelineStage, data: dict, files: Dict[str, str] | None = None):
+        pass
+
+    def clear(self):
+        pass
+
+
+def get_job_fingerprint(source_blob_path: str, **job_parameters) -> str:
+    """Hash of the source media version and the job parameters, which the stage outputs depend on."""
+    fingerprint_source = json.dumps(
+        {"source": source_blob_path, "version": get_blob_version(source_blob_path), "parameters": job_parameters},
+        sort_keys=True,
+        default=str
+    )
+    return hashlib.sha256(fingerprint_source.encode()).hexdigest()
+
+
+def get_job_checkpoints(
+    project_id: str,
+    source_blob_path: str,
+    show_logs: bool = False,
+    **job_parameters
+) -> JobCheckpoints | DisabledJobCheckpoints:
+    """
+    Returns the checkpoints of the project job for its current inputs.
+
+    :param project_id: The id of the processing project.
+    :param source_blob_path: The location of the original media file in the cloud storage.
+    :param show_logs: Determines whether to display logs of checkpoints.
+    :param job_parameters: Job parameters which change the stage outputs, e.g. the target language.
+    """
+    if not CHECKPOINTS_ENABLED:
+        return DisabledJobCheckpoints()
+
+    return JobCheckpoints(
+        project_id=project_id,
+        fingerprint=get_job_fingerprint(source_blob_path, **job_parameters),
+        show_logs=show_logs
+    )
@@ -1,3 +0,0 @@
-from services.firebase.init_firebase import init_firebase
-
-init_firebase()
@@ -0,0 +1,97 @@
+import threading
+import time
+
+from configs.env import PROJECT_PROGRESS_UPDATE_INTERVAL
+from configs.logger import print_info_log
+from constants.log_tags import LogTag
+from models.pipeline_stage import PipelineStage
+from services.firebase.firestore.update_project import update_project_fields_by_id
+
+
+class ProjectProgressReporter:
+    """
+    Publishes the current stage and its percent of processed segments to the mini project.
+
+    Reports are coalesced: at most one write per `min_interval` seconds is made, and only
+    the latest report of the interval is written.
+    """
+
+    def __init__(
+        self,
+        project_id: str,
+        min_interval: float = PROJECT_PROGRESS_UPDATE_INTERVAL,
+        show_logs: bool = False
+    ):
+        self.project_id = project_id
+        self.min_interval = min_interval
+        self.show_logs = show_logs
+
+        self.lock = threading.Lock()
+        self.pending_fields = None
+        self.last_written_fields = None
+        self.last_write_time = 0.0
+        self.timer = None
+
+    def report(self, stage: PipelineStage, completed: int, total: int):
+        """
+        :param stage: The current pipeline stage.
+        :param completed: The number of processed work units (segments) of the stage.
+        :param total: The number of all work units of the stage.
+        """
+        percent = 100 if total == 0 else min(100, int(completed * 100 / total))
+
+        with self.lock:
+            self.pending_fields = {
+                "translationStage": stage.value,
+                "translationProgress": percent
+            }
+
+            delay = self.last_write_time + self.min_interval - time.monotonic()
+            if delay <= 0:
+                self.write_pending_fields()
+            elif self.timer is None:
+                # Write the latest report once the interval is over
+                self.timer = threading.Timer(delay, self.write_on_timer)
+                self.timer.daemon = True
+                self.timer.start()
+
+    def write_on_timer(self):
+        with self.lock:
+            self.timer = None
+            self.write_pending_fields()
+
+    def write_pending_fields(self):
+        fields = self.pending_fields
+        self.pending_fields = None
+
+        if fields is None or fields == self.last_written_fields:
+            return
+
+        self.last_write_time = time.monotonic()
+        self.last_written_fields = fields
+
+        try:
+            update_project_fields_by_id(
+                project_id=self.project_id,
+                project_fields_to_update=fields
+            )
+        except Exception as e:
+            # Progress is informational, it must never fail the job
+            print_info_log(
+                tag=LogTag.UPDATE_PROJECT,
+                message=f"Project progress was not updated: {e}"
+            )
+
+        if self.show_logs:
+            print_info_log(
+                tag=LogTag.UPDATE_PROJECT,
+                message=f"Project {self.project_id} progress: {fields}"
+            )
+
+    def flush(self):
+        """Writes the last report right away, call at the end of the job."""
+        with self.lock:
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+            self.write_pending_fields()
@@ -1,47 +1,62 @@
 from configs.firebase import MINI_PROJECTS_COLLECTION
 from configs.logger import print_info_log, catch_error
 from constants.log_tags import LogTag
-from services.firebase.init_firebase import get_firestore
+from services.project_store.get_project_store import get_project_store
+from services.project_store.project_store import ProjectNotFoundError
+from services.sentry.tracing import trace_span
 
 
-def update_project_status_and_translated_link_by_id(
+def update_project_fields_by_id(
     project_id: str,
-    status: str,
-    translated_file_link: str,
+    project_fields_to_update: dict,
     show_logs: bool = False
 ):
+    """
+    Updates the mini project fields with a single write, without reading the project first.
+    The write goes to the configured project store and fails if the project does not exist.
+
+    :param project_id: The id of the processing project.
+    :param project_fields_to_update: The project fields with their new values.
+    :param show_logs: Determines whether to display logs while updating.
+    """
     log_tag = LogTag.UPDATE_PROJECT
 
-    project_fields_to_update = {
-        "id": project_id,
-        "status": status,
-        "translatedFileLink": translated_file_link
-    }
-
     if show_logs:
         print_info_log(
             tag=log_tag,
             message=f"Project fields to update: {project_fields_to_update}"
         )
 
-    firestore = get_firestore()
-    project_ref = firestore.collection(MINI_PROJECTS_COLLECTION).document(project_id)
-    project_snap = project_ref.get()
+    project_store = get_project_store()
 
-    if not project_snap.exists:
+    try:
+        with trace_span(op="db.firestore", description=f"update {MINI_PROJECTS_COLLECTION}"):
+            project_store.update_project(project_id, project_fields_to_update)
+    except ProjectNotFoundError as error:
         catch_error(
             tag=log_tag,
-            error=Exception(f"Mini project with id {project_id} does not exist.")
+            error=error
         )
 
-    project_ref.update({
-        "id": project_id,
-        "status": status,
-        "translatedFileLink": translated_file_link
-    })
-
     if show_logs:
         print_info_log(
             tag=log_tag,
             message=f"Mini project was updated with fields: {project_fields_to_update}"
         )
+
+
+def update_project_status_and_translated_link_by_id(
+    project_id: str,
+    status: str,
+    translated_file_link: str,
+    show_logs: bool = False
+):
+    update_project_fields_by_id(
+        project_id=project_id,
+        project_fields_to_update={
+            "id": project_id,
+            "status": status,
+            "translatedFileLink": translated_file_link
+        },
+        show_logs=show_logs
+    )
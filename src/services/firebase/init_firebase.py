@@ -1,12 +1,23 @@
+import threading
+
+import firebase_admin
 from firebase_admin import credentials, initialize_app, firestore
 
 from configs.env import CERTIFICATE_CONTENT
 
+init_lock = threading.Lock()
+
 
 def init_firebase():
-    cred = credentials.Certificate(CERTIFICATE_CONTENT)
-    initialize_app(cred)
+    """Initializes the default Firebase app once, on the first use of a Firebase backend."""
+    with init_lock:
+        try:
+            firebase_admin.get_app()
+        except ValueError:
+            cred = credentials.Certificate(CERTIFICATE_CONTENT)
+            initialize_app(cred)
 
 
 def get_firestore():
+    init_firebase()
     return firestore.client()
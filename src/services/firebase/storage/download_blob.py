@@ -1,16 +1,152 @@
+import base64
+import hashlib
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, List, Tuple
 
-from configs.firebase import bucket
+from configs.env import DOWNLOAD_CHUNK_SIZE, DOWNLOAD_MAX_WORKERS, DOWNLOAD_MAX_RETRIES
 from configs.logger import catch_error, print_info_log
 from constants.files import PROCESSING_FILES_DIR_PATH
 from constants.log_tags import LogTag
+from services.firebase.storage.get_bucket import get_bucket
+from services.sentry.tracing import trace_span
+
+# Delay before the first chunk retry, doubled on every next attempt
+CHUNK_RETRY_DELAY_IN_SECONDS = 0.5
+
+
+class BlobChecksum:
+    """
+    Incremental checksum of the blob content, compared with the checksum stored in Cloud Storage.
+
+    MD5 is used when the blob has it, composite objects only have CRC32C.
+    """
+
+    def __init__(self, blob):
+        self.expected = None
+        self.hasher = None
+
+        if blob.md5_hash:
+            self.name = "md5"
+            self.expected = blob.md5_hash
+            self.hasher = hashlib.md5()
+        elif blob.crc32c:
+            import google_crc32c
+
+            self.name = "crc32c"
+            self.expected = blob.crc32c
+            self.hasher = google_crc32c.Checksum()
+
+    def update(self, data: bytes):
+        if self.hasher is not None:
+            self.hasher.update(data)
+
+    def verify(self):
+        if self.hasher is None:
+            return
+
+        actual = base64.b64encode(self.hasher.digest()).decode("utf-8")
+        if actual != self.expected:
+            raise ValueError(f"Downloaded file {self.name} checksum {actual} does not match expected {self.expected}.")
+
+
+def split_to_byte_ranges(size: int, chunk_size: int) -> List[Tuple[int, int]]:
+    """
+    Splits `size` bytes into inclusive (start, end) byte ranges of at most `chunk_size` bytes.
+    """
+    return [(start, min(start + chunk_size, size) - 1) for start in range(0, size, chunk_size)]
+
+
+def download_byte_range(blob, file_descriptor: int, start: int, end: int, max_retries: int) -> int:
+    """
+    Downloads one byte range of the blob and writes it to its offset in the destination file.
+    The range is re-requested on errors and short reads.
+
+    :return: The length of the range. The data is not returned, so it is freed once written.
+    """
+    expected_length = end - start + 1
+
+    for attempt in range(max_retries + 1):
+        try:
+            data = blob.download_as_bytes(start=start, end=end, checksum=None)
+            if len(data) != expected_length:
+                raise IOError(f"Range {start}-{end} returned {len(data)} bytes instead of {expected_length}.")
+
+            os.pwrite(file_descriptor, data, start)
+            return len(data)
+
+        except Exception as e:
+            if attempt == max_retries:
+                raise e
+            time.sleep(CHUNK_RETRY_DELAY_IN_SECONDS * 2 ** attempt)
+
+
+def download_blob_in_ranges(
+    blob,
+    destination_file_path: str,
+    chunk_size: int = DOWNLOAD_CHUNK_SIZE,
+    max_workers: int = DOWNLOAD_MAX_WORKERS,
+    max_retries: int = DOWNLOAD_MAX_RETRIES,
+    on_bytes: Callable[[bytes], None] | None = None,
+):
+    """
+    Downloads the blob as parallel byte ranges into a preallocated file.
+
+    :param blob: The blob with loaded metadata (size and checksums).
+    :param destination_file_path: The local path to save the file to.
+    :param chunk_size: The size of one byte range in bytes.
+    :param max_workers: The number of ranges downloaded at the same time.
+    :param max_retries: The number of retries for one failed range.
+    :param on_bytes: Called with the file content in order, while the rest of the file is still downloading.
+    """
+
+    byte_ranges = split_to_byte_ranges(blob.size, chunk_size)
+    checksum = BlobChecksum(blob)
+
+    # Lengths of ranges finished out of order, they wait here until the preceding ones are done
+    finished_ranges = {}
+    next_offset = 0
+
+    # Handed over parts are read back from the file, so at most one range is held in memory at a time
+    file_descriptor = os.open(destination_file_path, os.O_RDWR | os.O_CREAT | os.O_TRUNC)
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        # Preallocate file, so ranges can be written to their offsets
+        if blob.size > 0:
+            os.posix_fallocate(file_descriptor, 0, blob.size)
+
+        futures = {
+            executor.submit(download_byte_range, blob, file_descriptor, start, end, max_retries): start
+            for start, end in byte_ranges
+        }
+
+        for future in as_completed(futures):
+            finished_ranges[futures.pop(future)] = future.result()
+
+            # Hand over the contiguous downloaded part of the file
+            while next_offset in finished_ranges:
+                length = finished_ranges.pop(next_offset)
+                data = os.pread(file_descriptor, length, next_offset)
+                checksum.update(data)
+                if on_bytes is not None:
+                    on_bytes(data)
+                next_offset += length
+
+        checksum.verify()
+
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+        os.close(file_descriptor)
 
 
 def download_blob(
     source_blob_path: str,
     destination_file_path: str,
     project_id: str,
-    show_logs: bool = False
+    show_logs: bool = False,
+    bucket=None,
+    on_bytes: Callable[[bytes], None] | None = None,
 ):
     log_tag = LogTag.DOWNLOAD_BLOB
 
@@ -49,8 +185,26 @@ def download_blob(
                 message=f"Dir created on path {project_dir}"
             )
 
-        blob = bucket.blob(source_blob_path)
-        blob.download_to_filename(destination_file_path)
+        if bucket is None:
+            bucket = get_bucket()
+
+        # Get blob with its size and checksums
+        blob = bucket.get_blob(source_blob_path)
+        if blob is None:
+            raise FileNotFoundError(f"Blob {source_blob_path} does not exist in bucket {bucket.name}.")
+
+        if show_logs:
+            print_info_log(
+                tag=log_tag,
+                message=f"Downloading {blob.size} bytes in chunks of {DOWNLOAD_CHUNK_SIZE} bytes..."
+            )
+
+        with trace_span(op="storage.download", description=source_blob_path):
+            download_blob_in_ranges(
+                blob=blob,
+                destination_file_path=destination_file_path,
+                on_bytes=on_bytes
+            )
 
         if show_logs:
             print_info_log(
@@ -64,3 +218,19 @@ def download_blob(
             error=e,
             project_id=project_id
         )
+
+
+# For local test
+if __name__ == "__main__":
+    from services.firebase.storage.local_bucket import LocalBucket
+
+    test_bucket = LocalBucket(root_dir=f"{PROCESSING_FILES_DIR_PATH}/local-bucket")
+    test_project_id = "07fsfECkwma6fVTDyqQf"
+    test_blob_path = f"z8Z5j71WbmhaioUHDHh5KrBqEO13/{test_project_id}/test-video-1min.mp4"
+    download_blob(
+        source_blob_path=test_blob_path,
+        destination_file_path=f"{PROCESSING_FILES_DIR_PATH}/{test_project_id}.mp4",
+        project_id=test_project_id,
+        show_logs=True,
+        bucket=test_bucket
+    )
@@ -0,0 +1,19 @@
+from datetime import timedelta
+
+from services.firebase.storage.get_bucket import get_bucket
+
+SIGNED_URL_EXPIRATION = timedelta(minutes=15)
+
+
+def get_blob_signed_url(source_blob_path: str, bucket=None) -> str:
+    """
+    Returns a short-lived URL to read the blob without downloading it first, e.g. to probe its headers.
+
+    :param source_blob_path: The path of the blob in the bucket.
+    :param bucket: The bucket to read from, the configured bucket by default.
+    """
+    if bucket is None:
+        bucket = get_bucket()
+
+    blob = bucket.blob(source_blob_path)
+    return blob.generate_signed_url(expiration=SIGNED_URL_EXPIRATION, version="v4")
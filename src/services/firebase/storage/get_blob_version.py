@@ -0,0 +1,18 @@
+from services.firebase.storage.get_bucket import get_bucket
+
+
+def get_blob_version(source_blob_path: str, bucket=None) -> str:
+    """
+    Returns the version of the blob content from its metadata, without downloading it.
+    The version changes when another file is uploaded to the path, it is empty if the blob does not exist.
+
+    :param source_blob_path: The path of the blob in the bucket.
+    :param bucket: The bucket to read from, the configured bucket by default.
+    """
+    if bucket is None:
+        bucket = get_bucket()
+
+    blob = bucket.get_blob(source_blob_path)
+    if blob is None:
+        return ""
+    return blob.md5_hash or blob.crc32c or str(blob.size)
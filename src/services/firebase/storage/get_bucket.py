@@ -0,0 +1,23 @@
+from functools import lru_cache
+
+from configs.env import BUCKET_NAME, LOCAL_STORAGE_DIR, STORAGE_BACKEND
+from constants.backends import StorageBackend
+from constants.files import PROCESSING_FILES_DIR_PATH
+
+
+@lru_cache(maxsize=None)
+def get_bucket():
+    """
+    Returns the bucket of the configured STORAGE_BACKEND:
+    the Firebase Cloud Storage bucket or a LocalBucket in LOCAL_STORAGE_DIR (tmp/local-bucket by default).
+    """
+    if STORAGE_BACKEND == StorageBackend.LOCAL:
+        from services.firebase.storage.local_bucket import LocalBucket
+
+        return LocalBucket(root_dir=LOCAL_STORAGE_DIR or f"{PROCESSING_FILES_DIR_PATH}/local-bucket")
+
+    from firebase_admin import storage
+    from services.firebase.init_firebase import init_firebase
+
+    init_firebase()
+    return storage.bucket(name=BUCKET_NAME)
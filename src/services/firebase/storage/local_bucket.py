@@ -0,0 +1,105 @@
+import base64
+import hashlib
+import os
+import shutil
+from pathlib import Path
+
+
+class LocalBlob:
+    """
+    Filesystem stand-in for a Cloud Storage blob.
+
+    Implements the subset of the google-cloud-storage Blob API used by the pipeline,
+    so storage code can be run against a local directory instead of a real bucket.
+    """
+
+    def __init__(self, bucket: "LocalBucket", name: str):
+        self.bucket = bucket
+        self.name = name
+        self.size = None
+        self.md5_hash = None
+        self.crc32c = None
+
+    @property
+    def path(self) -> str:
+        return os.path.join(self.bucket.root_dir, self.name)
+
+    @property
+    def public_url(self) -> str:
+        return Path(self.path).absolute().as_uri()
+
+    def exists(self) -> bool:
+        return os.path.isfile(self.path)
+
+    def reload(self):
+        if not self.exists():
+            raise FileNotFoundError(f"Blob {self.name} does not exist in {self.bucket.root_dir}")
+
+        md5 = hashlib.md5()
+        with open(self.path, "rb") as file:
+            for block in iter(lambda: file.read(1024 * 1024), b""):
+                md5.update(block)
+
+        self.size = os.path.getsize(self.path)
+        self.md5_hash = base64.b64encode(md5.digest()).decode("utf-8")
+
+    def download_as_bytes(self, start: int = None, end: int = None, **kwargs) -> bytes:
+        """Reads the blob content, `end` is inclusive like in google-cloud-storage."""
+        with open(self.path, "rb") as file:
+            start = start or 0
+            file.seek(start)
+            if end is None:
+                return file.read()
+            return file.read(end - start + 1)
+
+    def download_to_filename(self, filename: str, **kwargs):
+        shutil.copyfile(self.path, filename)
+
+    def upload_from_filename(self, filename: str, **kwargs):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        shutil.copyfile(filename, self.path)
+        self.reload()
+
+    def create_resumable_upload_session(self, **kwargs) -> str:
+        """Creates an empty part file, which is moved to the blob path when the upload is finished."""
+        part_file_path = f"{self.path}.part"
+        os.makedirs(os.path.dirname(part_file_path), exist_ok=True)
+        open(part_file_path, "wb").close()
+        return Path(part_file_path).absolute().as_uri()
+
+    def delete(self):
+        os.remove(self.path)
+
+    def make_public(self):
+        pass
+
+    def generate_signed_url(self, **kwargs) -> str:
+        """Local files are read by path."""
+        return str(Path(self.path).absolute())
+
+
+class LocalBucket:
+    """Filesystem stand-in for a Cloud Storage bucket rooted at `root_dir`."""
+
+    def __init__(self, root_dir: str):
+        self.root_dir = root_dir
+        self.name = os.path.basename(os.path.abspath(root_dir))
+
+    def blob(self, blob_name: str) -> LocalBlob:
+        return LocalBlob(bucket=self, name=blob_name)
+
+    def get_blob(self, blob_name: str) -> LocalBlob | None:
+        blob = self.blob(blob_name)
+        if not blob.exists():
+            return None
+        blob.reload()
+        return blob
+
+    def list_blobs(self, prefix: str = "") -> list:
+        blobs = []
+        for dir_path, _, file_names in os.walk(self.root_dir):
+            for file_name in file_names:
+                blob_name = os.path.relpath(os.path.join(dir_path, file_name), self.root_dir).replace(os.sep, "/")
+                if blob_name.startswith(prefix):
+                    blobs.append(self.blob(blob_name))
+        return blobs
@@ -0,0 +1,209 @@
+import os
+import re
+import time
+from typing import BinaryIO, Callable
+from urllib.parse import urlparse
+from urllib.request import url2pathname
+
+import requests
+
+from configs.env import UPLOAD_CHUNK_SIZE, UPLOAD_MAX_RETRIES
+
+# Non-final chunks of a resumable upload must be a multiple of this size
+RESUMABLE_UPLOAD_CHUNK_GRANULARITY = 256 * 1024
+
+# Delay before the first chunk retry, doubled on every next attempt
+CHUNK_RETRY_DELAY_IN_SECONDS = 0.5
+
+# Status code of a chunk accepted in the middle of the upload
+RESUME_INCOMPLETE_STATUS_CODE = 308
+
+
+class ResumableUploadSession:
+    """
+    Cloud Storage resumable upload session.
+
+    The session url authorizes the upload itself, so chunks are sent without credentials.
+    """
+
+    def __init__(self, session_url: str):
+        self.session_url = session_url
+
+    def put_chunk(self, data: bytes, offset: int, total_size: int | None = None) -> int | None:
+        """
+        Sends `data` starting at `offset` of the object.
+
+        :param total_size: The object size, set only for the final chunk.
+        :return: The number of saved bytes, it may end before the chunk does, or None if the upload is finished.
+        """
+        total = "*" if total_size is None else str(total_size)
+        if len(data) == 0:
+            content_range = f"bytes */{total}"
+        else:
+            content_range = f"bytes {offset}-{offset + len(data) - 1}/{total}"
+
+        response = requests.put(
+            self.session_url,
+            data=data,
+            headers={"Content-Range": content_range}
+        )
+        if response.status_code not in [200, 201, RESUME_INCOMPLETE_STATUS_CODE]:
+            raise IOError(f"Chunk upload failed with status {response.status_code}: {response.text}")
+        return get_response_persisted_size(response)
+
+    def get_persisted_size(self) -> int | None:
+        """
+        Asks the session how many bytes are already saved, to resume after a failed chunk.
+
+        :return: The number of saved bytes or None if the upload is already finished.
+        """
+        response = requests.put(
+            self.session_url,
+            headers={"Content-Range": "bytes */*"}
+        )
+        if response.status_code in [200, 201]:
+            return None
+        if response.status_code != RESUME_INCOMPLETE_STATUS_CODE:
+            raise IOError(f"Upload status request failed with status {response.status_code}: {response.text}")
+        return get_response_persisted_size(response)
+
+    def cancel(self):
+        requests.delete(self.session_url)
+
+
+def get_response_persisted_size(response: requests.Response) -> int | None:
+    """Saved bytes from the `Range` header of an unfinished upload, None if the upload is finished."""
+    if response.status_code in [200, 201]:
+        return None
+
+    persisted_range = response.headers.get("Range")
+    if persisted_range is None:
+        return 0
+    return int(re.search(r"bytes=0-(\d+)", persisted_range).group(1)) + 1
+
+
+class LocalResumableUploadSession:
+    """Resumable upload session of a LocalBlob, writes chunks to a part file next to the blob."""
+
+    def __init__(self, session_url: str):
+        self.part_file_path = url2pathname(urlparse(session_url).path)
+        self.blob_file_path = self.part_file_path.removesuffix(".part")
+
+    def put_chunk(self, data: bytes, offset: int, total_size: int | None = None) -> int | None:
+        with open(self.part_file_path, "r+b") as file:
+            file.seek(offset)
+            file.write(data)
+            file.truncate()
+
+        if total_size is not None:
+            os.replace(self.part_file_path, self.blob_file_path)
+            return None
+        return offset + len(data)
+
+    def get_persisted_size(self) -> int | None:
+        if not os.path.exists(self.part_file_path):
+            return None
+        return os.path.getsize(self.part_file_path)
+
+    def cancel(self):
+        if os.path.exists(self.part_file_path):
+            os.remove(self.part_file_path)
+
+
+def open_resumable_upload_session(blob, content_type: str):
+    """
+    Starts a resumable upload of the blob, which is publicly readable once finished.
+    Setting the ACL with the session saves a separate make_public request.
+    """
+    session_url = blob.create_resumable_upload_session(
+        content_type=content_type,
+        predefined_acl="publicRead"
+    )
+    if session_url.startswith("file://"):
+        return LocalResumableUploadSession(session_url)
+    return ResumableUploadSession(session_url)
+
+
+def put_chunk_with_retries(session, data: bytes, offset: int, total_size: int | None, max_retries: int):
+    """
+    Sends one chunk until the session has all of it. The session may save only a part of the chunk,
+    e.g. Cloud Storage answers 308 with a shorter `Range`, and on failure it is asked which part was saved.
+    The rest of the chunk is sent again in both cases.
+    """
+    chunk_offset = offset
+    chunk_end = offset + len(data)
+
+    attempt = 0
+    while True:
+        try:
+            persisted_size = session.put_chunk(data=data, offset=chunk_offset, total_size=total_size)
+            if persisted_size is not None and persisted_size <= chunk_offset and data:
+                raise IOError(f"Upload session saved no bytes of the chunk at offset {chunk_offset}.")
+        except Exception as e:
+            if attempt == max_retries:
+                raise e
+            time.sleep(CHUNK_RETRY_DELAY_IN_SECONDS * 2 ** attempt)
+            attempt += 1
+
+            try:
+                persisted_size = session.get_persisted_size()
+            except Exception:
+                # The chunk is sent again as is, the session ignores the bytes it already has
+                continue
+
+        # The final chunk was saved, maybe only its response was lost
+        if persisted_size is None:
+            return
+        if total_size is None and persisted_size >= chunk_end:
+            return
+        if persisted_size < offset:
+            raise IOError(f"Upload session lost data before offset {offset}, persisted {persisted_size} bytes.")
+
+        # Drop the part of the chunk the session already has
+        data = data[persisted_size - chunk_offset:]
+        chunk_offset = persisted_size
+
+
+def upload_stream_in_chunks(
+    session,
+    stream: BinaryIO,
+    chunk_size: int = UPLOAD_CHUNK_SIZE,
+    max_retries: int = UPLOAD_MAX_RETRIES,
+    before_final_chunk: Callable[[], None] | None = None,
+) -> int:
+    """
+    Uploads the stream to the resumable upload session chunk by chunk, while the stream is still written.
+
+    :param session: The resumable upload session.
+    :param stream: The binary stream, read until EOF.
+    :param chunk_size: The size of one uploaded chunk in bytes.
+    :param max_retries: The number of retries for one failed chunk.
+    :param before_final_chunk: Called at the end of the stream, raise in it to leave the upload unfinished.
+
+    :return: The number of uploaded bytes.
+    """
+    if chunk_size % RESUMABLE_UPLOAD_CHUNK_GRANULARITY != 0:
+        raise ValueError(f"Upload chunk size must be a multiple of {RESUMABLE_UPLOAD_CHUNK_GRANULARITY} bytes.")
+
+    buffer = bytearray()
+    offset = 0
+
+    while True:
+        data = stream.read(chunk_size)
+        if not data:
+            break
+        buffer += data
+
+        # Keep at least one byte, so the final chunk is never empty unless the stream is
+        while len(buffer) > chunk_size:
+            put_chunk_with_retries(session, bytes(buffer[:chunk_size]), offset, None, max_retries)
+            del buffer[:chunk_size]
+            offset += chunk_size
+
+    if before_final_chunk is not None:
+        before_final_chunk()
+
+    total_size = offset + len(buffer)
+    put_chunk_with_retries(session, bytes(buffer), offset, total_size, max_retries)
+
+    return total_size
@@ -0,0 +1,142 @@
+import errno
+import os
+import threading
+import time
+
+from configs.env import UPLOAD_CHUNK_SIZE, UPLOAD_MAX_RETRIES
+from configs.logger import catch_error, print_info_log
+from constants.log_tags import LogTag
+from services.firebase.storage.get_bucket import get_bucket
+from services.firebase.storage.resumable_upload import open_resumable_upload_session, upload_stream_in_chunks
+from services.firebase.storage.upload_blob import get_content_type
+from services.sentry.tracing import trace_span
+
+# ffmpeg flags for an mp4 which is written strictly forward, so it can be muxed into a pipe
+STREAMABLE_MP4_FFMPEG_PARAMS = ["-movflags", "frag_keyframe+empty_moov"]
+# Time the aborted upload is given to stop its reader thread
+ABORT_TIMEOUT_SECONDS = 10
+
+
+class StreamingBlobUpload:
+    """
+    Uploads a file to Cloud Storage while the file is still written by an encoder.
+
+    The encoder writes to `fifo_path`, a named pipe, instead of a regular file. A background thread
+    reads the pipe and sends every full chunk to a resumable upload session, so the upload overlaps encoding.
+    The last chunk is held back until `finish` confirms the encoder succeeded, so a failed encode never
+    leaves a truncated file in the bucket.
+    """
+
+    def __init__(
+        self,
+        fifo_path: str,
+        destination_blob_name: str,
+        project_id: str,
+        chunk_size: int = UPLOAD_CHUNK_SIZE,
+        max_retries: int = UPLOAD_MAX_RETRIES,
+        show_logs: bool = False,
+        bucket=None
+    ):
+        self.fifo_path = fifo_path
+        self.destination_blob_name = destination_blob_name
+        self.project_id = project_id
+        self.chunk_size = chunk_size
+        self.max_retries = max_retries
+        self.show_logs = show_logs
+        self.uploaded_size = None
+        self.error = None
+        self.aborted = False
+        self.encoder_finished = threading.Event()
+
+        if bucket is None:
+            bucket = get_bucket()
+
+        self.blob = bucket.blob(destination_blob_name)
+        self.session = open_resumable_upload_session(
+            self.blob,
+            content_type=get_content_type(destination_blob_name)
+        )
+
+        if os.path.exists(fifo_path):
+            os.remove(fifo_path)
+        os.mkfifo(fifo_path)
+
+        self.thread = threading.Thread(target=self.upload_from_fifo, daemon=True)
+        self.thread.start()
+
+    def upload_from_fifo(self):
+        try:
+            # Blocks until the encoder opens the pipe for writing
+            with open(self.fifo_path, "rb") as fifo:
+                self.uploaded_size = upload_stream_in_chunks(
+                    session=self.session,
+                    stream=fifo,
+                    chunk_size=self.chunk_size,
+                    max_retries=self.max_retries,
+                    before_final_chunk=self.wait_for_encoder
+                )
+        except Exception as e:
+            self.error = e
+
+    def wait_for_encoder(self):
+        self.encoder_finished.wait()
+        if self.aborted:
+            raise IOError("Streaming upload aborted.")
+
+    def finish(self) -> str:
+        """
+        Waits until the encoder closes the pipe and the last chunk is uploaded.
+
+        :return: The public link of the uploaded file.
+        """
+        try:
+            self.encoder_finished.set()
+            with trace_span(op="storage.upload", description=self.destination_blob_name):
+                self.thread.join()
+            os.remove(self.fifo_path)
+
+            if self.error is not None:
+                raise self.error
+
+            if self.show_logs:
+                print_info_log(
+                    tag=LogTag.UPLOAD_BLOB,
+                    message=f"File streamed to bucket on path {self.destination_blob_name}, {self.uploaded_size} bytes"
+                )
+
+            return self.blob.public_url
+
+        except Exception as e:
+            catch_error(
+                tag=LogTag.UPLOAD_BLOB,
+                error=e,
+                project_id=self.project_id
+            )
+
+    def abort(self):
+        """Stops the upload if the encoder failed, the partial upload is discarded."""
+        self.aborted = True
+        self.encoder_finished.set()
+
+        # Unblock the reader if the encoder never opened the pipe, the reader then gets EOF.
+        # A non-blocking open fails with ENXIO until the reader has opened its end, so it is retried
+        deadline = time.monotonic() + ABORT_TIMEOUT_SECONDS
+        while self.thread.is_alive() and time.monotonic() < deadline:
+            try:
+                writer = os.open(self.fifo_path, os.O_WRONLY | os.O_NONBLOCK)
+                os.close(writer)
+                break
+            except OSError as e:
+                if e.errno != errno.ENXIO:
+                    break
+                time.sleep(0.05)
+
+        self.thread.join(timeout=max(deadline - time.monotonic(), 0))
+        if self.thread.is_alive() and self.show_logs:
+            print_info_log(
+                tag=LogTag.UPLOAD_BLOB,
+                message=f"Streaming upload of {self.destination_blob_name} did not stop, it is left to finish"
+            )
+        if os.path.exists(self.fifo_path):
+            os.remove(self.fifo_path)
+        self.session.cancel()
@@ -1,13 +1,23 @@
-from configs.firebase import bucket
+import mimetypes
+
 from configs.logger import catch_error, print_info_log
 from constants.log_tags import LogTag
+from services.firebase.storage.get_bucket import get_bucket
+from services.firebase.storage.resumable_upload import open_resumable_upload_session, upload_stream_in_chunks
+from services.sentry.tracing import trace_span
+
+
+def get_content_type(file_name: str) -> str:
+    content_type, _ = mimetypes.guess_type(file_name)
+    return content_type or "application/octet-stream"
 
 
 def upload_blob(
     source_file_name: str,
     destination_blob_name: str,
     project_id: str,
-    show_logs: bool = False
+    show_logs: bool = False,
+    bucket=None
 ):
     try:
         if show_logs:
@@ -16,16 +26,22 @@ def upload_blob(
                 message=f"Local file path: {source_file_name}"
             )
 
+        if bucket is None:
+            bucket = get_bucket()
+
         blob = bucket.blob(destination_blob_name)
-        blob.upload_from_filename(source_file_name)
+        # Uploaded blob is public from the start, no separate make_public request
+        with trace_span(op="storage.upload", description=destination_blob_name):
+            session = open_resumable_upload_session(blob, content_type=get_content_type(destination_blob_name))
+            with open(source_file_name, "rb") as source_file:
+                uploaded_size = upload_stream_in_chunks(session, source_file)
 
         if show_logs:
             print_info_log(
                 tag=LogTag.UPLOAD_BLOB,
-                message=f"File uploaded to bucket on path {destination_blob_name}"
+                message=f"File uploaded to bucket on path {destination_blob_name}, {uploaded_size} bytes"
             )
 
-        blob.make_public()
         public_link = blob.public_url
 
         if show_logs:
@@ -0,0 +1,126 @@
+import json
+import time
+
+from google.cloud.firestore import transactional
+
+from configs.firebase import DUB_JOBS_COLLECTION
+from models.dub_job import DubJob, DubJobRequest, DubJobStatus
+from services.firebase.init_firebase import get_firestore
+from services.job_queue.job_queue import JobQueue, LeaseLostError
+
+# Jobs read per claim query. Queued jobs are read by their stored sort key, which orders them like their
+# current scores, so the next job is always among them, the others are read in case other workers claim it first.
+# Only the tenant penalty of the admission queue is not part of the order
+CLAIM_CANDIDATES_COUNT = 20
+
+
+def to_document(job: DubJob) -> dict:
+    # Enums are stored by value
+    return json.loads(job.json())
+
+
+class FirestoreJobQueue(JobQueue):
+    """
+    Job queue in a Firestore collection, shared by workers of all nodes.
+    A job is leased in a transaction, which is retried by Firestore if another worker changed the job meanwhile.
+
+    The claim queries need the composite indexes of `firestore.indexes.json` in the repository root,
+    deploy them with `firebase deploy --only firestore:indexes`.
+    """
+
+    def get_collection(self):
+        return get_firestore().collection(DUB_JOBS_COLLECTION)
+
+    def enqueue(self, job_request: DubJobRequest) -> DubJob:
+        job = self.new_job(job_request)
+        self.get_collection().document(job.id).set(to_document(job))
+        return job
+
+    def claim(self, worker_id: str) -> DubJob | None:
+        collection = self.get_collection()
+        now = time.time()
+        queued_snaps = (
+            collection.where("status", "==", DubJobStatus.QUEUED.value)
+            .order_by("sort_key")
+            .limit(CLAIM_CANDIDATES_COUNT)
+            .stream()
+        )
+        # Jobs enqueued before the sort key was stored do not have it and are left out of the query above
+        oldest_snaps = (
+            collection.where("status", "==", DubJobStatus.QUEUED.value)
+            .order_by("enqueued_at")
+            .limit(CLAIM_CANDIDATES_COUNT)
+            .stream()
+        )
+        expired_snaps = (
+            collection.where("status", "==", DubJobStatus.RUNNING.value)
+            .where("lease_expires_at", "<", now)
+            .limit(CLAIM_CANDIDATES_COUNT)
+            .stream()
+        )
+        candidates = {
+            snap.id: DubJob.parse_obj(snap.to_dict()) for snap in [*queued_snaps, *oldest_snaps, *expired_snaps]
+        }
+
+        for job in self.order_candidates(candidates.values(), now):
+            leased_job = self.claim_job(job.id, worker_id)
+            if leased_job is not None:
+                return leased_job
+        return None
+
+    def claim_job(self, job_id: str, worker_id: str) -> DubJob | None:
+        """Leases the job if it is still claimable, None if another worker claimed it first."""
+        job_ref = self.get_collection().document(job_id)
+
+        @transactional
+        def claim_in_transaction(transaction):
+            job = DubJob.parse_obj(job_ref.get(transaction=transaction).to_dict())
+            now = time.time()
+            if not self.is_claimable(job, now):
+                return None
+
+            leased_job = self.take_lease(job, worker_id, now)
+            transaction.set(job_ref, to_document(leased_job))
+            return leased_job if leased_job.status == DubJobStatus.RUNNING else None
+
+        return claim_in_transaction(get_firestore().transaction())
+
+    def update_leased_job(self, job_id: str, worker_id: str, **fields):
+        job_ref = self.get_collection().document(job_id)
+
+        @transactional
+        def update_in_transaction(transaction):
+            job_snap = job_ref.get(transaction=transaction)
+            job = DubJob.parse_obj(job_snap.to_dict()) if job_snap.exists else None
+            if not self.is_leased_by(job, worker_id, time.time()):
+                raise LeaseLostError(f"Job {job_id} is not leased by worker {worker_id}")
+            transaction.set(job_ref, to_document(job.copy(update=fields)))
+
+        update_in_transaction(get_firestore().transaction())
+
+    def renew_lease(self, job_id: str, worker_id: str):
+        self.update_leased_job(job_id, worker_id, lease_expires_at=time.time() + self.lease_seconds)
+
+    def complete(self, job_id: str, worker_id: str):
+        self.update_leased_job(job_id, worker_id, status=DubJobStatus.DONE, lease_expires_at=None)
+
+    def fail(self, job_id: str, worker_id: str, error: str):
+        self.update_leased_job(job_id, worker_id, status=DubJobStatus.FAILED, lease_expires_at=None, error=error)
+
+    def cancel(self, job_id: str) -> DubJob | None:
+        job_ref = self.get_collection().document(job_id)
+
+        @transactional
+        def cancel_in_transaction(transaction):
+            job_snap = job_ref.get(transaction=transaction)
+            if not job_snap.exists:
+                return None
+            cancelled_job = self.cancelled(DubJob.parse_obj(job_snap.to_dict()))
+            transaction.set(job_ref, to_document(cancelled_job))
+            return cancelled_job
+
+        return cancel_in_transaction(get_firestore().transaction())
+
+    def get_job(self, job_id: str) -> DubJob | None:
+        job_snap = self.get_collection().document(job_id).get()
+        return DubJob.parse_obj(job_snap.to_dict()) if job_snap.exists else None
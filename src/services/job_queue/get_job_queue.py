@@ -0,0 +1,24 @@
+from functools import lru_cache
+
+from configs.env import JOB_QUEUE_BACKEND, SQLITE_JOB_QUEUE_PATH
+from constants.backends import JobQueueBackend
+from constants.files import PROCESSING_FILES_DIR_PATH
+from services.job_queue.job_queue import JobQueue
+
+
+@lru_cache(maxsize=None)
+def get_job_queue() -> JobQueue:
+    """Returns the job queue of the configured JOB_QUEUE_BACKEND."""
+    if JOB_QUEUE_BACKEND == JobQueueBackend.MEMORY:
+        from services.job_queue.memory_job_queue import InMemoryJobQueue
+
+        return InMemoryJobQueue()
+
+    if JOB_QUEUE_BACKEND == JobQueueBackend.SQLITE:
+        from services.job_queue.sqlite_job_queue import SqliteJobQueue
+
+        return SqliteJobQueue(database_path=SQLITE_JOB_QUEUE_PATH or f"{PROCESSING_FILES_DIR_PATH}/jobs.sqlite3")
+
+    from services.job_queue.firestore_job_queue import FirestoreJobQueue
+
+    return FirestoreJobQueue()
@@ -0,0 +1,128 @@
+import time
+import uuid
+from abc import ABC, abstractmethod
+from typing import Iterable
+
+from configs.env import JOB_LEASE_SECONDS, JOB_MAX_ATTEMPTS
+from models.dub_job import DubJob, DubJobRequest, DubJobStatus
+from services.scheduling.job_priority import get_job_score, get_job_sort_key
+
+
+class LeaseLostError(Exception):
+    """The job is no longer leased by the worker, e.g. its lease expired and another worker claimed it."""
+    pass
+
+
+class JobQueue(ABC):
+    """
+    Shared queue of dub jobs, claimed by workers with leases.
+
+    A claimed job is leased to the worker for `lease_seconds` and the worker renews the lease while it runs.
+    A job with an expired lease is claimed again by any worker, up to `max_attempts` claims.
+    """
+
+    def __init__(self, lease_seconds: float = JOB_LEASE_SECONDS, max_attempts: int = JOB_MAX_ATTEMPTS):
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+
+    @abstractmethod
+    def enqueue(self, job_request: DubJobRequest) -> DubJob:
+        pass
+
+    @abstractmethod
+    def claim(self, worker_id: str) -> DubJob | None:
+        """Leases the next job to the worker, None if there is no job to run."""
+        pass
+
+    @abstractmethod
+    def renew_lease(self, job_id: str, worker_id: str):
+        """:raises LeaseLostError: If the job is not leased by the worker any more."""
+        pass
+
+    @abstractmethod
+    def complete(self, job_id: str, worker_id: str):
+        """:raises LeaseLostError: If the job is not leased by the worker any more."""
+        pass
+
+    @abstractmethod
+    def fail(self, job_id: str, worker_id: str, error: str):
+        """:raises LeaseLostError: If the job is not leased by the worker any more."""
+        pass
+
+    @abstractmethod
+    def cancel(self, job_id: str) -> DubJob | None:
+        """
+        Cancels the queued or running job, None if there is no such job. A finished job is returned as is.
+        The worker of a running job loses its lease, so it stops the job on its next heartbeat.
+        """
+        pass
+
+    @abstractmethod
+    def get_job(self, job_id: str) -> DubJob | None:
+        pass
+
+    @staticmethod
+    def new_job(job_request: DubJobRequest) -> DubJob:
+        enqueued_at = time.time()
+        return DubJob(
+            **job_request.dict(),
+            id=uuid.uuid4().hex,
+            enqueued_at=enqueued_at,
+            sort_key=get_job_sort_key(job_request.priority, job_request.media_seconds, enqueued_at)
+        )
+
+    @staticmethod
+    def is_claimable(job: DubJob, now: float) -> bool:
+        if job.status == DubJobStatus.QUEUED:
+            return True
+        return job.status == DubJobStatus.RUNNING and job.lease_expires_at is not None and job.lease_expires_at < now
+
+    @staticmethod
+    def is_leased_by(job: DubJob | None, worker_id: str, now: float) -> bool:
+        return (
+            job is not None
+            and job.status == DubJobStatus.RUNNING
+            and job.worker_id == worker_id
+            and job.lease_expires_at is not None
+            and job.lease_expires_at >= now
+        )
+
+    @staticmethod
+    def order_candidates(jobs: Iterable[DubJob], now: float) -> list:
+        """Claimable jobs in the order of the admission queue: priority class, shortest media, aging."""
+        return sorted(
+            (job for job in jobs if JobQueue.is_claimable(job, now)),
+            key=lambda job: get_job_score(
+                priority=job.priority,
+                media_seconds=job.media_seconds,
+                waited_seconds=now - job.enqueued_at
+            )
+        )
+
+    @staticmethod
+    def cancelled(job: DubJob) -> DubJob:
+        """Returns the job cancelled, if it is not finished yet."""
+        if job.status not in (DubJobStatus.QUEUED, DubJobStatus.RUNNING):
+            return job
+        return job.copy(update={"status": DubJobStatus.CANCELLED, "worker_id": None, "lease_expires_at": None})
+
+    def take_lease(self, job: DubJob, worker_id: str, now: float) -> DubJob:
+        """
+        Returns the job leased to the worker, or failed if it has used all its attempts,
+        e.g. because it kept crashing the workers which claimed it.
+        """
+        if job.attempts >= self.max_attempts:
+            return job.copy(update={
+                "status": DubJobStatus.FAILED,
+                "worker_id": None,
+                "lease_expires_at": None,
+                "error": f"Job lease expired after {job.attempts} attempts"
+            })
+
+        return job.copy(update={
+            "status": DubJobStatus.RUNNING,
+            "attempts": job.attempts + 1,
+            "worker_id": worker_id,
+            "lease_expires_at": now + self.lease_seconds,
+            "error": None
+        })
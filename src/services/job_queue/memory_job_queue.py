@@ -0,0 +1,59 @@
+import threading
+import time
+from typing import Dict
+
+from models.dub_job import DubJob, DubJobRequest, DubJobStatus
+from services.job_queue.job_queue import JobQueue, LeaseLostError
+
+
+class InMemoryJobQueue(JobQueue):
+    """Job queue of one process, for tests and local runs with worker threads."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.lock = threading.Lock()
+        self.jobs: Dict[str, DubJob] = {}
+
+    def enqueue(self, job_request: DubJobRequest) -> DubJob:
+        job = self.new_job(job_request)
+        with self.lock:
+            self.jobs[job.id] = job
+        return job
+
+    def claim(self, worker_id: str) -> DubJob | None:
+        with self.lock:
+            now = time.time()
+            for job in self.order_candidates(self.jobs.values(), now):
+                leased_job = self.take_lease(job, worker_id, now)
+                self.jobs[job.id] = leased_job
+                if leased_job.status == DubJobStatus.RUNNING:
+                    return leased_job
+        return None
+
+    def update_leased_job(self, job_id: str, worker_id: str, **fields):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if not self.is_leased_by(job, worker_id, time.time()):
+                raise LeaseLostError(f"Job {job_id} is not leased by worker {worker_id}")
+            self.jobs[job_id] = job.copy(update=fields)
+
+    def renew_lease(self, job_id: str, worker_id: str):
+        self.update_leased_job(job_id, worker_id, lease_expires_at=time.time() + self.lease_seconds)
+
+    def complete(self, job_id: str, worker_id: str):
+        self.update_leased_job(job_id, worker_id, status=DubJobStatus.DONE, lease_expires_at=None)
+
+    def fail(self, job_id: str, worker_id: str, error: str):
+        self.update_leased_job(job_id, worker_id, status=DubJobStatus.FAILED, lease_expires_at=None, error=error)
+
+    def cancel(self, job_id: str) -> DubJob | None:
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return None
+            self.jobs[job_id] = self.cancelled(job)
+            return self.jobs[job_id]
+
+    def get_job(self, job_id: str) -> DubJob | None:
+        with self.lock:
+            return self.jobs.get(job_id)
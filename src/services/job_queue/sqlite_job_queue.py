@@ -0,0 +1,100 @@
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from models.dub_job import DubJob, DubJobRequest, DubJobStatus
+from services.job_queue.job_queue import JobQueue, LeaseLostError
+
+
+class SqliteJobQueue(JobQueue):
+    """
+    Job queue in a SQLite file, shared by worker processes of one machine.
+    Claims run in an immediate transaction, which holds the database write lock, so a job is leased once.
+    """
+
+    def __init__(self, database_path: str, **kwargs):
+        super().__init__(**kwargs)
+        self.lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(database_path)), exist_ok=True)
+        # Transactions are started explicitly
+        self.connection = sqlite3.connect(database_path, check_same_thread=False, isolation_level=None, timeout=30)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS dub_jobs ("
+            "id TEXT PRIMARY KEY, status TEXT NOT NULL, lease_expires_at REAL, job TEXT NOT NULL)"
+        )
+        self.connection.execute("CREATE INDEX IF NOT EXISTS dub_jobs_status ON dub_jobs (status, lease_expires_at)")
+
+    @contextmanager
+    def transaction(self):
+        with self.lock:
+            self.connection.execute("BEGIN IMMEDIATE")
+            try:
+                yield self.connection
+                self.connection.execute("COMMIT")
+            except BaseException:
+                self.connection.execute("ROLLBACK")
+                raise
+
+    @staticmethod
+    def save_job(connection: sqlite3.Connection, job: DubJob):
+        connection.execute(
+            "INSERT OR REPLACE INTO dub_jobs (id, status, lease_expires_at, job) VALUES (?, ?, ?, ?)",
+            (job.id, job.status.value, job.lease_expires_at, job.json())
+        )
+
+    @staticmethod
+    def load_job(connection: sqlite3.Connection, job_id: str) -> DubJob | None:
+        row = connection.execute("SELECT job FROM dub_jobs WHERE id = ?", (job_id,)).fetchone()
+        return DubJob.parse_raw(row[0]) if row is not None else None
+
+    def enqueue(self, job_request: DubJobRequest) -> DubJob:
+        job = self.new_job(job_request)
+        with self.transaction() as connection:
+            self.save_job(connection, job)
+        return job
+
+    def claim(self, worker_id: str) -> DubJob | None:
+        with self.transaction() as connection:
+            now = time.time()
+            rows = connection.execute(
+                "SELECT job FROM dub_jobs WHERE status = ? OR (status = ? AND lease_expires_at < ?)",
+                (DubJobStatus.QUEUED.value, DubJobStatus.RUNNING.value, now)
+            ).fetchall()
+
+            for job in self.order_candidates((DubJob.parse_raw(row[0]) for row in rows), now):
+                leased_job = self.take_lease(job, worker_id, now)
+                self.save_job(connection, leased_job)
+                if leased_job.status == DubJobStatus.RUNNING:
+                    return leased_job
+        return None
+
+    def update_leased_job(self, job_id: str, worker_id: str, **fields):
+        with self.transaction() as connection:
+            job = self.load_job(connection, job_id)
+            if not self.is_leased_by(job, worker_id, time.time()):
+                raise LeaseLostError(f"Job {job_id} is not leased by worker {worker_id}")
+            self.save_job(connection, job.copy(update=fields))
+
+    def renew_lease(self, job_id: str, worker_id: str):
+        self.update_leased_job(job_id, worker_id, lease_expires_at=time.time() + self.lease_seconds)
+
+    def complete(self, job_id: str, worker_id: str):
+        self.update_leased_job(job_id, worker_id, status=DubJobStatus.DONE, lease_expires_at=None)
+
+    def fail(self, job_id: str, worker_id: str, error: str):
+        self.update_leased_job(job_id, worker_id, status=DubJobStatus.FAILED, lease_expires_at=None, error=error)
+
+    def cancel(self, job_id: str) -> DubJob | None:
+        with self.transaction() as connection:
+            job = self.load_job(connection, job_id)
+            if job is None:
+                return None
+            cancelled_job = self.cancelled(job)
+            self.save_job(connection, cancelled_job)
+            return cancelled_job
+
+    def get_job(self, job_id: str) -> DubJob | None:
+        with self.lock:
+            return self.load_job(self.connection, job_id)
@@ -0,0 +1,170 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict
+
+from prometheus_client import Counter, Gauge, Histogram
+
+from configs.logger import log_context
+from models.pipeline_stage import PipelineStage
+from services.profiling.job_profiler import profile_stage
+from services.scheduling.job_cancellation import raise_if_job_cancelled
+from services.sentry.tracing import trace_span
+
+DURATION_BUCKETS = (0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1200, 2400, 3600)
+REAL_TIME_FACTOR_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 0.75, 1, 1.5, 2, 3, 5, 10)
+
+JOBS_TOTAL = Counter(
+    "dub_jobs_total",
+    "Finished dubbing jobs.",
+    ["status"]
+)
+JOBS_REJECTED = Counter(
+    "dub_jobs_rejected_total",
+    "Jobs rejected by admission control.",
+    ["reason"]
+)
+JOBS_COALESCED = Counter(
+    "dub_jobs_coalesced_total",
+    "Duplicate requests attached to a running job of the same project and source."
+)
+JOBS_IN_PROGRESS = Gauge(
+    "dub_jobs_in_progress",
+    "Dubbing jobs being processed right now."
+)
+QUEUE_DEPTH = Gauge(
+    "dub_queue_depth",
+    "Dubbing jobs waiting for a free worker thread."
+)
+JOB_DURATION = Histogram(
+    "dub_job_duration_seconds",
+    "Wall time of a whole dubbing job.",
+    buckets=DURATION_BUCKETS
+)
+STAGE_DURATION = Histogram(
+    "dub_stage_duration_seconds",
+    "Wall time spent in a pipeline stage per job.",
+    ["stage"],
+    buckets=DURATION_BUCKETS
+)
+STAGE_MEDIA_SECONDS = Counter(
+    "dub_stage_media_seconds_total",
+    "Seconds of source media processed by a pipeline stage.",
+    ["stage"]
+)
+STAGE_REAL_TIME_FACTOR = Histogram(
+    "dub_stage_real_time_factor",
+    "Stage wall time divided by the source media duration.",
+    ["stage"],
+    buckets=REAL_TIME_FACTOR_BUCKETS
+)
+TTS_SEGMENT_DURATION = Histogram(
+    "dub_tts_segment_duration_seconds",
+    "Wall time of synthesizing one text segment.",
+    buckets=(0.1, 0.25, 0.5, 1, 2, 5, 10, 20, 40, 60)
+)
+MODEL_LOAD_DURATION = Histogram(
+    "dub_model_load_duration_seconds",
+    "Wall time of loading a model.",
+    ["model"],
+    buckets=DURATION_BUCKETS
+)
+
+
+class JobMetrics:
+    """
+    Stage durations of one job, published when the job ends.
+
+    Real-time factors need the media duration, which is only known once the media is decoded,
+    so stage durations are collected first and published together in `finish`.
+    """
+
+    def __init__(self):
+        self.start_time = time.perf_counter()
+        self.stage_durations: Dict[PipelineStage, float] = {}
+        self.media_seconds: float | None = None
+
+    def add_stage_duration(self, stage: PipelineStage, duration: float):
+        self.stage_durations[stage] = self.stage_durations.get(stage, 0.0) + duration
+
+    def finish(self, status: str):
+        for stage, duration in self.stage_durations.items():
+            STAGE_DURATION.labels(stage.value).observe(duration)
+
+            if self.media_seconds:
+                STAGE_MEDIA_SECONDS.labels(stage.value).inc(self.media_seconds)
+                STAGE_REAL_TIME_FACTOR.labels(stage.value).observe(duration / self.media_seconds)
+
+        JOB_DURATION.observe(time.perf_counter() - self.start_time)
+        JOBS_TOTAL.labels(status).inc()
+
+
+current_job_metrics: ContextVar[JobMetrics | None] = ContextVar("current_job_metrics", default=None)
+
+
+@contextmanager
+def track_job():
+    """
+    Collects metrics of the stages run inside, the job runs in one thread.
+    Can be used as a decorator of the job function.
+    """
+    job_metrics = JobMetrics()
+    token = current_job_metrics.set(job_metrics)
+    JOBS_IN_PROGRESS.inc()
+    status = "failed"
+    try:
+        yield job_metrics
+        status = "succeeded"
+    finally:
+        JOBS_IN_PROGRESS.dec()
+        current_job_metrics.reset(token)
+        job_metrics.finish(status)
+
+
+def set_job_media_seconds(media_seconds: float):
+    """Sets the source media duration of the current job, used for real-time factors."""
+    job_metrics = current_job_metrics.get()
+    if job_metrics is not None:
+        job_metrics.media_seconds = media_seconds
+
+
+@contextmanager
+def track_stage(stage: PipelineStage):
+    """
+    Measures the stage wall time, repeated stages of one job are summed.
+    The stage is also traced as a Sentry span of the job transaction, marked in the job memory trace
+    and added to the logs written inside.
+    """
+    # A cancelled job stops before its next stage
+    raise_if_job_cancelled()
+    start_time = time.perf_counter()
+    try:
+        with (
+            trace_span(op="pipeline.stage", description=stage.value),
+            profile_stage(stage),
+            log_context(stage=stage.value)
+        ):
+            yield
+    finally:
+        duration = time.perf_counter() - start_time
+        job_metrics = current_job_metrics.get()
+        if job_metrics is not None:
+            job_metrics.add_stage_duration(stage, duration)
+        else:
+            STAGE_DURATION.labels(stage.value).observe(duration)
+
+
+@contextmanager
+def track_model_load(model_name: str):
+    start_time = time.perf_counter()
+    yield
+    MODEL_LOAD_DURATION.labels(model_name).observe(time.perf_counter() - start_time)
+
+
+def observe_thread_pool_queue(limiter):
+    """
+    Reports requests waiting for the thread pool, which runs the synchronous endpoints, as the queue depth.
+
+    :param limiter: The anyio capacity limiter of the thread pool.
+    """
+    QUEUE_DEPTH.set_function(lambda: limiter.statistics().tasks_waiting)
@@ -0,0 +1,66 @@
+"""
+Pre-fetches whisper, XTTS and pyannote models to MODEL_STORE_DIR and verifies them against its manifest.
+
+Every model is downloaded by loading it once, then SHA-256 checksums of the store files are written
+to manifest.json. The diarization pipeline is gated, fetching it needs HUGGING_FACE_TOKEN.
+
+Run from the src dir:
+    MODEL_STORE_DIR=/models python3 -m services.ml_models.fetch_models fetch
+    MODEL_STORE_DIR=/models python3 -m services.ml_models.fetch_models verify
+"""
+import argparse
+import os
+
+from configs.env import MODEL_STORE_DIR, MODELS_OFFLINE
+from constants.ml_models import MlModel
+from services.ml_models.model_registry import MODEL_GETTERS
+from services.ml_models.model_store import (
+    build_manifest, read_manifest, verify_model_store, write_manifest, ModelStoreError, MANIFEST_FILE_NAME
+)
+
+
+def fetch_models(models):
+    if MODELS_OFFLINE:
+        raise ModelStoreError("Models can not be fetched with MODELS_OFFLINE")
+
+    for model in models:
+        print(f"Fetching {model.value}...")
+        MODEL_GETTERS[model]()
+
+    print("Writing manifest...")
+    # Entries of the models which are not fetched now are kept
+    manifest = {}
+    if os.path.exists(os.path.join(MODEL_STORE_DIR, MANIFEST_FILE_NAME)):
+        fetched_models = {model.value for model in models}
+        manifest = {
+            path: entry for path, entry in read_manifest(MODEL_STORE_DIR).items()
+            if entry["model"] not in fetched_models
+        }
+    manifest.update(build_manifest(MODEL_STORE_DIR, models))
+    write_manifest(MODEL_STORE_DIR, manifest)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-fetch and verify models of the model store.")
+    parser.add_argument("command", choices=["fetch", "verify"])
+    parser.add_argument("--models", nargs="+", default=[model.value for model in MlModel], choices=[model.value for model in MlModel])
+    args = parser.parse_args()
+
+    if not MODEL_STORE_DIR:
+        raise ModelStoreError("MODEL_STORE_DIR is not set")
+
+    models = [MlModel(model) for model in args.models]
+    if args.command == "fetch":
+        fetch_models(models)
+
+    problems = verify_model_store(MODEL_STORE_DIR, models)
+    for problem in problems:
+        print(problem)
+    if problems:
+        raise SystemExit(1)
+
+    print(f"Models {', '.join(args.models)} are verified in {MODEL_STORE_DIR}")
+
+
+if __name__ == "__main__":
+    main()
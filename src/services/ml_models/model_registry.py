@@ -0,0 +1,156 @@
+import os
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, List
+
+from configs.env import FASTER_WHISPER_COMPUTE_TYPE, JOB_CPU_CORES, MODELS_OFFLINE
+from configs.logger import print_info_log, catch_error
+from constants.log_tags import LogTag
+from constants.ml_models import MlModel, WHISPER_MODEL_NAME, DIARIZATION_MODEL_NAME, TTS_MODEL_NAME
+from services.metrics.pipeline_metrics import track_model_load
+from services.ml_models.model_store import configure_model_store, get_model_dir, require_model_artifacts
+from services.scheduling.cpu_budget import configure_torch_threads
+
+# Before any model library is imported
+configure_model_store()
+
+# Loaded models by name, every model is loaded once per process on its first use
+loaded_models: Dict[MlModel, object] = {}
+model_locks: Dict[MlModel, threading.Lock] = {model: threading.Lock() for model in MlModel}
+# One model instance is shared by the job threads, but inference is not thread-safe:
+# whisper installs kv-cache hooks on the model while decoding, XTTS and pyannote keep state between calls
+inference_locks: Dict[MlModel, threading.Lock] = {model: threading.Lock() for model in MlModel}
+
+
+def get_device() -> str:
+    import torch
+
+    return "cuda" if torch.cuda.is_available() else "cpu"
+
+
+def get_model(model: MlModel, load: Callable[[], object]):
+    """Returns the loaded model, loading it first if needed. Concurrent first calls load it only once."""
+    if model in loaded_models:
+        return loaded_models[model]
+
+    with model_locks[model]:
+        if model not in loaded_models:
+            loaded_models[model] = load()
+        return loaded_models[model]
+
+
+@contextmanager
+def model_inference(model: MlModel):
+    """
+    Runs the inference inside alone on the shared model, concurrent jobs wait for each other.
+    faster-whisper is not locked, CTranslate2 handles concurrent calls of one model.
+    """
+    with inference_locks[model]:
+        yield
+
+
+def is_model_loaded(model: MlModel) -> bool:
+    return model in loaded_models
+
+
+def load_whisper_model():
+    from whisper import load_model
+
+    require_model_artifacts(MlModel.WHISPER)
+    with track_model_load(f"whisper-{WHISPER_MODEL_NAME}"):
+        return load_model(WHISPER_MODEL_NAME, download_root=get_model_dir(MlModel.WHISPER))
+
+
+def load_faster_whisper_model():
+    from faster_whisper import WhisperModel
+
+    require_model_artifacts(MlModel.FASTER_WHISPER)
+    with track_model_load(f"faster-whisper-{WHISPER_MODEL_NAME}-{FASTER_WHISPER_COMPUTE_TYPE}"):
+        return WhisperModel(
+            WHISPER_MODEL_NAME,
+            device=get_device(),
+            compute_type=FASTER_WHISPER_COMPUTE_TYPE,
+            # CTranslate2 threads are set once per model, a job budget of cores is the closest fit
+            cpu_threads=JOB_CPU_CORES,
+            download_root=get_model_dir(MlModel.FASTER_WHISPER),
+            local_files_only=MODELS_OFFLINE
+        )
+
+
+def load_diarization_pipeline():
+    import torch
+    from pyannote.audio import Pipeline
+
+    require_model_artifacts(MlModel.DIARIZATION)
+    with track_model_load(DIARIZATION_MODEL_NAME):
+        pipeline = Pipeline.from_pretrained(DIARIZATION_MODEL_NAME, use_auth_token=os.getenv("HUGGING_FACE_TOKEN"))
+    if torch.cuda.is_available():
+        pipeline.to(torch.device("cuda"))
+    return pipeline
+
+
+def load_tts():
+    from TTS.api import TTS
+
+    require_model_artifacts(MlModel.TTS)
+    device = get_device()
+    # The model is downloaded on the first load if it is not in the local model cache
+    with track_model_load(TTS_MODEL_NAME):
+        return TTS(model_name=TTS_MODEL_NAME, gpu=device == "cuda").to(device)
+
+
+def get_whisper_model():
+    return get_model(MlModel.WHISPER, load_whisper_model)
+
+
+def get_faster_whisper_model():
+    return get_model(MlModel.FASTER_WHISPER, load_faster_whisper_model)
+
+
+def get_diarization_pipeline():
+    return get_model(MlModel.DIARIZATION, load_diarization_pipeline)
+
+
+def get_tts():
+    return get_model(MlModel.TTS, load_tts)
+
+
+MODEL_GETTERS: Dict[MlModel, Callable[[], object]] = {
+    MlModel.WHISPER: get_whisper_model,
+    MlModel.FASTER_WHISPER: get_faster_whisper_model,
+    MlModel.DIARIZATION: get_diarization_pipeline,
+    MlModel.TTS: get_tts,
+}
+
+
+def warm_up_models(models: List[MlModel], show_logs: bool = False):
+    """
+    Loads the models one by one, so the first jobs do not wait for them.
+    Stops on the first model which fails to load, later models are loaded by the jobs.
+
+    :param models: The models to load.
+    :param show_logs: Determines whether to display logs while loading.
+    """
+    # Torch threads of the process are set before the models run any parallel work
+    configure_torch_threads()
+
+    for model in models:
+        if show_logs:
+            print_info_log(
+                tag=LogTag.ML_MODELS,
+                message=f"Warming up {model.value} model..."
+            )
+
+        try:
+            MODEL_GETTERS[model]()
+        except Exception as e:
+            catch_error(
+                tag=LogTag.ML_MODELS,
+                error=e
+            )
+
+        if show_logs:
+            print_info_log(
+                tag=LogTag.ML_MODELS,
+                message=f"Model {model.value} is warm."
+            )
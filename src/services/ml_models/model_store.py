@@ -0,0 +1,128 @@
+import hashlib
+import json
+import os
+from typing import Dict, List
+
+from configs.env import MODEL_STORE_DIR, MODELS_OFFLINE
+from constants.ml_models import MlModel
+
+MANIFEST_FILE_NAME = "manifest.json"
+HASH_CHUNK_SIZE = 8 * 1024 * 1024
+
+# Directory of every model in the store, as the model libraries lay it out
+MODEL_STORE_SUBDIRS: Dict[MlModel, str] = {
+    MlModel.WHISPER: "whisper",
+    MlModel.FASTER_WHISPER: "faster-whisper",
+    MlModel.DIARIZATION: "pyannote",
+    MlModel.TTS: "tts",
+}
+
+
+class ModelStoreError(Exception):
+    pass
+
+
+def configure_model_store():
+    """
+    Points whisper, XTTS and pyannote at MODEL_STORE_DIR and disables Hugging Face downloads in offline mode.
+    Must run before the model libraries are imported, they read the env on import.
+    """
+    if MODEL_STORE_DIR:
+        # XTTS keeps models in $TTS_HOME/tts
+        os.environ.setdefault("TTS_HOME", MODEL_STORE_DIR)
+        os.environ.setdefault("PYANNOTE_CACHE", os.path.join(MODEL_STORE_DIR, MODEL_STORE_SUBDIRS[MlModel.DIARIZATION]))
+        os.environ.setdefault("HF_HOME", os.path.join(MODEL_STORE_DIR, "huggingface"))
+
+    if MODELS_OFFLINE:
+        os.environ["HF_HUB_OFFLINE"] = "1"
+        os.environ["TRANSFORMERS_OFFLINE"] = "1"
+
+
+def get_model_dir(model: MlModel) -> str | None:
+    """Returns the store directory of the model, None if MODEL_STORE_DIR is not set."""
+    if not MODEL_STORE_DIR:
+        return None
+    return os.path.join(MODEL_STORE_DIR, MODEL_STORE_SUBDIRS[model])
+
+
+def hash_file(file_path: str) -> str:
+    file_hash = hashlib.sha256()
+    with open(file_path, "rb") as file:
+        while chunk := file.read(HASH_CHUNK_SIZE):
+            file_hash.update(chunk)
+    return file_hash.hexdigest()
+
+
+def build_manifest(store_dir: str, models: List[MlModel]) -> dict:
+    """SHA-256 and size of every file of the models in the store, by path relative to the store."""
+    manifest = {}
+    for model in models:
+        model_dir = os.path.join(store_dir, MODEL_STORE_SUBDIRS[model])
+        for dir_path, _, file_names in os.walk(model_dir):
+            for file_name in sorted(file_names):
+                file_path = os.path.join(dir_path, file_name)
+                manifest[os.path.relpath(file_path, store_dir)] = {
+                    "model": model.value,
+                    "sha256": hash_file(file_path),
+                    "size": os.path.getsize(file_path),
+                }
+    return manifest
+
+
+def read_manifest(store_dir: str) -> dict:
+    manifest_path = os.path.join(store_dir, MANIFEST_FILE_NAME)
+    if not os.path.exists(manifest_path):
+        raise ModelStoreError(f"Model store {store_dir} has no {MANIFEST_FILE_NAME}, fetch the models first")
+
+    with open(manifest_path) as manifest_file:
+        return json.load(manifest_file)
+
+
+def write_manifest(store_dir: str, manifest: dict):
+    with open(os.path.join(store_dir, MANIFEST_FILE_NAME), "w") as manifest_file:
+        json.dump(manifest, manifest_file, indent=2, sort_keys=True)
+
+
+def verify_model_store(store_dir: str, models: List[MlModel], check_hashes: bool = True) -> List[str]:
+    """
+    Checks the model files against the manifest.
+
+    :param store_dir: The model store directory.
+    :param models: The models to check.
+    :param check_hashes: Determines whether to hash the files, otherwise only their sizes are checked.
+    :return: Problems found, empty if the store is valid.
+    """
+    manifest = read_manifest(store_dir)
+    problems = []
+
+    for model in models:
+        model_files = {path: entry for path, entry in manifest.items() if entry["model"] == model.value}
+        if not model_files:
+            problems.append(f"{model.value}: no files in the manifest")
+
+        for path, entry in model_files.items():
+            file_path = os.path.join(store_dir, path)
+            if not os.path.exists(file_path):
+                problems.append(f"{model.value}: {path} is missing")
+            elif os.path.getsize(file_path) != entry["size"]:
+                problems.append(f"{model.value}: {path} has size {os.path.getsize(file_path)}, expected {entry['size']}")
+            elif check_hashes and hash_file(file_path) != entry["sha256"]:
+                problems.append(f"{model.value}: {path} has a wrong checksum")
+
+    return problems
+
+
+def require_model_artifacts(model: MlModel):
+    """
+    In offline mode checks the model is in the store before it is loaded, so loading never downloads it.
+    Only sizes are checked here, checksums are verified by the fetch_models CLI.
+    """
+    if not MODELS_OFFLINE:
+        return
+
+    if not MODEL_STORE_DIR:
+        raise ModelStoreError("MODELS_OFFLINE requires MODEL_STORE_DIR with pre-fetched models")
+
+    problems = verify_model_store(MODEL_STORE_DIR, [model], check_hashes=False)
+    if problems:
+        raise ModelStoreError(f"Model {model.value} is not available offline: {'; '.join(problems)}")
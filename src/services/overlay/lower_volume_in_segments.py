@@ -1,35 +1,28 @@
-from typing import List
+import numpy as np
 from pydub import AudioSegment
-from models.text_segment import TextSegmentWithAudioTimestamp
 
+from models.segment_table import SegmentTable
+from utils.audio_activity import get_interval_gains
 
-def lower_volume_in_segments(audio: AudioSegment, segments: List[TextSegmentWithAudioTimestamp],
-                             reduction_dB: float) -> AudioSegment:
+
+def lower_volume_in_segments(audio: AudioSegment, segments: SegmentTable, reduction_dB: float) -> AudioSegment:
     """
     Lowers the volume of specified segments in an audio file.
 
     :param audio: The original AudioSegment object.
-    :param segments: A list of instances, each containing the start and end times of segments.
+    :param segments: The segments, their start and end times in the original audio are lowered.
     :param reduction_dB: The amount of volume reduction in decibels.
     :return: A new AudioSegment with the volume reduced in the specified segments.
     """
-    # Start with an empty audio segment
-    modified_audio = AudioSegment.silent(duration=0)
-
-    last_end = 0
-    for segment in segments:
-        start, end = segment.original_timestamp
-        start *= 1000
-        end *= 1000
-        # Add the segment before the current affected segment
-        modified_audio += audio[last_end:start]
-
-        # Reduce volume for the current segment and add it
-        affected_segment = audio[start:end] - reduction_dB
-        modified_audio += affected_segment
-
-        last_end = end
+    samples = np.array(audio.get_array_of_samples()).reshape(-1, audio.channels)
 
-    # Add the remaining part of the audio, if any
-    modified_audio += audio[last_end:]
-    return modified_audio
\ No newline at end of file
+    # One gain per frame for all segments, instead of slicing and joining the audio per segment
+    gains = get_interval_gains(
+        intervals=zip(segments.starts.tolist(), segments.ends.tolist()),
+        gain_db=-reduction_dB,
+        samples_count=len(samples),
+        sample_rate=audio.frame_rate
+    )
+    sample_limits = np.iinfo(samples.dtype)
+    lowered_samples = np.clip(samples * gains[:, np.newaxis], sample_limits.min, sample_limits.max)
+    return audio._spawn(lowered_samples.astype(samples.dtype).tobytes())
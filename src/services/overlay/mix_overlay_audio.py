@@ -0,0 +1,230 @@
+from __future__ import annotations
+
+import os
+import subprocess
+import tempfile
+from typing import List, Tuple, TYPE_CHECKING
+
+import numpy as np
+from audiostretchy.stretch import stretch_audio
+from pydub import AudioSegment
+
+from configs.logger import print_info_log
+from constants.files import PROCESSING_FILES_DIR_PATH
+from constants.log_tags import LogTag
+from models.pipeline_stage import PipelineStage
+from models.segment_table import SegmentTable
+from services.scheduling.cpu_budget import get_ffmpeg_threads
+from services.scheduling.job_cancellation import raise_if_job_cancelled, track_job_process
+from utils.audio_buffer import AudioBuffer
+from utils.media_probe import probe_media
+from utils.pcm_file import get_job_pcm_file_path
+
+if TYPE_CHECKING:
+    from services.firebase.firestore.project_progress import ProjectProgressReporter
+
+# Samples mixed and encoded at once, memory of the mix does not depend on the media length
+MIX_CHUNK_SECONDS = 10
+# The source track is mixed at its own rate and layout, these are used if ffprobe does not report them
+DEFAULT_SAMPLE_RATE = 44100
+DEFAULT_CHANNELS = 2
+ORIGINAL_PCM_FILE_NAME = "original"
+
+
+def stretch_audio_buffer(audio: AudioBuffer, ratio: float, project_id: str) -> AudioBuffer:
+    """Changes the speed of the audio by `ratio` without changing its pitch."""
+    audio_segment = audio.to_audio_segment()
+    # Do not use "with", because temp file will not be deleted
+    temp_file = tempfile.NamedTemporaryFile(dir=f"{PROCESSING_FILES_DIR_PATH}/", suffix=".wav", delete=True)
+    stretched_audio_file_path = f"stretched-audio-segment-{project_id}.wav"
+    audio_segment.export(temp_file.name, format="wav")
+    stretch_audio(temp_file.name, stretched_audio_file_path, ratio)
+    stretched_segment = AudioSegment.from_file(stretched_audio_file_path)
+    # Close and auto-delete temp file
+    temp_file.close()
+    # Delete stretched audio segment file
+    os.remove(stretched_audio_file_path)
+    return AudioBuffer.from_audio_segment(stretched_segment).to_layout(audio.sample_rate, audio.channels)
+
+
+def get_chunk_intervals(
+    starts: np.ndarray,
+    ends: np.ndarray,
+    chunk_start: int,
+    chunk_end: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Parts of the intervals inside the chunk, relative to the chunk start."""
+    is_overlapping = (starts < chunk_end) & (ends > chunk_start)
+    return (
+        np.maximum(starts[is_overlapping], chunk_start) - chunk_start,
+        np.minimum(ends[is_overlapping], chunk_end) - chunk_start
+    )
+
+
+def get_segment_samples(
+    translated_audio: AudioBuffer,
+    segments: SegmentTable,
+    segment_index: int,
+    sample_rate: int,
+    channels: int,
+    speedup_slow_audio: bool,
+    project_id: str,
+    show_logs: bool = False
+) -> np.ndarray:
+    """
+    (frames, channels) samples of the translated segment in the rate and layout of the mix,
+    sped up to the duration of its original segment if it is longer.
+    """
+    audio_start_time = float(segments.audio_starts[segment_index])
+    audio_end_time = float(segments.audio_ends[segment_index])
+    segment_audio = translated_audio.slice(audio_start_time / 1000, audio_end_time / 1000).to_layout(
+        sample_rate, channels
+    )
+
+    video_duration = float(segments.ends[segment_index] - segments.starts[segment_index]) * 1000
+    audio_duration = audio_end_time - audio_start_time
+    if speedup_slow_audio and audio_duration - video_duration > 0.5 and len(segment_audio):
+        ratio = video_duration / audio_duration
+        segment_audio = stretch_audio_buffer(segment_audio, ratio, project_id)
+        if show_logs:
+            print_info_log(
+                tag=LogTag.OVERLAY_AUDIO,
+                message=lambda: f"Speeding up audio by a factor of: {ratio:.2f}",
+                sampled=True,
+                segment_index=int(segment_index)
+            )
+    return segment_audio.samples.reshape(-1, channels)
+
+
+def mix_overlay_audio(
+    video_path: str,
+    translated_audio: AudioBuffer,
+    text_segments_with_audio_timestamp: SegmentTable,
+    project_id: str,
+    overlay_audio_path: str,
+    remove_original_audio: bool = False,
+    speedup_slow_audio: bool = True,
+    reduction_db: float = 15,
+    show_logs: bool = False,
+    progress_reporter: ProjectProgressReporter | None = None
+):
+    """
+    Overlays the translated audio segments on the original sound and encodes the mix to mp3.
+
+    The original sound is decoded once to a PCM file in the job workspace and mapped into memory.
+    The mix is built and piped to the encoder in chunks of `MIX_CHUNK_SECONDS`: a translated segment is converted
+    to the rate and layout of the original sound when the mix reaches it and dropped once the mix passes it,
+    so neither track is ever held in memory as a whole.
+    The original sound is lowered by `reduction_db` under the segments, like `lower_volume_in_segments`,
+    and the segments are added with clipping, like pydub overlay.
+    """
+    media_info = probe_media(video_path)
+    sample_rate = media_info.audio_sample_rate or DEFAULT_SAMPLE_RATE
+    channels = media_info.audio_channels or DEFAULT_CHANNELS
+
+    if media_info.has_audio and not remove_original_audio:
+        original = AudioBuffer.from_file(
+            video_path,
+            sample_rate=sample_rate,
+            channels=channels,
+            pcm_file_path=get_job_pcm_file_path(project_id, ORIGINAL_PCM_FILE_NAME)
+        ).samples.reshape(-1, channels)
+        samples_count = len(original)
+    else:
+        original = None
+        samples_count = int(media_info.duration * sample_rate)
+
+    segments = text_segments_with_audio_timestamp
+    # Lowered intervals of the original sound, in samples
+    lowered_starts = (segments.starts * sample_rate).astype(np.int64)
+    lowered_ends = (segments.ends * sample_rate).astype(np.int64)
+    reduction_factor = 10 ** (-reduction_db / 20)
+
+    # Segments in the order they start in the mix, their samples are made when the mix reaches them
+    placement_order = np.argsort(segments.starts, kind="stable")
+    placement_starts = (segments.starts[placement_order] * sample_rate).astype(np.int64)
+    next_placement = 0
+    # Converted segments which overlap the current chunk: (position, samples), dropped once the mix passes them
+    active_placements: List[Tuple[int, np.ndarray]] = []
+
+    encoder = subprocess.Popen(
+        [
+            "ffmpeg",
+            "-nostdin",
+            "-v", "error",
+            "-threads", str(get_ffmpeg_threads() or 0),
+            "-f", "f32le",
+            "-ar", str(sample_rate),
+            "-ac", str(channels),
+            "-i", "pipe:0",
+            "-y", overlay_audio_path
+        ],
+        stdin=subprocess.PIPE,
+        stderr=subprocess.PIPE
+    )
+    track_job_process(encoder)
+
+    chunk_size = MIX_CHUNK_SECONDS * sample_rate
+    chunks_count = max(1, -(-samples_count // chunk_size))
+    try:
+        for chunk_index in range(chunks_count):
+            raise_if_job_cancelled()
+            chunk_start = chunk_index * chunk_size
+            chunk_end = min(chunk_start + chunk_size, samples_count)
+
+            if original is None:
+                mix = np.zeros((chunk_end - chunk_start, channels), dtype=np.float32)
+            else:
+                mix = np.array(original[chunk_start:chunk_end])
+                # Overlapping segments lower the sound once
+                gains = np.ones(len(mix), dtype=np.float32)
+                for start, end in zip(*get_chunk_intervals(lowered_starts, lowered_ends, chunk_start, chunk_end)):
+                    gains[start:end] = reduction_factor
+                mix *= gains[:, np.newaxis]
+
+            while next_placement < len(placement_order) and placement_starts[next_placement] < chunk_end:
+                raise_if_job_cancelled()
+                segment_index = placement_order[next_placement]
+                segment_samples = get_segment_samples(
+                    translated_audio,
+                    segments,
+                    segment_index,
+                    sample_rate=sample_rate,
+                    channels=channels,
+                    speedup_slow_audio=speedup_slow_audio,
+                    project_id=project_id,
+                    show_logs=show_logs
+                )
+                active_placements.append((int(placement_starts[next_placement]), segment_samples))
+                next_placement += 1
+
+            for position, segment_samples in active_placements:
+                start, end = max(position, chunk_start), min(position + len(segment_samples), chunk_end)
+                if start < end:
+                    mix[start - chunk_start:end - chunk_start] += segment_samples[start - position:end - position]
+            active_placements = [
+                (position, segment_samples) for position, segment_samples in active_placements
+                if position + len(segment_samples) > chunk_end
+            ]
+
+            encoder.stdin.write(np.clip(mix, -1.0, 1.0).astype("<f4").tobytes())
+            if progress_reporter:
+                progress_reporter.report(PipelineStage.OVERLAY, chunk_index + 1, chunks_count)
+    except BaseException:
+        encoder.kill()
+        encoder.wait()
+        raise
+    finally:
+        original_pcm_file_path = get_job_pcm_file_path(project_id, ORIGINAL_PCM_FILE_NAME)
+        if os.path.exists(original_pcm_file_path):
+            os.remove(original_pcm_file_path)
+
+    _, encoder_errors = encoder.communicate()
+    if encoder.returncode != 0:
+        raise RuntimeError(f"Failed to encode overlay audio: {encoder_errors.decode(errors='replace').strip()}")
+
+    if show_logs:
+        print_info_log(
+            tag=LogTag.OVERLAY_AUDIO,
+            message=f"Mixed {len(segments)} segments in {chunks_count} chunks of {MIX_CHUNK_SECONDS}s."
+        )
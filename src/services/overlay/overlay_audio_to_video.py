@@ -1,39 +1,64 @@
+from __future__ import annotations
+
 import os
 import tempfile
-from typing import List
+from typing import List, TYPE_CHECKING
 
 from audiostretchy.stretch import stretch_audio
 from moviepy.editor import VideoFileClip, AudioFileClip
 from pydub import AudioSegment
 
+from configs.env import PCM_MEMMAP_ENABLED
 from configs.logger import catch_error, print_info_log
 from constants.codecs import MP4_CODEC
-from constants.files import VIDEO_SUPPORTED_EXTENSIONS, AUDIO_SUPPORTED_EXTENSIONS, PROCESSING_FILES_DIR_PATH
+from constants.files import VIDEO_SUPPORTED_EXTENSIONS, PROCESSING_FILES_DIR_PATH
 from constants.log_tags import LogTag
+from models.pipeline_stage import PipelineStage
+from models.segment_table import SegmentTable
 from models.text_segment import TextSegmentWithAudioTimestamp
+from services.metrics.pipeline_metrics import track_stage
 from services.overlay.lower_volume_in_segments import lower_volume_in_segments
+from services.overlay.mix_overlay_audio import mix_overlay_audio
+from services.scheduling.cpu_budget import get_ffmpeg_threads
+from services.scheduling.job_cancellation import raise_if_job_cancelled
+from utils.audio_buffer import AudioBuffer
 from utils.files import get_file_extension, get_file_name
 
+if TYPE_CHECKING:
+    from services.firebase.firestore.project_progress import ProjectProgressReporter
+
 
 def overlay_audio_to_video(
     video_path: str,
-    audio_path: str,
-    text_segments_with_audio_timestamp: List[TextSegmentWithAudioTimestamp],
+    translated_audio: AudioBuffer,
+    text_segments_with_audio_timestamp: SegmentTable,
     project_id: str,
     remove_original_audio: bool = False,
     speedup_slow_audio: bool = True,
-    show_logs: bool = False
+    show_logs: bool = False,
+    translated_video_path: str | None = None,
+    ffmpeg_params: List[str] | None = None,
+    progress_reporter: ProjectProgressReporter | None = None
 ):
+    """
+    Overlays translated audio segments on the original video sound and encodes the translated video.
+
+    :param translated_audio: The synthesized audio the `audio_timestamp` of the segments point to.
+    :param translated_video_path: The path to write the video to, e.g. a named pipe of a streaming upload.
+    :param ffmpeg_params: Extra ffmpeg output flags for the video encoder.
+    :param progress_reporter: Publishes the percent of overlaid segments.
+
+    :return: The path of the translated video.
+    """
     try:
         if show_logs:
             print_info_log(
                 tag=LogTag.OVERLAY_AUDIO,
-                message=f"Overlaying text_segments - {text_segments_with_audio_timestamp}"
+                message=lambda: f"Overlaying text_segments - {text_segments_with_audio_timestamp}"
             )
 
         video_file_name = get_file_name(video_path)
         video_file_suffix = get_file_extension(video_path)
-        audio_file_suffix = get_file_extension(audio_path)
 
         # Check if paths exist
         if not os.path.exists(video_path):
@@ -42,12 +67,6 @@ def overlay_audio_to_video(
                 error=ValueError(f"Video path {video_path} does not exist."),
                 project_id=project_id
             )
-        if not os.path.exists(audio_path):
-            catch_error(
-                tag=LogTag.OVERLAY_AUDIO,
-                error=ValueError(f"Audio path {audio_path} does not exist."),
-                project_id=project_id
-            )
 
         # Check for supported file extensions
         if video_file_suffix not in VIDEO_SUPPORTED_EXTENSIONS:
@@ -58,20 +77,12 @@ def overlay_audio_to_video(
                 ),
                 project_id=project_id
             )
-        if audio_file_suffix not in AUDIO_SUPPORTED_EXTENSIONS:
-            catch_error(
-                tag=LogTag.OVERLAY_AUDIO,
-                error=ValueError(
-                    f"Invalid audio format: {audio_file_suffix}. Only {AUDIO_SUPPORTED_EXTENSIONS} are supported."
-                ),
-                project_id=project_id
-            )
 
-        translated_video_path = f"{PROCESSING_FILES_DIR_PATH}/{video_file_name}-translated.{video_file_suffix}"
+        if translated_video_path is None:
+            translated_video_path = f"{PROCESSING_FILES_DIR_PATH}/{video_file_name}-translated.{video_file_suffix}"
 
         original_video = VideoFileClip(video_path)
         original_video_duration = original_video.duration
-        translated_audio = AudioFileClip(audio_path)
 
         if show_logs:
             print_info_log(
@@ -83,84 +94,129 @@ def overlay_audio_to_video(
                 message=f"Input audio duration: {translated_audio.duration}s"
             )
 
-        final_audio = AudioSegment.from_file(video_path, format=video_file_suffix)
-
-        # Remove original video sound
-        if remove_original_audio:
-            if show_logs:
-                print_info_log(
-                    tag=LogTag.OVERLAY_AUDIO,
-                    message=f"Remove original video sound."
+        overlay_audio_name = f"overlay-audio-{project_id}.mp3"
+        if PCM_MEMMAP_ENABLED:
+            with track_stage(PipelineStage.OVERLAY):
+                mix_overlay_audio(
+                    video_path=video_path,
+                    translated_audio=translated_audio,
+                    text_segments_with_audio_timestamp=text_segments_with_audio_timestamp,
+                    project_id=project_id,
+                    overlay_audio_path=overlay_audio_name,
+                    remove_original_audio=remove_original_audio,
+                    speedup_slow_audio=speedup_slow_audio,
+                    show_logs=show_logs,
+                    progress_reporter=progress_reporter
                 )
-            final_audio = final_audio.silent(duration=original_video_duration * 1000)
         else:
-            final_audio = lower_volume_in_segments(final_audio, text_segments_with_audio_timestamp, 15)
+            with track_stage(PipelineStage.OVERLAY):
+                final_audio = AudioSegment.from_file(video_path, format=video_file_suffix)
+
+                # Remove original video sound
+                if remove_original_audio:
+                    if show_logs:
+                        print_info_log(
+                            tag=LogTag.OVERLAY_AUDIO,
+                            message=f"Remove original video sound."
+                        )
+                    final_audio = final_audio.silent(duration=original_video_duration * 1000)
+                else:
+                    final_audio = lower_volume_in_segments(final_audio, text_segments_with_audio_timestamp, 15)
+                translated_audio_segment = translated_audio.to_audio_segment()
 
-        for segment in text_segments_with_audio_timestamp:
-            if show_logs:
-                print_info_log(
-                    tag=LogTag.OVERLAY_AUDIO,
-                    message=f"Processing segment {segment}"
+                segment_times = zip(
+                    text_segments_with_audio_timestamp.starts.tolist(),
+                    text_segments_with_audio_timestamp.ends.tolist(),
+                    text_segments_with_audio_timestamp.audio_starts.tolist(),
+                    text_segments_with_audio_timestamp.audio_ends.tolist()
                 )
+                for segment_index, segment_time in enumerate(segment_times):
+                    raise_if_job_cancelled()
+                    if show_logs:
+                        print_info_log(
+                            tag=LogTag.OVERLAY_AUDIO,
+                            message=lambda: (
+                                f"Processing segment {segment_index}: "
+                                f"{text_segments_with_audio_timestamp.texts[segment_index]}"
+                            ),
+                            sampled=True,
+                            segment_index=segment_index
+                        )
 
-            video_start_time, video_end_time = segment.original_timestamp
-            video_duration = (video_end_time - video_start_time) * 1000
+                    video_start_time, video_end_time, audio_start_time, audio_end_time = segment_time
+                    video_duration = (video_end_time - video_start_time) * 1000
 
-            audio_start_time, audio_end_time = segment.audio_timestamp
-            audio_segment = AudioSegment.from_file(audio_path)[audio_start_time:audio_end_time]
-            audio_duration = audio_end_time - audio_start_time
+                    audio_segment = translated_audio_segment[audio_start_time:audio_end_time]
+                    audio_duration = audio_end_time - audio_start_time
 
-            if show_logs:
-                print_info_log(
-                    tag=LogTag.OVERLAY_AUDIO,
-                    message=f"Video segment duration: {video_duration:.2f}ms | {video_duration / 1000:.2f}s"
-                )
-                print_info_log(
-                    tag=LogTag.OVERLAY_AUDIO,
-                    message=f"Audio segment duration: {audio_duration:.2f}ms | {audio_duration / 1000:.2f}s"
-                )
+                    if show_logs:
+                        print_info_log(
+                            tag=LogTag.OVERLAY_AUDIO,
+                            message=lambda: (
+                                f"Video segment duration: {video_duration:.2f}ms | {video_duration / 1000:.2f}s"
+                            ),
+                            sampled=True,
+                            segment_index=segment_index
+                        )
+                        print_info_log(
+                            tag=LogTag.OVERLAY_AUDIO,
+                            message=lambda: (
+                                f"Audio segment duration: {audio_duration:.2f}ms | {audio_duration / 1000:.2f}s"
+                            ),
+                            sampled=True,
+                            segment_index=segment_index
+                        )
 
-            # Speed up audio if it's need
-            if speedup_slow_audio:
-                if audio_duration - video_duration > 0.5:
-                    # ratio = audio_duration / video_duration
-                    ratio = video_duration / audio_duration
-                    # Do not use "with", because temp file will not be deleted
-                    temp_file = tempfile.NamedTemporaryFile(
-                        dir=f"{PROCESSING_FILES_DIR_PATH}/",
-                        suffix=".wav",
-                        delete=True
-                    )
-                    stretched_audio_file_path = f"stretched-audio-segment-{project_id}.wav"
-                    audio_segment.export(temp_file.name, format="wav")
-                    stretch_audio(temp_file.name, stretched_audio_file_path, ratio)
-                    audio_segment = AudioSegment.from_file(stretched_audio_file_path)
-                    # Close and auto-delete temp file
-                    temp_file.close()
-                    # Delete stretched audio segment file
-                    os.remove(stretched_audio_file_path)
+                    # Speed up audio if it's need
+                    if speedup_slow_audio:
+                        if audio_duration - video_duration > 0.5:
+                            # ratio = audio_duration / video_duration
+                            ratio = video_duration / audio_duration
+                            # Do not use "with", because temp file will not be deleted
+                            temp_file = tempfile.NamedTemporaryFile(
+                                dir=f"{PROCESSING_FILES_DIR_PATH}/",
+                                suffix=".wav",
+                                delete=True
+                            )
+                            stretched_audio_file_path = f"stretched-audio-segment-{project_id}.wav"
+                            audio_segment.export(temp_file.name, format="wav")
+                            stretch_audio(temp_file.name, stretched_audio_file_path, ratio)
+                            audio_segment = AudioSegment.from_file(stretched_audio_file_path)
+                            # Close and auto-delete temp file
+                            temp_file.close()
+                            # Delete stretched audio segment file
+                            os.remove(stretched_audio_file_path)
+
+                            if show_logs:
+                                print_info_log(
+                                    tag=LogTag.OVERLAY_AUDIO,
+                                    message=lambda: f"Speeding up audio by a factor of: {ratio:.2f}",
+                                    sampled=True,
+                                    segment_index=segment_index
+                                )
 
+                    final_audio = final_audio.overlay(audio_segment, position=video_start_time * 1000)
                     if show_logs:
                         print_info_log(
                             tag=LogTag.OVERLAY_AUDIO,
-                            message=f"Speeding up audio by a factor of: {ratio:.2f}"
+                            message=lambda: f"Overlaying audio at {video_start_time:.2f}s in video.",
+                            sampled=True,
+                            segment_index=segment_index
+                        )
+                    if progress_reporter:
+                        progress_reporter.report(
+                            PipelineStage.OVERLAY,
+                            segment_index + 1,
+                            len(text_segments_with_audio_timestamp)
                         )
 
-            final_audio = final_audio.overlay(audio_segment, position=video_start_time * 1000)
-            if show_logs:
-                print_info_log(
-                    tag=LogTag.OVERLAY_AUDIO,
-                    message=f"Overlaying audio at {video_start_time:.2f}s in video."
-                )
-
-        if show_logs:
-            print_info_log(
-                tag=LogTag.OVERLAY_AUDIO,
-                message=f"Processing all segments completed."
-            )
+                if show_logs:
+                    print_info_log(
+                        tag=LogTag.OVERLAY_AUDIO,
+                        message=f"Processing all segments completed."
+                    )
 
-        overlay_audio_name = f"overlay-audio-{project_id}.mp3"
-        final_audio.export(overlay_audio_name, format="mp3")
+                final_audio.export(overlay_audio_name, format="mp3")
         final_audio_clip = AudioFileClip(overlay_audio_name)
 
         # Set the audio of the video to the new audio clip
@@ -176,12 +232,15 @@ def overlay_audio_to_video(
                 message=f"Output audio duration: {final_audio_clip.duration}"
             )
 
-        final_video.write_videofile(
-            filename=translated_video_path,
-            codec=MP4_CODEC,
-            fps=original_video.fps,
-            logger=None
-        )
+        with track_stage(PipelineStage.MUX):
+            final_video.write_videofile(
+                filename=translated_video_path,
+                codec=MP4_CODEC,
+                fps=original_video.fps,
+                logger=None,
+                ffmpeg_params=ffmpeg_params,
+                threads=get_ffmpeg_threads()
+            )
 
         # TODO: use clean FFmpeg
         # input_video = ffmpeg.input(video_path)
@@ -190,7 +249,6 @@ def overlay_audio_to_video(
 
         # Close the clips to free up memory
         final_video.close()
-        translated_audio.close()
         # Remove audio overlay file
         os.remove(overlay_audio_name)
 
@@ -279,8 +337,8 @@ if __name__ == "__main__":
     test_audio_path = f"{PROCESSING_FILES_DIR_PATH}/{test_project_id}-translated.mp3"
     overlay_audio_to_video(
         video_path=test_video_path,
-        audio_path=test_audio_path,
-        text_segments_with_audio_timestamp=test_text_segments_with_audio_timestamps,
+        translated_audio=AudioBuffer.from_file(test_audio_path, sample_rate=24000),
+        text_segments_with_audio_timestamp=SegmentTable.from_segments(test_text_segments_with_audio_timestamps),
         project_id=test_project_id,
         show_logs=True
     )
@@ -0,0 +1,255 @@
+import cProfile
+import io
+import json
+import os
+import pstats
+import resource
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from configs.env import JOB_PROFILER, JOB_PROFILE_SAMPLE_INTERVAL, JOB_PROFILE_TORCH
+from configs.logger import print_info_log
+from constants.log_tags import LogTag
+from constants.profiling import JobProfilerMode
+from models.pipeline_stage import PipelineStage
+from utils.workspace import get_job_workspace_dir
+
+PROFILE_DIR_NAME = "profile"
+# Stack samples in the folded format of flamegraph.pl and speedscope
+STACKS_FILE_NAME = "stacks.folded"
+# cProfile stats, open with `python -m pstats` or snakeviz
+DETERMINISTIC_PROFILE_FILE_NAME = "profile.prof"
+DETERMINISTIC_SUMMARY_FILE_NAME = "profile.txt"
+MEMORY_TRACE_FILE_NAME = "memory.csv"
+TORCH_TRACE_FILE_NAME = "torch_trace.json"
+TORCH_SUMMARY_FILE_NAME = "torch_ops.txt"
+SUMMARY_FILE_NAME = "summary.json"
+
+MEMORY_SAMPLE_INTERVAL = 0.1
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def get_rss_mb() -> float:
+    """Current resident set size of the process, the peak RSS where /proc is not available."""
+    try:
+        with open("/proc/self/statm") as statm_file:
+            return int(statm_file.read().split()[1]) * PAGE_SIZE / 1024 / 1024
+    except OSError:
+        # ru_maxrss is in kilobytes on Linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def fold_stack(frame) -> str:
+    """Frames of the stack from the root, separated by `;`."""
+    frames = []
+    while frame is not None:
+        code = frame.f_code
+        frames.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join(reversed(frames))
+
+
+class JobProfiler:
+    """
+    Profiles the thread of one job and writes the results to the profile dir of the job workspace.
+
+    A background thread samples the job thread stack in sampling mode and the process RSS in both modes.
+    Deterministic mode runs cProfile in the job thread instead of sampling stacks.
+    Threads started by the job and ffmpeg processes are not profiled, RSS is of the whole process.
+    """
+
+    def __init__(
+        self,
+        profile_dir: str,
+        mode: JobProfilerMode = JobProfilerMode.SAMPLING,
+        sample_interval: float = 0.01,
+        profile_torch: bool = False
+    ):
+        self.profile_dir = profile_dir
+        self.mode = JobProfilerMode(mode)
+        self.sample_interval = sample_interval
+        self.profile_torch = profile_torch
+
+        self.stage: PipelineStage | None = None
+        self.stack_counts = Counter()
+        self.peak_rss_mb = 0.0
+        self.job_thread_id = None
+        self.start_time = None
+        self.stop_event = threading.Event()
+        self.sampler_thread = None
+        self.deterministic_profiler = None
+        self.torch_profiler = None
+
+    def start(self):
+        """Starts profiling the calling thread."""
+        os.makedirs(self.profile_dir, exist_ok=True)
+        self.job_thread_id = threading.get_ident()
+        self.start_time = time.perf_counter()
+
+        if self.profile_torch:
+            self.torch_profiler = self.start_torch_profiler()
+
+        self.sampler_thread = threading.Thread(target=self.sample, daemon=True)
+        self.sampler_thread.start()
+
+        if self.mode == JobProfilerMode.DETERMINISTIC:
+            self.deterministic_profiler = cProfile.Profile()
+            self.deterministic_profiler.enable()
+
+    def stop(self) -> dict:
+        """Stops profiling and writes the results, must be called from the profiled thread."""
+        if self.deterministic_profiler:
+            self.deterministic_profiler.disable()
+        wall_seconds = time.perf_counter() - self.start_time
+
+        self.stop_event.set()
+        self.sampler_thread.join()
+
+        files = [MEMORY_TRACE_FILE_NAME]
+        if self.mode == JobProfilerMode.SAMPLING:
+            self.write_stacks()
+            files.append(STACKS_FILE_NAME)
+        else:
+            self.write_deterministic_profile()
+            files += [DETERMINISTIC_PROFILE_FILE_NAME, DETERMINISTIC_SUMMARY_FILE_NAME]
+
+        if self.torch_profiler:
+            self.write_torch_profile()
+            files += [TORCH_TRACE_FILE_NAME, TORCH_SUMMARY_FILE_NAME]
+
+        summary = {
+            "mode": self.mode.value,
+            "wall_seconds": round(wall_seconds, 3),
+            "peak_rss_mb": round(self.peak_rss_mb, 1),
+            "stack_samples": sum(self.stack_counts.values()),
+            "files": files,
+        }
+        with open(os.path.join(self.profile_dir, SUMMARY_FILE_NAME), "w") as summary_file:
+            json.dump(summary, summary_file, indent=2)
+        return summary
+
+    def sample(self):
+        next_memory_sample_time = 0.0
+        with open(os.path.join(self.profile_dir, MEMORY_TRACE_FILE_NAME), "w") as memory_trace_file:
+            memory_trace_file.write("seconds,rss_mb,peak_rss_mb,stage\n")
+
+            while not self.stop_event.wait(self.sample_interval):
+                if self.mode == JobProfilerMode.SAMPLING:
+                    frame = sys._current_frames().get(self.job_thread_id)
+                    if frame is not None:
+                        self.stack_counts[fold_stack(frame)] += 1
+                    # The frame keeps the locals of the whole stack alive
+                    del frame
+
+                elapsed = time.perf_counter() - self.start_time
+                if elapsed >= next_memory_sample_time:
+                    rss_mb = get_rss_mb()
+                    self.peak_rss_mb = max(self.peak_rss_mb, rss_mb)
+                    stage = self.stage.value if self.stage else ""
+                    memory_trace_file.write(f"{elapsed:.2f},{rss_mb:.1f},{self.peak_rss_mb:.1f},{stage}\n")
+                    next_memory_sample_time = elapsed + MEMORY_SAMPLE_INTERVAL
+
+    def write_stacks(self):
+        with open(os.path.join(self.profile_dir, STACKS_FILE_NAME), "w") as stacks_file:
+            for stack, count in self.stack_counts.most_common():
+                stacks_file.write(f"{stack} {count}\n")
+
+    def write_deterministic_profile(self):
+        self.deterministic_profiler.dump_stats(os.path.join(self.profile_dir, DETERMINISTIC_PROFILE_FILE_NAME))
+
+        summary_stream = io.StringIO()
+        stats = pstats.Stats(self.deterministic_profiler, stream=summary_stream)
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(50)
+        with open(os.path.join(self.profile_dir, DETERMINISTIC_SUMMARY_FILE_NAME), "w") as summary_file:
+            summary_file.write(summary_stream.getvalue())
+
+    @staticmethod
+    def start_torch_profiler():
+        import torch
+        from torch.profiler import profile, ProfilerActivity
+
+        activities = [ProfilerActivity.CPU]
+        if torch.cuda.is_available():
+            activities.append(ProfilerActivity.CUDA)
+
+        torch_profiler = profile(activities=activities, profile_memory=True)
+        torch_profiler.__enter__()
+        return torch_profiler
+
+    def write_torch_profile(self):
+        self.torch_profiler.__exit__(None, None, None)
+        self.torch_profiler.export_chrome_trace(os.path.join(self.profile_dir, TORCH_TRACE_FILE_NAME))
+
+        operators_table = self.torch_profiler.key_averages().table(sort_by="self_cpu_time_total", row_limit=50)
+        with open(os.path.join(self.profile_dir, TORCH_SUMMARY_FILE_NAME), "w") as summary_file:
+            summary_file.write(operators_table)
+
+
+current_job_profiler: ContextVar[JobProfiler | None] = ContextVar("current_job_profiler", default=None)
+
+
+def get_job_profile_dir(project_id: str) -> str:
+    return os.path.join(get_job_workspace_dir(project_id, create=False), PROFILE_DIR_NAME)
+
+
+@contextmanager
+def profile_job(project_id: str, enabled: bool, show_logs: bool = False):
+    """
+    Profiles the job run inside if enabled, with the JOB_PROFILER mode.
+    The results are written to the `profile` dir of the job workspace, also when the job fails.
+
+    :param project_id: The id of the processing project.
+    :param enabled: Determines whether to profile the job.
+    :param show_logs: Determines whether to display logs of the profiler.
+    """
+    if not enabled:
+        yield None
+        return
+
+    profile_dir = os.path.join(get_job_workspace_dir(project_id), PROFILE_DIR_NAME)
+    job_profiler = JobProfiler(
+        profile_dir=profile_dir,
+        mode=JobProfilerMode(JOB_PROFILER),
+        sample_interval=JOB_PROFILE_SAMPLE_INTERVAL,
+        profile_torch=JOB_PROFILE_TORCH
+    )
+
+    if show_logs:
+        print_info_log(
+            tag=LogTag.PROFILE_JOB,
+            message=f"Profiling job of project {project_id} in {job_profiler.mode.value} mode"
+        )
+
+    token = current_job_profiler.set(job_profiler)
+    job_profiler.start()
+    try:
+        yield job_profiler
+    finally:
+        current_job_profiler.reset(token)
+        summary = job_profiler.stop()
+
+        if show_logs:
+            print_info_log(
+                tag=LogTag.PROFILE_JOB,
+                message=f"Job profile written to {profile_dir}: {summary}"
+            )
+
+
+@contextmanager
+def profile_stage(stage: PipelineStage):
+    """Marks the memory trace of the profiled job with the stage run inside."""
+    job_profiler = current_job_profiler.get()
+    if job_profiler is None:
+        yield
+        return
+
+    previous_stage = job_profiler.stage
+    job_profiler.stage = stage
+    try:
+        yield
+    finally:
+        job_profiler.stage = previous_stage
@@ -0,0 +1,19 @@
+from google.api_core.exceptions import NotFound
+
+from configs.firebase import MINI_PROJECTS_COLLECTION
+from services.firebase.init_firebase import get_firestore
+from services.project_store.project_store import ProjectStore, ProjectNotFoundError
+
+
+class FirestoreProjectStore(ProjectStore):
+    def get_project(self, project_id: str) -> dict | None:
+        project_snap = get_firestore().collection(MINI_PROJECTS_COLLECTION).document(project_id).get()
+        return project_snap.to_dict() if project_snap.exists else None
+
+    def update_project(self, project_id: str, project_fields_to_update: dict):
+        project_ref = get_firestore().collection(MINI_PROJECTS_COLLECTION).document(project_id)
+        # Firestore update fails if the document does not exist, no read is needed to check it
+        try:
+            project_ref.update(project_fields_to_update)
+        except NotFound:
+            raise ProjectNotFoundError(f"Mini project with id {project_id} does not exist.")
@@ -0,0 +1,24 @@
+from functools import lru_cache
+
+from configs.env import PROJECT_STORE_BACKEND, SQLITE_PROJECT_STORE_PATH
+from constants.backends import ProjectStoreBackend
+from constants.files import PROCESSING_FILES_DIR_PATH
+from services.project_store.project_store import ProjectStore
+
+
+@lru_cache(maxsize=None)
+def get_project_store() -> ProjectStore:
+    """Returns the project store of the configured PROJECT_STORE_BACKEND."""
+    if PROJECT_STORE_BACKEND == ProjectStoreBackend.MEMORY:
+        from services.project_store.memory_project_store import InMemoryProjectStore
+
+        return InMemoryProjectStore()
+
+    if PROJECT_STORE_BACKEND == ProjectStoreBackend.SQLITE:
+        from services.project_store.sqlite_project_store import SqliteProjectStore
+
+        return SqliteProjectStore(database_path=SQLITE_PROJECT_STORE_PATH or f"{PROCESSING_FILES_DIR_PATH}/projects.sqlite3")
+
+    from services.project_store.firestore_project_store import FirestoreProjectStore
+
+    return FirestoreProjectStore()
@@ -0,0 +1,26 @@
+import threading
+
+from services.project_store.project_store import ProjectStore, ProjectNotFoundError
+
+
+class InMemoryProjectStore(ProjectStore):
+    """Project store of one process, for local runs and load tests."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.projects = {}
+
+    def create_project(self, project_id: str, project_fields: dict):
+        with self.lock:
+            self.projects[project_id] = dict(project_fields)
+
+    def get_project(self, project_id: str) -> dict | None:
+        with self.lock:
+            project = self.projects.get(project_id)
+            return dict(project) if project is not None else None
+
+    def update_project(self, project_id: str, project_fields_to_update: dict):
+        with self.lock:
+            if project_id not in self.projects:
+                raise ProjectNotFoundError(f"Mini project with id {project_id} does not exist.")
+            self.projects[project_id].update(project_fields_to_update)
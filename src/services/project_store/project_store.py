@@ -0,0 +1,22 @@
+from abc import ABC, abstractmethod
+
+
+class ProjectNotFoundError(Exception):
+    pass
+
+
+class ProjectStore(ABC):
+    """Storage of mini projects, the documents the frontend reads project status and progress from."""
+
+    @abstractmethod
+    def get_project(self, project_id: str) -> dict | None:
+        pass
+
+    @abstractmethod
+    def update_project(self, project_id: str, project_fields_to_update: dict):
+        """
+        Updates fields of an existing project with a single write.
+
+        :raises ProjectNotFoundError: If the project does not exist.
+        """
+        pass
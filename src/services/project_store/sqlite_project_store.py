@@ -0,0 +1,40 @@
+import json
+import sqlite3
+import threading
+
+from services.project_store.project_store import ProjectStore, ProjectNotFoundError
+
+
+class SqliteProjectStore(ProjectStore):
+    """Project store in a SQLite file, shared by local processes. Project fields are kept as JSON."""
+
+    def __init__(self, database_path: str):
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(database_path, check_same_thread=False)
+        self.connection.execute("CREATE TABLE IF NOT EXISTS projects (id TEXT PRIMARY KEY, fields TEXT NOT NULL)")
+        self.connection.commit()
+
+    def create_project(self, project_id: str, project_fields: dict):
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO projects (id, fields) VALUES (?, ?)",
+                (project_id, json.dumps(project_fields))
+            )
+            self.connection.commit()
+
+    def get_project(self, project_id: str) -> dict | None:
+        with self.lock:
+            row = self.connection.execute("SELECT fields FROM projects WHERE id = ?", (project_id,)).fetchone()
+        return json.loads(row[0]) if row is not None else None
+
+    def update_project(self, project_id: str, project_fields_to_update: dict):
+        with self.lock:
+            # Merge in one statement, so concurrent processes never lose each other's fields
+            cursor = self.connection.execute(
+                "UPDATE projects SET fields = json_patch(fields, ?) WHERE id = ?",
+                (json.dumps(project_fields_to_update), project_id)
+            )
+            self.connection.commit()
+
+        if cursor.rowcount == 0:
+            raise ProjectNotFoundError(f"Mini project with id {project_id} does not exist.")
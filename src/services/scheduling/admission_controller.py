@@ -0,0 +1,303 @@
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List
+
+from configs.env import (
+    ADMISSION_CONTROL_ENABLED, ADMISSION_MAX_MEMORY_MB, ADMISSION_MAX_CPU_SECONDS, ADMISSION_MAX_MEDIA_SECONDS, ADMISSION_MAX_QUEUED_JOBS,
+    ADMISSION_QUEUE_TIMEOUT, PCM_MEMMAP_ENABLED
+)
+from configs.logger import print_info_log, catch_error
+from constants.audio import SAMPLE_RATE
+from constants.log_tags import LogTag
+from models.job_priority import JobPriority
+from models.media_info import MediaInfo, JobCost
+from services.firebase.storage.get_blob_signed_url import get_blob_signed_url
+from services.metrics.pipeline_metrics import JOBS_REJECTED
+from services.scheduling.job_cancellation import raise_if_job_cancelled
+from services.scheduling.job_priority import get_job_score, get_tenant_id
+from utils.media_probe import probe_media
+
+# Memory of a job which does not depend on the media: buffers, encoders, per-job model state
+BASE_JOB_MEMORY_MB = 512
+# Copies of the source track held as pydub 16-bit audio: original, lowered and overlaid tracks
+SOURCE_AUDIO_COPIES = 3
+# Translated speech is synthesized by XTTS at 24 kHz mono float32, the segments and their joined track
+TTS_AUDIO_BYTES_PER_SECOND = 24000 * 4 * 2
+# Decoded whisper audio is float32 mono
+WHISPER_AUDIO_BYTES_PER_SECOND = SAMPLE_RATE * 4
+# Whisper pads the audio it transcribes and builds the mel spectrogram of all of it in memory: the padded copy,
+# the STFT of 201 complex64 bins, its magnitudes and 80 float32 mel bins, 100 frames per second
+WHISPER_FEATURES_BYTES_PER_SECOND = WHISPER_AUDIO_BYTES_PER_SECOND + 100 * (201 * 8 + 201 * 4 + 80 * 4)
+# CPU seconds per second of media: speech to text, diarization and text to speech
+AUDIO_CPU_SECONDS_PER_SECOND = 3.0
+# Video encoding CPU seconds per second of media per megapixel at 25 fps
+VIDEO_CPU_SECONDS_PER_MEGAPIXEL_SECOND = 0.4
+
+MAX_RETRY_AFTER_IN_SECONDS = 600
+# Seconds between checks of a queued job: scores age while nothing is released, and the job may be cancelled
+QUEUE_CHECK_INTERVAL = 1.0
+
+
+class JobRejectedError(Exception):
+    """The node can not take the job now (429) or ever (413)."""
+
+    def __init__(self, message: str, status_code: int = 429, retry_after: int | None = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+def estimate_job_cost(media_info: MediaInfo) -> JobCost:
+    """Estimates the peak memory and CPU work of dubbing the media from its duration and stream layout."""
+    duration = media_info.duration
+
+    source_audio_bytes_per_second = (media_info.audio_sample_rate or 44100) * max(media_info.audio_channels, 1) * 2
+    memory_bytes = duration * WHISPER_FEATURES_BYTES_PER_SECOND
+    # Mapped PCM files of the whisper audio, its VAD packed copy, the translated track and the source track
+    # are paged in and out by the OS, and the mix converts only the translated segments of its current chunk
+    if not PCM_MEMMAP_ENABLED:
+        memory_bytes += duration * (
+            WHISPER_AUDIO_BYTES_PER_SECOND * 2
+            + TTS_AUDIO_BYTES_PER_SECOND
+            + SOURCE_AUDIO_COPIES * source_audio_bytes_per_second
+        )
+
+    cpu_seconds = duration * AUDIO_CPU_SECONDS_PER_SECOND
+    if media_info.has_video:
+        megapixels = media_info.video_width * media_info.video_height / 1_000_000
+        fps_factor = (media_info.video_fps or 25) / 25
+        cpu_seconds += duration * megapixels * fps_factor * VIDEO_CPU_SECONDS_PER_MEGAPIXEL_SECOND
+
+    return JobCost(memory_mb=BASE_JOB_MEMORY_MB + memory_bytes / 1024 / 1024, cpu_seconds=cpu_seconds)
+
+
+def get_node_memory_mb() -> float:
+    return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") / 1024 / 1024
+
+
+class QueuedJob:
+    def __init__(self, job_cost: JobCost, media_seconds: float, priority: JobPriority, tenant_id: str | None):
+        self.job_cost = job_cost
+        self.media_seconds = media_seconds
+        self.priority = priority
+        self.tenant_id = tenant_id
+        self.enqueued_at = time.monotonic()
+
+
+class AdmissionController:
+    """
+    Admits jobs while their estimated memory and CPU work fit the node limits.
+    Jobs which do not fit wait in a bounded queue, jobs beyond the queue are rejected.
+    A limit of 0 is not checked.
+
+    The queue is ordered by job score: priority class, then shortest media first, with aging and tenant fairness.
+    Only the first job of the queue is admitted, so smaller jobs never pass a long job which has aged to the front.
+    """
+
+    def __init__(
+        self,
+        max_memory_mb: float,
+        max_cpu_seconds: float = 0,
+        max_media_seconds: float = 0,
+        max_queued_jobs: int = 4,
+        queue_timeout: float = 600
+    ):
+        self.max_memory_mb = max_memory_mb
+        self.max_cpu_seconds = max_cpu_seconds
+        self.max_media_seconds = max_media_seconds
+        self.max_queued_jobs = max_queued_jobs
+        self.queue_timeout = queue_timeout
+
+        self.condition = threading.Condition()
+        self.running_jobs = 0
+        self.running_memory_mb = 0.0
+        self.running_cpu_seconds = 0.0
+        self.running_jobs_by_tenant: Dict[str, int] = {}
+        self.queued_jobs: List[QueuedJob] = []
+
+    def get_score(self, queued_job: QueuedJob) -> float:
+        return get_job_score(
+            priority=queued_job.priority,
+            media_seconds=queued_job.media_seconds,
+            waited_seconds=time.monotonic() - queued_job.enqueued_at,
+            tenant_running_jobs=self.running_jobs_by_tenant.get(queued_job.tenant_id, 0)
+        )
+
+    def is_admissible(self, queued_job: QueuedJob) -> bool:
+        return min(self.queued_jobs, key=self.get_score) is queued_job and self.fits(queued_job.job_cost)
+
+    def fits(self, job_cost: JobCost) -> bool:
+        # A single job always runs if it fits the node alone
+        if self.running_jobs == 0:
+            return True
+        if self.max_memory_mb and self.running_memory_mb + job_cost.memory_mb > self.max_memory_mb:
+            return False
+        if self.max_cpu_seconds and self.running_cpu_seconds + job_cost.cpu_seconds > self.max_cpu_seconds:
+            return False
+        return True
+
+    def get_retry_after(self) -> int:
+        """Seconds until running work is likely done, from the CPU work left on the node."""
+        cores_count = os.cpu_count() or 1
+        retry_after = math.ceil(self.running_cpu_seconds / cores_count)
+        return max(1, min(retry_after, MAX_RETRY_AFTER_IN_SECONDS))
+
+    def check_limits(self, media_info: MediaInfo, job_cost: JobCost):
+        """Rejects jobs which are over the node limits on their own, retrying them never helps."""
+        if self.max_media_seconds and media_info.duration > self.max_media_seconds:
+            raise JobRejectedError(
+                f"Media of {media_info.duration:.0f}s is longer than {self.max_media_seconds:.0f}s accepted by this node",
+                status_code=413
+            )
+        if self.max_memory_mb and job_cost.memory_mb > self.max_memory_mb:
+            raise JobRejectedError(
+                f"Job needs about {job_cost.memory_mb:.0f} MB, more than {self.max_memory_mb:.0f} MB of this node",
+                status_code=413
+            )
+
+    @contextmanager
+    def admit(
+        self,
+        media_info: MediaInfo,
+        priority: JobPriority = JobPriority.NORMAL,
+        tenant_id: str | None = None,
+        show_logs: bool = False
+    ):
+        """
+        Runs the job inside once it is first in the queue and fits the node, waiting in the queue if needed.
+
+        :param media_info: The probed media of the job.
+        :param priority: The priority class of the job.
+        :param tenant_id: The tenant of the job, its running jobs move the job back in the queue.
+        :param show_logs: Determines whether to display logs of admission.
+        :raises JobRejectedError: If the job is over the node limits, the queue is full or the wait timed out.
+        """
+        job_cost = estimate_job_cost(media_info)
+        try:
+            self.check_limits(media_info, job_cost)
+        except JobRejectedError:
+            JOBS_REJECTED.labels("too_large").inc()
+            raise
+
+        queued_job = QueuedJob(
+            job_cost=job_cost,
+            media_seconds=media_info.duration,
+            priority=priority,
+            tenant_id=tenant_id
+        )
+
+        with self.condition:
+            self.queued_jobs.append(queued_job)
+            try:
+                if not self.is_admissible(queued_job):
+                    # The new job is already in the queue and counts towards the limit: at most `max_queued_jobs` wait
+                    if len(self.queued_jobs) > self.max_queued_jobs:
+                        JOBS_REJECTED.labels("queue_full").inc()
+                        raise JobRejectedError("The node is busy, try again later", retry_after=self.get_retry_after())
+
+                    if show_logs:
+                        print_info_log(
+                            tag=LogTag.ADMISSION_CONTROL,
+                            message=f"Job of {job_cost} is queued, {self.running_jobs} jobs are running"
+                        )
+
+                    queue_deadline = time.monotonic() + self.queue_timeout
+                    # Scores are computed on every check, so a waiting job ages and can pass the others
+                    # even while no running job finishes and notifies the queue
+                    while not self.is_admissible(queued_job):
+                        # A cancelled job leaves the queue without waiting for its turn
+                        raise_if_job_cancelled()
+                        remaining_seconds = queue_deadline - time.monotonic()
+                        if remaining_seconds <= 0:
+                            JOBS_REJECTED.labels("queue_timeout").inc()
+                            raise JobRejectedError(
+                                "The node is busy, try again later",
+                                retry_after=self.get_retry_after()
+                            )
+                        self.condition.wait(timeout=min(remaining_seconds, QUEUE_CHECK_INTERVAL))
+            finally:
+                self.queued_jobs.remove(queued_job)
+                # The next job in the queue may fit as well
+                self.condition.notify_all()
+
+            self.running_jobs += 1
+            self.running_memory_mb += job_cost.memory_mb
+            self.running_cpu_seconds += job_cost.cpu_seconds
+            if tenant_id is not None:
+                self.running_jobs_by_tenant[tenant_id] = self.running_jobs_by_tenant.get(tenant_id, 0) + 1
+
+        if show_logs:
+            print_info_log(
+                tag=LogTag.ADMISSION_CONTROL,
+                message=f"Job of {job_cost} is admitted"
+            )
+
+        try:
+            yield job_cost
+        finally:
+            with self.condition:
+                self.running_jobs -= 1
+                self.running_memory_mb -= job_cost.memory_mb
+                self.running_cpu_seconds -= job_cost.cpu_seconds
+                if tenant_id is not None:
+                    self.running_jobs_by_tenant[tenant_id] -= 1
+                    if self.running_jobs_by_tenant[tenant_id] == 0:
+                        del self.running_jobs_by_tenant[tenant_id]
+                self.condition.notify_all()
+
+
+admission_controller = AdmissionController(
+    max_memory_mb=ADMISSION_MAX_MEMORY_MB or get_node_memory_mb() * 0.8,
+    max_cpu_seconds=ADMISSION_MAX_CPU_SECONDS,
+    max_media_seconds=ADMISSION_MAX_MEDIA_SECONDS,
+    max_queued_jobs=ADMISSION_MAX_QUEUED_JOBS,
+    queue_timeout=ADMISSION_QUEUE_TIMEOUT
+)
+
+
+@contextmanager
+def admit_job(
+    project_id: str,
+    original_file_location: str,
+    priority: JobPriority = JobPriority.NORMAL,
+    show_logs: bool = False
+):
+    """
+    Probes the project media in the bucket, without downloading it, and runs the job inside once it is admitted.
+    Does nothing if ADMISSION_CONTROL_ENABLED is off.
+
+    :param project_id: The id of the processing project.
+    :param original_file_location: The location of the original media file in the cloud storage.
+    :param priority: The priority class of the job.
+    :param show_logs: Determines whether to display logs of admission.
+    :raises JobRejectedError: If the node can not take the job.
+    """
+    if not ADMISSION_CONTROL_ENABLED:
+        yield None
+        return
+
+    try:
+        media_info = probe_media(get_blob_signed_url(original_file_location))
+    except Exception as e:
+        catch_error(
+            tag=LogTag.PROBE_MEDIA,
+            error=e,
+            project_id=project_id
+        )
+
+    if show_logs:
+        print_info_log(
+            tag=LogTag.PROBE_MEDIA,
+            message=f"Project {project_id} media: {media_info}"
+        )
+
+    with admission_controller.admit(
+        media_info,
+        priority=priority,
+        tenant_id=get_tenant_id(original_file_location),
+        show_logs=show_logs
+    ) as job_cost:
+        yield job_cost
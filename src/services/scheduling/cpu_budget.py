@@ -0,0 +1,138 @@
+import os
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import List
+
+from configs.env import JOB_CPU_CORES, CPU_AFFINITY_ENABLED
+from configs.logger import print_info_log
+from constants.log_tags import LogTag
+
+
+class CpuBudget:
+    """Cores assigned to one job."""
+
+    def __init__(self, cores: List[int]):
+        self.cores = cores
+
+    @property
+    def cores_count(self) -> int:
+        return len(self.cores)
+
+
+class CpuBudgetScheduler:
+    """
+    Hands out the cores of the node to jobs, so concurrent jobs never use more threads than there are cores.
+    A job waits until enough cores are free.
+    """
+
+    def __init__(self, cores: List[int]):
+        self.cores = sorted(cores)
+        self.free_cores = list(self.cores)
+        self.condition = threading.Condition()
+
+    def acquire(self, cores_count: int) -> CpuBudget:
+        cores_count = max(1, min(cores_count, len(self.cores)))
+        with self.condition:
+            self.condition.wait_for(lambda: len(self.free_cores) >= cores_count)
+            budget_cores = self.free_cores[:cores_count]
+            del self.free_cores[:cores_count]
+        return CpuBudget(budget_cores)
+
+    def release(self, budget: CpuBudget):
+        with self.condition:
+            self.free_cores = sorted(self.free_cores + budget.cores)
+            self.condition.notify_all()
+
+
+def get_available_cores() -> List[int]:
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+cpu_budget_scheduler = CpuBudgetScheduler(get_available_cores())
+current_cpu_budget: ContextVar[CpuBudget | None] = ContextVar("current_cpu_budget", default=None)
+torch_threads_lock = threading.Lock()
+is_torch_threads_set = False
+
+
+def configure_torch_threads(threads_count: int = JOB_CPU_CORES):
+    """
+    Limits torch threads to the cores of one job budget, once per process. Does nothing if `threads_count` is 0.
+
+    Torch thread counts are process-wide, so they are not changed per job: concurrent jobs would overwrite
+    each other's count. Call it at startup, inter-op threads can only be set before torch runs parallel work.
+    """
+    global is_torch_threads_set
+
+    if not threads_count:
+        return
+
+    import torch
+
+    with torch_threads_lock:
+        if is_torch_threads_set:
+            return
+        torch.set_num_threads(threads_count)
+        try:
+            torch.set_num_interop_threads(threads_count)
+        except RuntimeError:
+            # Parallel work has already started, torch keeps its default
+            pass
+        is_torch_threads_set = True
+
+
+@contextmanager
+def job_cpu_budget(cores_count: int = JOB_CPU_CORES, show_logs: bool = False):
+    """
+    Runs the job inside on a budget of `cores_count` cores, waiting until they are free.
+    ffmpeg gets the budget with `-threads`, torch threads are limited to one budget for the process
+    by configure_torch_threads. With CPU_AFFINITY_ENABLED the job thread and the processes it starts,
+    e.g. ffmpeg, are pinned to the budget cores. Threads of the torch pools are shared by the jobs
+    and are not pinned. Does nothing if `cores_count` is 0. Can be used as a decorator of the job function.
+
+    :param cores_count: The number of cores of the job.
+    :param show_logs: Determines whether to display logs of the budget.
+    """
+    if not cores_count:
+        yield None
+        return
+
+    # Already done at startup by the app and the worker, scripts get it with their first job
+    configure_torch_threads(cores_count)
+
+    budget = cpu_budget_scheduler.acquire(cores_count)
+    token = current_cpu_budget.set(budget)
+
+    previous_affinity = None
+    if CPU_AFFINITY_ENABLED and hasattr(os, "sched_setaffinity"):
+        # pid 0 is the calling thread, processes started by it inherit its affinity
+        previous_affinity = os.sched_getaffinity(0)
+        os.sched_setaffinity(0, budget.cores)
+
+    if show_logs:
+        print_info_log(
+            tag=LogTag.CPU_BUDGET,
+            message=f"Job runs on {budget.cores_count} cores: {budget.cores}"
+        )
+
+    try:
+        yield budget
+    finally:
+        if previous_affinity is not None:
+            os.sched_setaffinity(0, previous_affinity)
+        current_cpu_budget.reset(token)
+        cpu_budget_scheduler.release(budget)
+
+
+def get_ffmpeg_threads() -> int | None:
+    """Threads of ffmpeg started by the current job, None without a budget."""
+    budget = current_cpu_budget.get()
+    return budget.cores_count if budget else None
+
+
+def get_ffmpeg_thread_params() -> List[str]:
+    """The ffmpeg `-threads` flag of the current job budget, empty without a budget."""
+    threads = get_ffmpeg_threads()
+    return ["-threads", str(threads)] if threads else []
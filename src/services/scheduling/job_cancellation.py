@@ -0,0 +1,250 @@
+import glob
+import os
+import re
+import shutil
+import signal
+import subprocess
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List
+
+from configs.logger import log_context, print_info_log
+from constants.files import PROCESSING_FILES_DIR_PATH
+from constants.log_tags import LogTag
+from services.profiling.job_profiler import PROFILE_DIR_NAME
+from utils.workspace import get_job_workspace_dir
+
+
+class JobCancelledError(Exception):
+    """The job was cancelled while it was queued or running, e.g. because its project was deleted."""
+    pass
+
+
+class CancellationToken:
+    """Cancellation state of one running job, checked by the job between units of work."""
+
+    def __init__(self, project_id: str):
+        self.project_id = project_id
+        self.cancelled_event = threading.Event()
+        self.reason = None
+        # Subprocesses started by the job, killed on cancellation
+        self.processes: List[subprocess.Popen] = []
+
+    @property
+    def is_cancelled(self) -> bool:
+        return self.cancelled_event.is_set()
+
+    def cancel(self, reason: str):
+        if not self.is_cancelled:
+            self.reason = reason
+            self.cancelled_event.set()
+
+    def raise_if_cancelled(self):
+        if self.is_cancelled:
+            raise JobCancelledError(f"Job of project {self.project_id} is cancelled: {self.reason}")
+
+
+current_cancellation_token: ContextVar[CancellationToken | None] = ContextVar("current_cancellation_token", default=None)
+
+running_jobs_lock = threading.Lock()
+running_job_tokens: Dict[str, List[CancellationToken]] = {}
+
+
+def is_job_cancelled() -> bool:
+    token = current_cancellation_token.get()
+    return token is not None and token.is_cancelled
+
+
+def raise_if_job_cancelled():
+    """
+    Stops the job of the calling thread with JobCancelledError if it is cancelled.
+    Stage loops call it between units of work: diarization turns, TTS segments, overlay segments.
+    """
+    token = current_cancellation_token.get()
+    if token is not None:
+        token.raise_if_cancelled()
+
+
+def get_job_cancelled_error(error: Exception) -> JobCancelledError | None:
+    """
+    Returns the error as JobCancelledError if the job of the calling thread is cancelled, None otherwise.
+    Errors of a cancelled job, e.g. of its killed ffmpeg processes, are caused by the cancellation.
+    """
+    if isinstance(error, JobCancelledError):
+        return error
+
+    token = current_cancellation_token.get()
+    if token is None or not token.is_cancelled:
+        return None
+
+    cancelled_error = JobCancelledError(f"Job of project {token.project_id} is cancelled: {token.reason}")
+    cancelled_error.__cause__ = error
+    return cancelled_error
+
+
+def track_job_process(process: subprocess.Popen):
+    """Kills the subprocess if the job of the calling thread is cancelled."""
+    token = current_cancellation_token.get()
+    if token is not None:
+        token.processes.append(process)
+
+
+def get_child_process_ids(process_id: int) -> List[int]:
+    """Ids of all descendant processes, from /proc."""
+    children_ids: Dict[int, List[int]] = {}
+    for stat_path in glob.glob("/proc/[0-9]*/stat"):
+        try:
+            with open(stat_path) as stat_file:
+                # The command name in brackets may contain spaces
+                stat_fields = stat_file.read().rsplit(")", 1)[1].split()
+        except (OSError, IndexError):
+            continue
+        child_id = int(stat_path.split("/")[2])
+        children_ids.setdefault(int(stat_fields[1]), []).append(child_id)
+
+    process_ids = []
+    parent_ids = [process_id]
+    while parent_ids:
+        parent_ids = [child_id for parent_id in parent_ids for child_id in children_ids.get(parent_id, [])]
+        process_ids += parent_ids
+    return process_ids
+
+
+def kill_job_processes(token: CancellationToken, include_project_processes: bool = True) -> int:
+    """
+    Kills the subprocesses of the job: the tracked ones and the child processes working on the project files,
+    e.g. ffmpeg started by moviepy and pydub. Returns the number of killed processes.
+
+    :param include_project_processes: Kill the untracked processes working on the project files too,
+        off while another job of the project runs in this process, they may be its processes.
+    """
+    process_ids = {process.pid for process in token.processes if process.poll() is None}
+
+    # Project files are named `<project id>.<extension>`, `<project id>-<suffix>` or are in `jobs/<project id>/`
+    project_file_pattern = re.compile(rf"/{re.escape(token.project_id)}[.\-/]".encode())
+    for process_id in get_child_process_ids(os.getpid()) if include_project_processes else []:
+        try:
+            with open(f"/proc/{process_id}/cmdline", "rb") as cmdline_file:
+                cmdline = cmdline_file.read()
+        except OSError:
+            continue
+        if project_file_pattern.search(cmdline):
+            process_ids.add(process_id)
+
+    killed_count = 0
+    for process_id in process_ids:
+        try:
+            os.kill(process_id, signal.SIGKILL)
+            killed_count += 1
+        except ProcessLookupError:
+            pass
+    return killed_count
+
+
+def clean_up_job_files(project_id: str):
+    """Removes the processing files and the workspace of the cancelled job, except its profile."""
+    project_files_pattern = os.path.join(glob.escape(PROCESSING_FILES_DIR_PATH), f"{glob.escape(project_id)}[.-]*")
+    for file_path in glob.glob(project_files_pattern):
+        if os.path.isfile(file_path) or os.path.islink(file_path):
+            os.remove(file_path)
+
+    workspace_dir = get_job_workspace_dir(project_id, create=False)
+    if not os.path.isdir(workspace_dir):
+        return
+    for entry_name in os.listdir(workspace_dir):
+        if entry_name == PROFILE_DIR_NAME:
+            continue
+        entry_path = os.path.join(workspace_dir, entry_name)
+        if os.path.isdir(entry_path):
+            shutil.rmtree(entry_path, ignore_errors=True)
+        else:
+            os.remove(entry_path)
+
+
+def cancel_job(project_id: str, reason: str = "cancelled by request", show_logs: bool = False) -> bool:
+    """
+    Cancels the running jobs of the project in this process and kills their subprocesses right away,
+    so the CPU is free within seconds. The job stops at its next cancellation check.
+
+    :param project_id: The id of the processing project.
+    :param reason: Why the job is cancelled, in the error of the job.
+    :param show_logs: Determines whether to display logs of cancellation.
+    :return: Whether a running job of the project was found.
+    """
+    with running_jobs_lock:
+        tokens = list(running_job_tokens.get(project_id, []))
+
+    for token in tokens:
+        token.cancel(reason)
+        killed_count = kill_job_processes(token)
+        if show_logs:
+            print_info_log(
+                tag=LogTag.JOB_CANCELLATION,
+                message=f"Job of project {project_id} is cancelled: {reason}, {killed_count} processes killed"
+            )
+    return bool(tokens)
+
+
+def cancel_job_token(token: CancellationToken, reason: str, show_logs: bool = False):
+    """
+    Cancels one running job, other jobs of its project keep running, e.g. a job whose lease was lost
+    while another worker thread of this process has claimed the job again.
+
+    :param token: The cancellation token of the job, yielded by cancellable_job.
+    :param reason: Why the job is cancelled, in the error of the job.
+    :param show_logs: Determines whether to display logs of cancellation.
+    """
+    with running_jobs_lock:
+        project_tokens = running_job_tokens.get(token.project_id, [])
+        is_running = token in project_tokens
+        has_other_jobs = len(project_tokens) > 1
+
+    token.cancel(reason)
+    if not is_running:
+        return
+    killed_count = kill_job_processes(token, include_project_processes=not has_other_jobs)
+    if show_logs:
+        print_info_log(
+            tag=LogTag.JOB_CANCELLATION,
+            message=f"A job of project {token.project_id} is cancelled: {reason}, {killed_count} processes killed"
+        )
+
+
+@contextmanager
+def cancellable_job(project_id: str, show_logs: bool = False):
+    """
+    Runs the job inside with a cancellation token, so cancel_job can stop it.
+    Once the cancelled job stops, its left subprocesses are killed and its files are removed.
+
+    :param project_id: The id of the processing project.
+    :param show_logs: Determines whether to display logs of cancellation.
+    """
+    token = CancellationToken(project_id=project_id)
+    with running_jobs_lock:
+        running_job_tokens.setdefault(project_id, []).append(token)
+    context_token = current_cancellation_token.set(token)
+
+    try:
+        # Logs of the job carry its project id
+        with log_context(project_id=project_id):
+            yield token
+    finally:
+        current_cancellation_token.reset(context_token)
+        with running_jobs_lock:
+            running_job_tokens[project_id].remove(token)
+            if not running_job_tokens[project_id]:
+                del running_job_tokens[project_id]
+            has_other_jobs = project_id in running_job_tokens
+
+        if token.is_cancelled:
+            # Files and processes of the project are shared with its other running jobs
+            kill_job_processes(token, include_project_processes=not has_other_jobs)
+            if not has_other_jobs:
+                clean_up_job_files(project_id)
+            if show_logs:
+                print_info_log(
+                    tag=LogTag.JOB_CANCELLATION,
+                    message=f"Cancelled job of project {project_id} stopped"
+                            + ("" if has_other_jobs else ", its files are removed")
+                )
@@ -0,0 +1,133 @@
+import threading
+from typing import Any, Callable, Dict
+
+from configs.env import JOB_DEDUPLICATION_ENABLED
+from configs.logger import print_info_log
+from constants.log_tags import LogTag
+from services.checkpoints.job_checkpoints import get_job_fingerprint
+from services.metrics.pipeline_metrics import JOBS_COALESCED
+from services.scheduling.admission_controller import JobRejectedError
+from services.scheduling.job_cancellation import raise_if_job_cancelled, JobCancelledError
+
+# Seconds between cancellation checks of a duplicate request waiting for the running job
+DUPLICATE_CANCELLATION_CHECK_INTERVAL = 1
+
+
+class DuplicateJobFailedError(Exception):
+    """The running job a duplicate request waited for failed, the error of that job is the cause."""
+    pass
+
+
+class InFlightJob:
+    """Result of a running job, shared with the duplicate requests waiting for it."""
+
+    def __init__(self):
+        self.done_event = threading.Event()
+        self.result = None
+        self.error: BaseException | None = None
+        self.duplicates_count = 0
+
+
+class JobDeduplicator:
+    """
+    Runs one job per key at a time in this process.
+    A job started while another job with the same key is running waits for that job and gets its result.
+    If that job fails, the waiting job raises `DuplicateJobFailedError` caused by its error.
+    Cancelled and rejected jobs are still reported as `JobCancelledError` and `JobRejectedError`.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.in_flight_jobs: Dict[str, InFlightJob] = {}
+
+    def run(self, key: str, job: Callable[[], Any], show_logs: bool = False) -> Any:
+        with self.lock:
+            in_flight_job = self.in_flight_jobs.get(key)
+            is_duplicate = in_flight_job is not None
+            if is_duplicate:
+                in_flight_job.duplicates_count += 1
+            else:
+                in_flight_job = InFlightJob()
+                self.in_flight_jobs[key] = in_flight_job
+
+        if is_duplicate:
+            JOBS_COALESCED.inc()
+            if show_logs:
+                print_info_log(
+                    tag=LogTag.JOB_DEDUPLICATION,
+                    message=f"Job {key} is already running, waiting for its result"
+                )
+
+            # A cancelled duplicate stops waiting, the running job goes on for the others
+            while not in_flight_job.done_event.wait(DUPLICATE_CANCELLATION_CHECK_INTERVAL):
+                raise_if_job_cancelled()
+            error = in_flight_job.error
+            # Every waiter raises its own error, re-raising the shared one would add to its traceback
+            if isinstance(error, JobCancelledError):
+                # Raised as is, so a cancelled job is still reported as cancelled
+                raise error
+            if isinstance(error, JobRejectedError):
+                raise JobRejectedError(
+                    str(error),
+                    status_code=error.status_code,
+                    retry_after=error.retry_after
+                ) from error
+            if error is not None:
+                raise DuplicateJobFailedError(f"Job {key} failed: {error}") from error
+            return in_flight_job.result
+
+        try:
+            in_flight_job.result = job()
+            return in_flight_job.result
+        except BaseException as e:
+            in_flight_job.error = e
+            raise
+        finally:
+            # Requests coming after this are a new job, e.g. a retry after the error
+            with self.lock:
+                del self.in_flight_jobs[key]
+            in_flight_job.done_event.set()
+
+            if show_logs and in_flight_job.duplicates_count:
+                print_info_log(
+                    tag=LogTag.JOB_DEDUPLICATION,
+                    message=f"Job {key} finished for {in_flight_job.duplicates_count} duplicate requests too"
+                )
+
+
+job_deduplicator = JobDeduplicator()
+
+
+def get_job_key(project_id: str, original_file_location: str, **job_parameters) -> str:
+    """
+    Project and the fingerprint of the job inputs, the same as of its checkpoints:
+    a new upload to the same location or other job parameters, e.g. the target language, are a new job.
+    """
+    return f"{project_id}:{get_job_fingerprint(original_file_location, **job_parameters)}"
+
+
+def deduplicate_job(
+    project_id: str,
+    original_file_location: str,
+    job: Callable[[], Any],
+    show_logs: bool = False,
+    **job_parameters
+) -> Any:
+    """
+    Runs the job, unless the same job is already running in this process: then waits for it and returns its result.
+    Runs the job right away if JOB_DEDUPLICATION_ENABLED is off.
+
+    :param project_id: The id of the processing project.
+    :param original_file_location: The location of the original media file in the cloud storage.
+    :param job: Runs the job and returns its result.
+    :param show_logs: Determines whether to display logs of deduplication.
+    :param job_parameters: Job parameters which change the job output, like of get_job_checkpoints.
+    """
+    if not JOB_DEDUPLICATION_ENABLED:
+        return job()
+
+    return job_deduplicator.run(
+        key=get_job_key(project_id=project_id, original_file_location=original_file_location, **job_parameters),
+        job=job,
+        show_logs=show_logs
+    )
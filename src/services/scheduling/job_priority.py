@@ -0,0 +1,53 @@
+from configs.env import JOB_AGING_RATE, JOB_TENANT_PENALTY
+from models.job_priority import JobPriority
+
+# Seconds of media a job of the class is scored as longer than it is, classes overlap thanks to aging
+PRIORITY_CLASS_OFFSETS = {
+    JobPriority.HIGH: 0,
+    JobPriority.NORMAL: 15 * 60,
+    JobPriority.LOW: 60 * 60,
+}
+
+
+def get_tenant_id(original_file_location: str) -> str:
+    """Media files are stored as `<user id>/<project id>/<file name>`, the user is the tenant."""
+    return original_file_location.strip("/").split("/")[0]
+
+
+def get_job_score(
+    priority: JobPriority,
+    media_seconds: float,
+    waited_seconds: float,
+    tenant_running_jobs: int = 0,
+    aging_rate: float = JOB_AGING_RATE,
+    tenant_penalty: float = JOB_TENANT_PENALTY
+) -> float:
+    """
+    Scores a queued job, the lowest score runs first.
+
+    Shorter media runs first within a priority class, waiting moves a job ahead by `aging_rate`
+    media seconds per second, so a long job runs at the latest once it has waited about its own length.
+    Jobs of tenants which already have running jobs are moved back by `tenant_penalty` per running job.
+    """
+    return (
+        PRIORITY_CLASS_OFFSETS[JobPriority(priority)]
+        + media_seconds
+        + tenant_running_jobs * tenant_penalty
+        - waited_seconds * aging_rate
+    )
+
+
+def get_job_sort_key(
+    priority: JobPriority,
+    media_seconds: float,
+    enqueued_at: float,
+    aging_rate: float = JOB_AGING_RATE
+) -> float:
+    """
+    `get_job_score` without the tenant penalty, shifted by the same `now * aging_rate` for every job.
+    The key does not change while the job waits, so a store can order queued jobs by it
+    in the order of their current scores.
+
+    :param enqueued_at: Unix time the job was enqueued at.
+    """
+    return PRIORITY_CLASS_OFFSETS[JobPriority(priority)] + media_seconds + enqueued_at * aging_rate
@@ -1,10 +1,24 @@
+import threading
+
 import sentry_sdk
 
-from configs.env import SENTRY_DSN, ENVIRONMENT
+from configs.env import SENTRY_DSN, ENVIRONMENT, SENTRY_TRACES_SAMPLE_RATE
+
+init_lock = threading.Lock()
+is_sentry_initialized = False
 
 
 def init_sentry():
-    sentry_sdk.init(
-        dsn=SENTRY_DSN,
-        environment=ENVIRONMENT
-    )
+    """Initializes Sentry once per process, later calls do nothing."""
+    global is_sentry_initialized
+
+    with init_lock:
+        if is_sentry_initialized:
+            return
+
+        sentry_sdk.init(
+            dsn=SENTRY_DSN,
+            environment=ENVIRONMENT,
+            traces_sample_rate=SENTRY_TRACES_SAMPLE_RATE
+        )
+        is_sentry_initialized = True
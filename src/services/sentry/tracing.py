@@ -0,0 +1,51 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+import sentry_sdk
+
+# Transaction of the current job
+current_job_transaction: ContextVar = ContextVar("current_job_transaction", default=None)
+# Tags of the current job, copied to every span opened after they are set
+current_job_trace_tags: ContextVar[dict] = ContextVar("current_job_trace_tags", default={})
+
+
+@contextmanager
+def trace_job(name: str):
+    """
+    Wraps the job in a Sentry transaction, sampled with SENTRY_TRACES_SAMPLE_RATE.
+    Can be used as a decorator of the job function.
+    """
+    with sentry_sdk.start_transaction(op="dub.job", name=name) as transaction:
+        transaction_token = current_job_transaction.set(transaction)
+        tags_token = current_job_trace_tags.set({})
+        try:
+            yield transaction
+        finally:
+            current_job_transaction.reset(transaction_token)
+            current_job_trace_tags.reset(tags_token)
+
+
+def set_job_trace_tags(**tags):
+    """
+    Tags the job transaction, e.g. with media duration, segment count and speaker count.
+    Spans opened afterwards get the same tags.
+    """
+    transaction = current_job_transaction.get()
+    if transaction is None:
+        return
+
+    current_job_trace_tags.get().update(tags)
+    for key, value in tags.items():
+        transaction.set_tag(key, value)
+
+
+@contextmanager
+def trace_span(op: str, description: str):
+    """
+    Opens a child span of the current job, e.g. a pipeline stage or an external call.
+    Does nothing when the job is not sampled.
+    """
+    with sentry_sdk.start_span(op=op, description=description) as span:
+        for key, value in current_job_trace_tags.get().items():
+            span.set_tag(key, value)
+        yield span
@@ -0,0 +1,156 @@
+from typing import List, Tuple
+
+import numpy as np
+
+from constants.audio import SAMPLE_RATE
+from models.text_segment import TextSegment
+from services.speech_to_text.voice_activity import detect_speech_regions
+from utils.audio_activity import get_frame_levels_db
+
+# Whisper decodes windows of 30 seconds
+WINDOW_SECONDS = 30
+# Pauses this long split the audio into windows
+WINDOW_MIN_PAUSE_SECONDS = 0.3
+# Speech longer than a window is cut at its quietest frame in the last seconds of the window
+CUT_SEARCH_SECONDS = 5.0
+CUT_FRAME_SECONDS = 0.02
+# Whisper timestamp tokens are 20 ms apart
+TIMESTAMP_TOKEN_SECONDS = 0.02
+# The same no speech check as whisper transcribe
+LOGPROB_THRESHOLD = -1.0
+
+
+def find_quietest_sample(audio: np.ndarray, start: int, end: int) -> int:
+    frame_size = int(CUT_FRAME_SECONDS * SAMPLE_RATE)
+    levels_db = get_frame_levels_db(audio[start:end], frame_size)
+    if len(levels_db) == 0:
+        return end
+    return start + int(np.argmin(levels_db)) * frame_size + frame_size // 2
+
+
+def split_into_windows(audio: np.ndarray, window_seconds: float = WINDOW_SECONDS) -> List[Tuple[int, int]]:
+    """
+    Splits the audio into windows of up to `window_seconds` at pauses, silence at the edges is left out.
+
+    :return: (start, end) sample indices of the windows, in order.
+    """
+    max_window_size = int(window_seconds * SAMPLE_RATE)
+    cut_search_size = int(CUT_SEARCH_SECONDS * SAMPLE_RATE)
+    speech_regions = detect_speech_regions(
+        audio,
+        min_silence_seconds=WINDOW_MIN_PAUSE_SECONDS,
+        min_speech_seconds=0.0
+    )
+
+    windows: List[List[int]] = []
+
+    def add_region(region_start: int, region_end: int):
+        if windows and region_end - windows[-1][0] <= max_window_size:
+            windows[-1][1] = region_end
+        else:
+            windows.append([region_start, region_end])
+
+    for start, end in speech_regions:
+        while end - start > max_window_size:
+            cut = find_quietest_sample(audio, start + max_window_size - cut_search_size, start + max_window_size)
+            add_region(start, cut)
+            start = cut
+        add_region(start, end)
+
+    return [(start, end) for start, end in windows]
+
+
+def parse_timestamped_tokens(tokens: List[int], tokenizer, window_seconds: float) -> List[Tuple[float, float, str]]:
+    """
+    Splits the decoded tokens of one window into segments at timestamp tokens,
+    `<|0.00|> text <|2.40|><|2.40|> text <|5.00|>`. Times are relative to the window.
+    """
+    segments = []
+    # Text without its own start timestamp starts at the previous timestamp
+    segment_start = 0.0
+    text_tokens = []
+    for token in tokens:
+        if token < tokenizer.timestamp_begin:
+            text_tokens.append(token)
+            continue
+
+        timestamp = min((token - tokenizer.timestamp_begin) * TIMESTAMP_TOKEN_SECONDS, window_seconds)
+        if text_tokens:
+            segments.append((segment_start, timestamp, tokenizer.decode(text_tokens)))
+            text_tokens = []
+        segment_start = timestamp
+
+    # Text after the last timestamp lasts until the end of the window
+    if text_tokens:
+        segments.append((segment_start, window_seconds, tokenizer.decode(text_tokens)))
+    return segments
+
+
+def transcribe_batched(
+    model,
+    audio: np.ndarray,
+    batch_size: int,
+    temperature: float | None = None,
+    no_speech_threshold: float | None = None
+) -> List[TextSegment]:
+    """
+    Transcribes long audio with openai-whisper, decoding `batch_size` windows per forward pass
+    instead of one window after another. Windows end at pauses, so their text does not overlap.
+
+    :param model: The loaded whisper model.
+    :param audio: Mono float32 audio at 16 kHz.
+    :param batch_size: Windows decoded at once.
+    :param temperature: Sampling temperature, greedy decoding if not set.
+    :param no_speech_threshold: Windows more likely silent than this are skipped, 0.6 like whisper if not set.
+    :return: Text segments with times relative to the audio start.
+    """
+    import torch
+    import whisper
+    from whisper.audio import log_mel_spectrogram, pad_or_trim
+    from whisper.tokenizer import get_tokenizer
+
+    windows = split_into_windows(audio)
+    if not windows:
+        return []
+
+    def get_mel(start: int, end: int):
+        return log_mel_spectrogram(pad_or_trim(audio[start:end]), model.dims.n_mels).to(model.device)
+
+    # Language is detected once from the first window, like in whisper transcribe
+    language = "en"
+    if model.is_multilingual:
+        _, language_probs = model.detect_language(get_mel(*windows[0]))
+        language = max(language_probs, key=language_probs.get)
+    tokenizer = get_tokenizer(
+        model.is_multilingual,
+        num_languages=model.num_languages,
+        language=language,
+        task="transcribe"
+    )
+    options = whisper.DecodingOptions(
+        task="transcribe",
+        language=language,
+        temperature=temperature or 0.0,
+        fp16=model.device.type == "cuda"
+    )
+    no_speech_threshold = 0.6 if no_speech_threshold is None else no_speech_threshold
+
+    text_segments = []
+    for batch_start in range(0, len(windows), batch_size):
+        batch_windows = windows[batch_start:batch_start + batch_size]
+        mels = torch.stack([get_mel(start, end) for start, end in batch_windows])
+        results = whisper.decode(model, mels, options)
+
+        for (window_start, window_end), result in zip(batch_windows, results):
+            if result.no_speech_prob > no_speech_threshold and result.avg_logprob < LOGPROB_THRESHOLD:
+                continue
+
+            window_offset = window_start / SAMPLE_RATE
+            window_seconds = (window_end - window_start) / SAMPLE_RATE
+            for start, end, text in parse_timestamped_tokens(result.tokens, tokenizer, window_seconds):
+                if text.strip():
+                    text_segments.append(TextSegment(
+                        original_timestamp=(window_offset + start, window_offset + end),
+                        text=text
+                    ))
+    return text_segments
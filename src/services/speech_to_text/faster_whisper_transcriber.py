@@ -0,0 +1,47 @@
+from typing import List
+
+import numpy as np
+
+from configs.env import SPEECH_TO_TEXT_BATCH_SIZE
+from models.text_segment import TextSegment
+from services.ml_models.model_registry import get_faster_whisper_model
+from services.speech_to_text.transcriber import Transcriber
+
+
+class FasterWhisperTranscriber(Transcriber):
+    """
+    The same whisper model in CTranslate2, int8 quantized by default (FASTER_WHISPER_COMPUTE_TYPE).
+    Several times faster than openai-whisper on CPU at a close word error rate.
+    With SPEECH_TO_TEXT_BATCH_SIZE above 1 the batched pipeline of faster-whisper decodes several windows at once.
+    """
+
+    def transcribe(
+        self,
+        audio: np.ndarray,
+        temperature: float | None = None,
+        no_speech_threshold: float | None = None
+    ) -> List[TextSegment]:
+        options = {}
+        if temperature is not None:
+            options["temperature"] = temperature
+        if no_speech_threshold is not None:
+            options["no_speech_threshold"] = no_speech_threshold
+
+        model = get_faster_whisper_model()
+        if SPEECH_TO_TEXT_BATCH_SIZE > 1:
+            from faster_whisper import BatchedInferencePipeline
+
+            # Windows are cut at pauses found by the VAD of faster-whisper
+            segments, _ = BatchedInferencePipeline(model=model).transcribe(
+                audio,
+                batch_size=SPEECH_TO_TEXT_BATCH_SIZE,
+                **options
+            )
+        else:
+            segments, _ = model.transcribe(audio, **options)
+
+        # Segments are decoded lazily while the generator is read
+        return [
+            TextSegment(original_timestamp=(segment.start, segment.end), text=segment.text)
+            for segment in segments
+        ]
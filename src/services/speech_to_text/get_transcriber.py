@@ -0,0 +1,21 @@
+from functools import lru_cache
+
+from configs.env import SPEECH_TO_TEXT_BACKEND
+from constants.backends import SpeechToTextBackend
+from services.speech_to_text.transcriber import Transcriber
+
+
+@lru_cache(maxsize=None)
+def get_transcriber(backend: SpeechToTextBackend | None = None) -> Transcriber:
+    """Returns the speech to text engine of `backend`, of the configured SPEECH_TO_TEXT_BACKEND by default."""
+    if backend is None:
+        backend = SpeechToTextBackend(SPEECH_TO_TEXT_BACKEND)
+
+    if backend == SpeechToTextBackend.FASTER_WHISPER:
+        from services.speech_to_text.faster_whisper_transcriber import FasterWhisperTranscriber
+
+        return FasterWhisperTranscriber()
+
+    from services.speech_to_text.whisper_transcriber import WhisperTranscriber
+
+    return WhisperTranscriber()
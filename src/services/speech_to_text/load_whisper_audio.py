@@ -0,0 +1,30 @@
+import os
+
+from configs.env import PCM_MEMMAP_ENABLED
+from constants.audio import SAMPLE_RATE
+from utils.audio_buffer import AudioBuffer
+from utils.pcm_file import get_job_pcm_file_path
+
+WHISPER_PCM_FILE_NAME = "whisper"
+
+
+def get_whisper_pcm_file_path(project_id: str) -> str:
+    """Raw float32 file of the whisper audio of the job, in the job workspace."""
+    return get_job_pcm_file_path(project_id, WHISPER_PCM_FILE_NAME)
+
+
+def load_whisper_audio(file_path: str, project_id: str | None = None) -> AudioBuffer:
+    """
+    Decodes the media file to whisper audio, mono float32 at 16 kHz.
+
+    With a `project_id` and PCM_MEMMAP_ENABLED the audio is decoded to a file in the job workspace
+    and mapped, so an hour of media does not take 230 MB of memory. Slices of the result are views of the file.
+    """
+    pcm_file_path = get_whisper_pcm_file_path(project_id) if PCM_MEMMAP_ENABLED and project_id else None
+    return AudioBuffer.from_file(file_path, sample_rate=SAMPLE_RATE, pcm_file_path=pcm_file_path)
+
+
+def remove_whisper_pcm_file(project_id: str):
+    pcm_file_path = get_whisper_pcm_file_path(project_id)
+    if os.path.exists(pcm_file_path):
+        os.remove(pcm_file_path)
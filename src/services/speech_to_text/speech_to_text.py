@@ -1,39 +1,83 @@
+from __future__ import annotations
+
 import os
 import re
+from typing import Tuple, TYPE_CHECKING
+
+import numpy as np
 
-import torch
-from moviepy.audio.io.AudioFileClip import AudioFileClip
-from moviepy.video.io.VideoFileClip import VideoFileClip
-from pyannote.audio import Pipeline
-from whisper import load_model, load_audio
 from whisper.audio import SAMPLE_RATE
 
+from configs.env import VAD_ENABLED, PCM_MEMMAP_ENABLED
 from configs.logger import catch_error, print_info_log
 from constants.files import PROCESSING_FILES_DIR_PATH
 from constants.log_tags import LogTag
-from constants.whisper_model import WhisperModel
-from models.text_segment import TextSegment
-
-# Load whisper model by name
-model = load_model(WhisperModel.BASE)
-
+from constants.ml_models import MlModel
+from models.pipeline_stage import PipelineStage
+from models.segment_table import SegmentTable
+from services.metrics.pipeline_metrics import track_stage
+from services.ml_models.model_registry import get_diarization_pipeline, model_inference
+from services.scheduling.job_cancellation import raise_if_job_cancelled
+from services.speech_to_text.get_transcriber import get_transcriber
+from services.speech_to_text.load_whisper_audio import load_whisper_audio
+from services.speech_to_text.voice_activity import (
+    detect_speech_regions, compact_speech, CompactedTimeline, MIN_SKIPPED_SHARE
+)
+from utils.audio_buffer import AudioBuffer
+from utils.pcm_file import get_job_pcm_file_path
+
+# Raw PCM file of the VAD packed speech audio in the job workspace
+SPEECH_PCM_FILE_NAME = "speech"
+
+if TYPE_CHECKING:
+    # Stage modules do not depend on Firebase, the reporter is passed in by the caller
+    from services.firebase.firestore.project_progress import ProjectProgressReporter
+
+
+def get_speech_audio(
+    audio,
+    show_logs: bool = False,
+    pcm_file_path: str | None = None
+) -> Tuple[np.ndarray, CompactedTimeline]:
+    """
+    Drops silence from the audio with VAD_ENABLED, so whisper does not decode it or make up text for it.
+    Returns the speech audio and the timeline to map its times back to the original audio.
+    With `pcm_file_path` the speech audio is packed into this PCM file and mapped, see `compact_speech`.
+    """
+    timeline = CompactedTimeline()
+    if not VAD_ENABLED:
+        return audio, timeline
+
+    speech_regions = detect_speech_regions(audio)
+    speech_samples_count = sum(end - start for start, end in speech_regions)
+    if speech_regions and speech_samples_count > len(audio) * (1 - MIN_SKIPPED_SHARE):
+        # Too little silence to be worth packing
+        return audio, timeline
+
+    if show_logs:
+        print_info_log(
+            tag=LogTag.SPEECH_TO_TEXT,
+            message=f"Voice activity: {len(speech_regions)} speech regions, "
+                    f"{speech_samples_count / SAMPLE_RATE:.1f}s of {len(audio) / SAMPLE_RATE:.1f}s are transcribed"
+        )
+    return compact_speech(audio, speech_regions, pcm_file_path=pcm_file_path)
 
-# Функция для проверки расширения файла
-def check_audio_format(file_path, desired_format=".wav"):
-    _, file_extension = os.path.splitext(file_path)
-    return file_extension.lower() == desired_format
 
+def transcribe_segment(audio: AudioBuffer, start, end):
+    return get_transcriber().transcribe_text(audio.slice(start, end).samples)
 
-def transcribe_segment(audio, start, end):
-    audio_segment = audio[int(start * SAMPLE_RATE):int(end * SAMPLE_RATE)]
 
-    result = model.transcribe(audio_segment)
-    return result['text']
+def speech_to_text(file_path: str, project_id: str, is_cloning: bool, show_logs: bool = False, num_speakers: int = None,
+                   audio: AudioBuffer | None = None,
+                   progress_reporter: ProjectProgressReporter | None = None) -> Tuple[SegmentTable, AudioBuffer]:
+    """
+    Convert the audio content of file into text.
 
+    Pass already decoded `audio` of the file to skip decoding it again.
+    With `progress_reporter` the percent of transcribed speaker turns is published.
 
-def speech_to_text(file_path: str, project_id: str, is_cloning: bool, show_logs: bool = False, num_speakers: int = None,
-                   processed_project_is_video: bool = False):
-    """Convert the audio content of file into text."""
+    :return: The text segments and the whisper audio of the file, mono at 16 kHz.
+    """
 
     try:
         # Check if the file exists
@@ -46,57 +90,73 @@ def speech_to_text(file_path: str, project_id: str, is_cloning: bool, show_logs:
                 message=f"Converting speech to text of {file_path}"
             )
 
-        audio = load_audio(file_path)
-
-        transcript_parts = []
+        if audio is None:
+            with track_stage(PipelineStage.DECODE):
+                audio = load_whisper_audio(file_path, project_id=project_id)
+        audio = audio.to_layout(sample_rate=SAMPLE_RATE, channels=1)
 
         if is_cloning or (num_speakers and num_speakers > 1):
-            audio_temp_path = f"{PROCESSING_FILES_DIR_PATH}/orig.wav"
-            if processed_project_is_video:
-                # Обрабатываем видео файл: извлекаем аудио
-                video = VideoFileClip(file_path)
-                audio_temp = video.audio
-                audio_temp.write_audiofile(audio_temp_path)
-            else:
-                # Проверяем формат аудио файла
-                if check_audio_format(file_path):
-                    audio_temp_path = file_path
-                else:
-                    # Конвертируем аудио файл в WAV
-                    audio_temp = AudioFileClip(file_path)
-                    audio_temp.write_audiofile(audio_temp_path)
+            import torch
 
             # TODO: speakers number.
-            pipeline = Pipeline.from_pretrained("pyannote/speaker-diarization-3.1",
-                                                use_auth_token=os.getenv("HUGGING_FACE_TOKEN"))
-
-            if torch.cuda.is_available():
-                pipeline.to(torch.device("cuda"))
-            diarization = pipeline(audio_temp_path, num_speakers=num_speakers)
-            for turn, _, speaker in diarization.itertracks(yield_label=True):
+            pipeline = get_diarization_pipeline()
+            with track_stage(PipelineStage.DIARIZATION), model_inference(MlModel.DIARIZATION):
+                # pyannote takes decoded audio of (channels, frames), the file is not decoded again to a WAV file
+                diarization = pipeline(
+                    {"waveform": torch.from_numpy(audio.samples[np.newaxis, :]), "sample_rate": audio.sample_rate},
+                    num_speakers=num_speakers
+                )
+            speaker_turns = list(diarization.itertracks(yield_label=True))
+            starts, ends, texts, speakers = [], [], [], []
+            for turn_index, (turn, _, speaker) in enumerate(speaker_turns):
+                raise_if_job_cancelled()
                 start, end = turn.start, turn.end
-                transcript = transcribe_segment(audio, start, end)
+                with track_stage(PipelineStage.SPEECH_TO_TEXT):
+                    transcript = transcribe_segment(audio, start, end)
                 if show_logs:
                     print_info_log(
                         tag=LogTag.SPEECH_TO_TEXT,
-                        message=f"Speaker {speaker}: {transcript}"
+                        message=lambda: f"Speaker {speaker}: {transcript}",
+                        sampled=True
                     )
                 number = re.findall('\\d+', speaker)
-                transcript_parts.append(TextSegment(
-                    original_timestamp=(start, end),
-                    text=transcript,
-                    speaker=int(number[0])
-                ))
+                starts.append(start)
+                ends.append(end)
+                texts.append(transcript)
+                speakers.append(int(number[0]))
+                if progress_reporter:
+                    progress_reporter.report(PipelineStage.SPEECH_TO_TEXT, turn_index + 1, len(speaker_turns))
+            transcript_parts = SegmentTable(starts, ends, texts, speakers)
         else:
-            result = model.transcribe(
-                audio,
-                temperature=1.0,
-                no_speech_threshold=0.2,
+            speech_pcm_file_path = (
+                get_job_pcm_file_path(project_id, SPEECH_PCM_FILE_NAME) if PCM_MEMMAP_ENABLED else None
+            )
+            speech_audio, speech_timeline = get_speech_audio(
+                audio.samples,
+                show_logs=show_logs,
+                pcm_file_path=speech_pcm_file_path
             )
-            transcript_parts = [TextSegment(
-                original_timestamp=(segment['start'], segment['end']),
-                text=segment['text']
-            ) for segment in result["segments"]]
+            speech_segments = []
+            try:
+                if len(speech_audio) > 0:
+                    with track_stage(PipelineStage.SPEECH_TO_TEXT):
+                        speech_segments = get_transcriber().transcribe(
+                            speech_audio,
+                            temperature=1.0,
+                            no_speech_threshold=0.2,
+                        )
+            finally:
+                # The packed audio is only transcribed, its file is removed once whisper is done with it
+                speech_audio = None
+                if speech_pcm_file_path and os.path.exists(speech_pcm_file_path):
+                    os.remove(speech_pcm_file_path)
+            speech_table = SegmentTable.from_segments(speech_segments)
+            original_starts = speech_timeline.to_original_array(speech_table.starts, is_start=True)
+            # A segment inside a gap has its start snapped past its end
+            original_ends = np.maximum(speech_timeline.to_original_array(speech_table.ends), original_starts)
+            transcript_parts = speech_table.with_times(original_starts, original_ends)
+            if progress_reporter:
+                progress_reporter.report(PipelineStage.SPEECH_TO_TEXT, 1, 1)
 
         return transcript_parts, audio
 
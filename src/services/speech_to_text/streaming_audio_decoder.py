@@ -0,0 +1,122 @@
+import os
+import subprocess
+import threading
+
+import numpy as np
+from configs.logger import print_info_log
+from constants.audio import SAMPLE_RATE
+from constants.log_tags import LogTag
+from services.scheduling.cpu_budget import get_ffmpeg_threads
+from services.scheduling.job_cancellation import track_job_process
+from utils.audio_buffer import AudioBuffer
+from utils.pcm_file import get_pcm_decode_command, open_pcm_file
+
+
+class StreamingAudioDecoder:
+    """
+    Decodes media to whisper audio (mono float32 at 16 kHz) while the media file is still downloading.
+
+    The downloaded bytes are fed to ffmpeg stdin in order. Containers which can not be decoded
+    from a pipe (e.g. mp4 with the index at the end of the file) make `result` return None,
+    so the caller falls back to decoding the downloaded file.
+
+    With `pcm_file_path` ffmpeg writes float32 samples to that file and `result` maps it,
+    otherwise the samples are collected in memory.
+    """
+
+    def __init__(self, show_logs: bool = False, pcm_file_path: str | None = None):
+        self.show_logs = show_logs
+        self.pcm_file_path = pcm_file_path
+        self.failed = False
+        self.output_chunks = []
+
+        if pcm_file_path:
+            self.process = subprocess.Popen(
+                get_pcm_decode_command("pipe:0", f"{pcm_file_path}.tmp", sample_rate=SAMPLE_RATE),
+                stdin=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+            )
+            self.reader = None
+        else:
+            # The same output format as whisper.load_audio
+            self.process = subprocess.Popen(
+                [
+                    "ffmpeg",
+                    "-nostdin",
+                    "-threads", str(get_ffmpeg_threads() or 0),
+                    "-i", "pipe:0",
+                    "-f", "s16le",
+                    "-ac", "1",
+                    "-acodec", "pcm_s16le",
+                    "-ar", str(SAMPLE_RATE),
+                    "-"
+                ],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+            )
+            # Read output in the background, so ffmpeg never blocks on a full stdout pipe
+            self.reader = threading.Thread(target=self.read_output, daemon=True)
+            self.reader.start()
+        # Its input is a pipe, a project file in its command line is not guaranteed
+        track_job_process(self.process)
+
+    def read_output(self):
+        for chunk in iter(lambda: self.process.stdout.read(1024 * 1024), b""):
+            self.output_chunks.append(chunk)
+
+    def feed(self, data: bytes):
+        if self.failed:
+            return
+
+        try:
+            self.process.stdin.write(data)
+        except (BrokenPipeError, OSError):
+            # ffmpeg exited early, the rest of the file is not needed
+            self.failed = True
+
+    def result(self) -> AudioBuffer | None:
+        """
+        Waits for the end of decoding.
+
+        :return: The decoded audio or None if the media could not be decoded from the stream.
+        """
+        try:
+            self.process.stdin.close()
+        except (BrokenPipeError, OSError):
+            pass
+
+        if self.reader:
+            self.reader.join()
+        return_code = self.process.wait()
+
+        if self.failed or return_code != 0:
+            if self.show_logs:
+                print_info_log(
+                    tag=LogTag.SPEECH_TO_TEXT,
+                    message=f"Streaming decode failed with code {return_code}, decoding downloaded file instead."
+                )
+            if self.pcm_file_path and os.path.exists(f"{self.pcm_file_path}.tmp"):
+                os.remove(f"{self.pcm_file_path}.tmp")
+            return None
+
+        if self.pcm_file_path:
+            os.replace(f"{self.pcm_file_path}.tmp", self.pcm_file_path)
+            return AudioBuffer(open_pcm_file(self.pcm_file_path), SAMPLE_RATE)
+
+        samples = np.frombuffer(b"".join(self.output_chunks), np.int16).flatten().astype(np.float32) / 32768.0
+        return AudioBuffer(samples, SAMPLE_RATE)
+
+    def close(self):
+        """Stops ffmpeg if it is still running, e.g. when the download failed. Does nothing after `result`."""
+        if self.process.poll() is None:
+            self.process.kill()
+        try:
+            self.process.stdin.close()
+        except (BrokenPipeError, OSError):
+            pass
+        self.process.wait()
+        if self.reader:
+            self.reader.join()
+        if self.pcm_file_path and os.path.exists(f"{self.pcm_file_path}.tmp"):
+            os.remove(f"{self.pcm_file_path}.tmp")
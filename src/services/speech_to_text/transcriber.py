@@ -0,0 +1,33 @@
+from abc import ABC, abstractmethod
+from typing import List
+
+import numpy as np
+
+from models.text_segment import TextSegment
+
+
+class Transcriber(ABC):
+    """
+    Speech to text engine. Every engine returns the same text segments,
+    so the engine is picked per node type and compared in benchmarks.
+    """
+
+    @abstractmethod
+    def transcribe(
+        self,
+        audio: np.ndarray,
+        temperature: float | None = None,
+        no_speech_threshold: float | None = None
+    ) -> List[TextSegment]:
+        """
+        Transcribes the audio, segment times are relative to its start.
+
+        :param audio: Mono float32 audio at 16 kHz, as decoded by whisper.
+        :param temperature: Sampling temperature, the engine default if not set.
+        :param no_speech_threshold: Segments more likely silent than this are skipped, the engine default if not set.
+        """
+        pass
+
+    def transcribe_text(self, audio: np.ndarray) -> str:
+        """Text of the whole audio, e.g. of one speaker turn."""
+        return "".join(segment.text for segment in self.transcribe(audio))
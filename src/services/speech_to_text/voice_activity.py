@@ -0,0 +1,145 @@
+from __future__ import annotations
+
+from typing import List, Tuple
+
+import numpy as np
+
+from configs.env import VAD_THRESHOLD_DB, VAD_MIN_SILENCE_SECONDS, VAD_MIN_SPEECH_SECONDS, VAD_PADDING_SECONDS
+from constants.audio import SAMPLE_RATE
+from utils.audio_activity import detect_active_intervals
+from utils.pcm_file import write_pcm_file
+
+# Silence between packed speech regions, so whisper still sees a pause between them
+SPEECH_GAP_SECONDS = 0.3
+# Audio with less silence than this share of it is transcribed as is
+MIN_SKIPPED_SHARE = 0.1
+VAD_FRAME_SECONDS = 0.03
+
+
+def detect_speech_regions(
+    audio: np.ndarray,
+    sample_rate: int = SAMPLE_RATE,
+    threshold_db: float = VAD_THRESHOLD_DB,
+    min_silence_seconds: float = VAD_MIN_SILENCE_SECONDS,
+    min_speech_seconds: float = VAD_MIN_SPEECH_SECONDS,
+    padding_seconds: float = VAD_PADDING_SECONDS
+) -> List[Tuple[int, int]]:
+    """
+    Finds regions with voice activity by frame energy above the noise floor of the audio.
+
+    :param audio: Mono float audio, e.g. decoded by whisper.
+    :param sample_rate: The sample rate of the audio.
+    :param threshold_db: How much louder than the noise floor a speech frame is.
+    :param min_silence_seconds: Shorter pauses are kept inside the speech region.
+    :param min_speech_seconds: Shorter sounds are dropped, e.g. clicks.
+    :param padding_seconds: Added around every region, so word onsets and endings are not cut.
+    :return: (start, end) sample indices of the speech regions, sorted and not overlapping.
+    """
+    speech_intervals = detect_active_intervals(
+        audio,
+        sample_rate=sample_rate,
+        threshold_db=threshold_db,
+        min_silence_seconds=min_silence_seconds,
+        min_active_seconds=min_speech_seconds,
+        padding_seconds=padding_seconds,
+        relative_to_noise_floor=True,
+        frame_seconds=VAD_FRAME_SECONDS
+    )
+    return [(int(start * sample_rate), int(end * sample_rate)) for start, end in speech_intervals]
+
+
+class CompactedTimeline:
+    """Maps times of the packed speech audio back to the original audio."""
+
+    def __init__(self, sample_rate: int = SAMPLE_RATE):
+        self.sample_rate = sample_rate
+        # Start of every packed region in the packed and in the original audio, and its length, seconds
+        self.compacted_starts: List[float] = []
+        self.original_starts: List[float] = []
+        self.durations: List[float] = []
+
+    def add_region(self, compacted_start: int, original_start: int, length: int):
+        self.compacted_starts.append(compacted_start / self.sample_rate)
+        self.original_starts.append(original_start / self.sample_rate)
+        self.durations.append(length / self.sample_rate)
+
+    def to_original(self, seconds: float, is_start: bool = False) -> float:
+        """
+        Original time of the packed audio time.
+
+        Times in the gaps between regions are not speech: starts snap forward to the start of the next region,
+        ends snap back to the end of the previous one.
+        """
+        return float(self.to_original_array(np.array([seconds]), is_start=is_start)[0])
+
+    def to_original_array(self, seconds: np.ndarray, is_start: bool = False) -> np.ndarray:
+        """`to_original` of every time in the array at once."""
+        seconds = np.asarray(seconds, dtype=np.float64)
+        if not self.compacted_starts:
+            return seconds
+
+        compacted_starts = np.asarray(self.compacted_starts)
+        original_starts = np.asarray(self.original_starts)
+        durations = np.asarray(self.durations)
+        region_indices = np.maximum(np.searchsorted(compacted_starts, seconds, side="right") - 1, 0)
+        offsets = np.clip(seconds - compacted_starts[region_indices], 0.0, durations[region_indices])
+        original_times = original_starts[region_indices] + offsets
+
+        if is_start:
+            # A start in the gap after a region is the onset of the next region
+            next_indices = region_indices + 1
+            is_in_gap = (seconds - compacted_starts[region_indices] > durations[region_indices]) & (
+                next_indices < len(compacted_starts)
+            )
+            original_times[is_in_gap] = original_starts[next_indices[is_in_gap]]
+        return original_times
+
+
+def compact_speech(
+    audio: np.ndarray,
+    speech_regions: List[Tuple[int, int]],
+    sample_rate: int = SAMPLE_RATE,
+    pcm_file_path: str | None = None
+) -> Tuple[np.ndarray, CompactedTimeline]:
+    """
+    Packs the speech regions into one buffer, separated by short silences.
+
+    :param pcm_file_path: Write the packed audio to this raw PCM file and map it instead of joining it in memory.
+    :return: The packed audio and the timeline to map its times back to the original audio.
+    """
+    gap = np.zeros(int(SPEECH_GAP_SECONDS * sample_rate), dtype=audio.dtype)
+    timeline = CompactedTimeline(sample_rate=sample_rate)
+    compacted_length = 0
+    for start, end in speech_regions:
+        if timeline.compacted_starts:
+            compacted_length += len(gap)
+        timeline.add_region(compacted_start=compacted_length, original_start=start, length=end - start)
+        compacted_length += end - start
+
+    def get_parts():
+        # Regions are views of the audio, they are copied once into the packed audio
+        for region_index, (start, end) in enumerate(speech_regions):
+            if region_index:
+                yield gap
+            yield audio[start:end]
+
+    if pcm_file_path:
+        compacted_audio = write_pcm_file(pcm_file_path, get_parts())
+    else:
+        compacted_audio = np.concatenate([audio[:0], *get_parts()])
+    return compacted_audio, timeline
+
+
+if __name__ == "__main__":
+    # Test times in the gaps between packed regions, two regions of 1s at 0-1s and 10-11s of the original audio
+    test_audio = np.ones(12 * SAMPLE_RATE, dtype=np.float32)
+    test_regions = [(0, SAMPLE_RATE), (10 * SAMPLE_RATE, 11 * SAMPLE_RATE)]
+    _, test_timeline = compact_speech(test_audio, test_regions)
+    # Packed: region 0-1s, gap 1-1.3s, region 1.3-2.3s
+    test_times = np.array([0.5, 1.1, 1.3, 1.8, 2.5])
+    test_starts = test_timeline.to_original_array(test_times, is_start=True)
+    test_ends = test_timeline.to_original_array(test_times)
+    print(test_starts, test_ends)
+    assert np.allclose(test_starts, [0.5, 10.0, 10.0, 10.5, 11.0])
+    assert np.allclose(test_ends, [0.5, 1.0, 10.0, 10.5, 11.0])
+    assert test_timeline.to_original(1.1, is_start=True) == 10.0
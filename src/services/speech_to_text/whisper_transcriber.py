@@ -0,0 +1,48 @@
+from typing import List
+
+import numpy as np
+
+from configs.env import SPEECH_TO_TEXT_BATCH_SIZE
+from constants.audio import SAMPLE_RATE
+from constants.ml_models import MlModel
+from models.text_segment import TextSegment
+from services.ml_models.model_registry import get_whisper_model, model_inference
+from services.speech_to_text.batched_whisper import transcribe_batched, WINDOW_SECONDS
+from services.speech_to_text.transcriber import Transcriber
+
+
+class WhisperTranscriber(Transcriber):
+    """
+    openai-whisper in PyTorch, fp32 on CPU.
+    Audio longer than one window is decoded in batches of SPEECH_TO_TEXT_BATCH_SIZE windows if it is above 1.
+    """
+
+    def transcribe(
+        self,
+        audio: np.ndarray,
+        temperature: float | None = None,
+        no_speech_threshold: float | None = None
+    ) -> List[TextSegment]:
+        if SPEECH_TO_TEXT_BATCH_SIZE > 1 and len(audio) > WINDOW_SECONDS * SAMPLE_RATE:
+            with model_inference(MlModel.WHISPER):
+                return transcribe_batched(
+                    get_whisper_model(),
+                    audio,
+                    batch_size=SPEECH_TO_TEXT_BATCH_SIZE,
+                    temperature=temperature,
+                    no_speech_threshold=no_speech_threshold
+                )
+
+        options = {}
+        if temperature is not None:
+            options["temperature"] = temperature
+        if no_speech_threshold is not None:
+            options["no_speech_threshold"] = no_speech_threshold
+
+        model = get_whisper_model()
+        with model_inference(MlModel.WHISPER):
+            result = model.transcribe(audio, **options)
+        return [
+            TextSegment(original_timestamp=(segment["start"], segment["end"]), text=segment["text"])
+            for segment in result["segments"]
+        ]
@@ -1,29 +1,49 @@
+from __future__ import annotations
+
 import os
-from typing import List, Tuple
+from typing import List, Tuple, TYPE_CHECKING
 
-from TTS.api import TTS
-from pydub import AudioSegment
-from pydub.silence import detect_nonsilent
-from torch import cuda
-from whisper import load_audio
+import numpy as np
 
+from configs.env import PCM_MEMMAP_ENABLED
 from configs.logger import catch_error, print_info_log
-from constants.files import PROCESSING_FILES_DIR_PATH
+from constants.audio import SAMPLE_RATE
 from constants.log_tags import LogTag
-from models.text_segment import TextSegment, TextSegmentWithAudioTimestamp
+from constants.ml_models import MlModel
+from models.pipeline_stage import PipelineStage
+from models.segment_table import SegmentTable
+from models.text_segment import TextSegment
+from services.metrics.pipeline_metrics import TTS_SEGMENT_DURATION
+from services.ml_models.model_registry import get_tts, model_inference
+from services.scheduling.job_cancellation import raise_if_job_cancelled
 from services.text_to_speech.voice_detect import detect_voice
+from utils.audio_activity import detect_active_intervals
+from utils.audio_buffer import AudioBuffer
+from utils.pcm_file import get_job_pcm_file_path, write_pcm_file
+
+if TYPE_CHECKING:
+    from services.firebase.firestore.project_progress import ProjectProgressReporter
 
 DELAY_TO_WAIT_IN_SECONDS = 5 * 60
+TTS_PCM_FILE_NAME = "translated"
 
 AUDIO_SEGMENT_PAUSE = 3000  # 3 sec
 
-device = "cuda" if cuda.is_available() else "cpu"
-shouldUseGPU = device == "cuda"
-tts_model = "tts_models/multilingual/multi-dataset/xtts_v2"
-TTS().download_model_by_name(tts_model)
+
+def get_tts_pcm_file_path(project_id: str) -> str:
+    """Raw float32 file of the synthesized audio of the job, in the job workspace."""
+    return get_job_pcm_file_path(project_id, TTS_PCM_FILE_NAME)
+
+
+def remove_tts_pcm_file(project_id: str):
+    pcm_file_path = get_tts_pcm_file_path(project_id)
+    if os.path.exists(pcm_file_path):
+        os.remove(pcm_file_path)
 
 
 def get_manager():
+    from TTS.api import TTS
+
     manager = TTS().list_models()
     return manager
 
@@ -41,90 +61,101 @@ def get_langs():
 
 
 def add_audio_timestamps_to_segments(
-        audio_file_path: str,
-        text_segments: List[TextSegment],
+        audio: AudioBuffer,
+        text_segments: SegmentTable,
         min_silence_len=2000,
         silence_thresh=-30,
         padding=500
-):
+) -> SegmentTable:
     """
-    Detects pauses in an audio file and adds audio_timestamps to segments.
+    Detects pauses in the audio and adds audio_timestamps to segments.
 
-    :param audio_file_path: Path to the audio file.
-    :param text_segments: A list of text segments with 'timestamp' and 'text' keys.
+    :param audio: The synthesized audio.
+    :param text_segments: The table of text segments, in the order they are spoken in the audio.
     :param min_silence_len: Minimum length of silence to consider as a pause in milliseconds.
     :param silence_thresh: Silence threshold in dB.
     :param padding: Additional time in milliseconds to add to the end of each segment.
-    :return: A list of tuples where each tuple is (start, end) time of pauses.
+    :return: The segments with their (start, end) times in the audio in milliseconds,
+        segments after the last detected speech interval are dropped.
     """
 
-    audio = AudioSegment.from_file(audio_file_path)
-    speak_times = detect_nonsilent(
-        audio_segment=audio,
-        min_silence_len=min_silence_len,
-        silence_thresh=silence_thresh
-    )
-    adjusted_speak_times: List[Tuple[float, float]] = []
-    for start, end in speak_times:
-        timestamps = max(start - padding, 0), min(end + padding, len(audio))
-        adjusted_speak_times.append(timestamps)
-
-    # Combine text segments and audio timestamps to one list
-    combined_list: List[Tuple[TextSegment, Tuple[float, float]]] = list(
-        zip(text_segments, adjusted_speak_times)
+    mono_audio = audio.to_layout(channels=1)
+    speak_times = detect_active_intervals(
+        mono_audio.samples,
+        sample_rate=mono_audio.sample_rate,
+        threshold_db=silence_thresh,
+        min_silence_seconds=min_silence_len / 1000,
+        padding_seconds=padding / 1000,
+        # Every interval is one segment, padded intervals are not merged
+        merge_padded=False
     )
+    speak_times_ms = np.array(speak_times, dtype=np.float64).reshape(-1, 2) * 1000
 
-    text_segments_with_audio_timestamps = []
-    for segment, audio_timestamp in combined_list:
-        text_segments_with_audio_timestamps.append(
-            TextSegmentWithAudioTimestamp(
-                **segment.dict(),  # Convert TextSegment to dict
-                audio_timestamp=audio_timestamp
-            )
-        )
-    return text_segments_with_audio_timestamps
+    # Segments and speech intervals are paired in order
+    paired_count = min(len(text_segments), len(speak_times_ms))
+    return text_segments.take(slice(0, paired_count)).with_audio_timestamps(
+        audio_starts=speak_times_ms[:paired_count, 0],
+        audio_ends=speak_times_ms[:paired_count, 1]
+    )
 
 
 def text_to_speech(
-        text_segments: List[TextSegment],
+        text_segments: SegmentTable,
         language: str,
         project_id: str,
         is_cloning: bool,
         voice_ids: List[int],
-        audio,
-        show_logs: bool = False
-):
-    translated_audio_file_path = f"{PROCESSING_FILES_DIR_PATH}/{project_id}-translated.mp3"
-
-    voices_samples = detect_voice(text_segments, language, voice_ids, is_cloning, audio)
-    pause_segment = AudioSegment.silent(duration=AUDIO_SEGMENT_PAUSE)
-    combined_audio = AudioSegment.empty()
+        audio: AudioBuffer,
+        show_logs: bool = False,
+        progress_reporter: ProjectProgressReporter | None = None
+) -> Tuple[AudioBuffer, SegmentTable]:
+    """
+    Synthesizes the text segments one after another, separated by pauses.
+
+    :param audio: The original audio, the voices of its speakers are cloned with `is_cloning`.
+    :return: The synthesized audio at the rate of the TTS model and the segments with their times in it.
+        With PCM_MEMMAP_ENABLED the audio is a map of a PCM file in the job workspace, see `get_tts_pcm_file_path`.
+    """
+    voices_samples = detect_voice(text_segments, language, voice_ids, is_cloning, audio, project_id)
     try:
         language = language[0:2].lower()
-        for segment in text_segments:
-            tts = TTS(model_name=tts_model, gpu=shouldUseGPU).to(device)
-            segment_audio_path = f"{PROCESSING_FILES_DIR_PATH}/temp_segment.wav"
-            tts.tts_to_file(
-                text=segment.text,
-                speaker_wav=voices_samples[segment.speaker],
-                language=language,
-                file_path=segment_audio_path,
-            )
-            segment_audio = AudioSegment.from_wav(segment_audio_path)
-            combined_audio += segment_audio + pause_segment
-
-        combined_audio.export(translated_audio_file_path, format="wav")
+        tts = get_tts()
+        # XTTS returns samples at the rate of its vocoder
+        sample_rate = tts.synthesizer.output_sample_rate
+        pause = AudioBuffer.silence(AUDIO_SEGMENT_PAUSE / 1000, sample_rate).samples
+
+        def synthesize_segments():
+            for segment_index, (text, speaker) in enumerate(zip(text_segments.texts, text_segments.speakers.tolist())):
+                raise_if_job_cancelled()
+                with TTS_SEGMENT_DURATION.time(), model_inference(MlModel.TTS):
+                    segment_samples = tts.tts(
+                        text=text,
+                        speaker_wav=voices_samples[speaker],
+                        language=language
+                    )
+                if progress_reporter:
+                    progress_reporter.report(PipelineStage.TEXT_TO_SPEECH, segment_index + 1, len(text_segments))
+                yield np.asarray(segment_samples, dtype=np.float32)
+                yield pause
+
+        # Segments are written to a PCM file in the job workspace as they are synthesized and the file is mapped,
+        # so the translated track is never held in memory as a whole
+        if PCM_MEMMAP_ENABLED:
+            combined_samples = write_pcm_file(get_tts_pcm_file_path(project_id), synthesize_segments())
+        else:
+            combined_samples = np.concatenate([pause[:0], *synthesize_segments()])
+        combined_audio = AudioBuffer(combined_samples, sample_rate)
         translated_text_segments_with_audio_timestamp = add_audio_timestamps_to_segments(
-            audio_file_path=translated_audio_file_path,
+            audio=combined_audio,
             text_segments=text_segments
         )
 
         if show_logs:
             print_info_log(
                 tag=LogTag.TEXT_TO_SPEECH,
-                message=f"Translated audio save to {translated_audio_file_path}"
+                message=f"Translated audio synthesized, {combined_audio.duration:.1f}s"
             )
-        return translated_audio_file_path, translated_text_segments_with_audio_timestamp
+        return combined_audio, translated_text_segments_with_audio_timestamp
 
     except Exception as e:
         catch_error(
@@ -161,10 +192,10 @@ if __name__ == "__main__":
     language = "english"
 
     file_path = 'en_short_2_speakers.mp4'
-    audio = load_audio(file_path)
+    audio = AudioBuffer.from_file(file_path, sample_rate=SAMPLE_RATE)
 
-    test_translated_audio_file_path, test_translated_text_segments_with_audio_timestamp = text_to_speech(
-        text_segments=test_text_segments,
+    test_translated_audio, test_translated_text_segments_with_audio_timestamp = text_to_speech(
+        text_segments=SegmentTable.from_segments(test_text_segments),
         language=test_target_language,
         is_cloning=False,
         voice_ids=voice_ids,
@@ -172,5 +203,5 @@ if __name__ == "__main__":
         audio=audio,
         show_logs=True
     )
-    print(test_translated_audio_file_path)
+    print(test_translated_audio.duration)
     print(test_translated_text_segments_with_audio_timestamp)
@@ -3,19 +3,23 @@ import json
 import numpy as np
 import soundfile as sf
 import requests
-from whisper.audio import SAMPLE_RATE, load_audio
 
 from configs.logger import print_info_log
+from constants.audio import SAMPLE_RATE
 from constants.files import PROCESSING_FILES_DIR_PATH
 from constants.log_tags import LogTag
+from models.segment_table import SegmentTable
 from models.text_segment import TextSegment
+from services.sentry.tracing import trace_span
+from utils.audio_buffer import AudioBuffer
 
 from typing import List
 
 
 def download_audio(url, filename, show_logs=False):
     url = "https://speechki-book.s3.amazonaws.com/" + url
-    response = requests.get(url)
+    with trace_span(op="http.client", description=f"voice sample {url}"):
+        response = requests.get(url)
     if response.status_code == 200:
         with open(filename, 'wb') as f:
             f.write(response.content)
@@ -32,49 +36,43 @@ def download_audio(url, filename, show_logs=False):
                     )
 
 
-def get_ordered_unique_voice_ids(text_segments):
-    unique_voice_ids = []
-    speakers = set()
-    for segment in text_segments:
-        if segment.speaker not in speakers:
-            speakers.add(segment.speaker)
-            unique_voice_ids.append(segment.speaker)
-    return unique_voice_ids
+def get_ordered_unique_voice_ids(text_segments: SegmentTable):
+    return text_segments.get_ordered_speakers()
 
 
 # audio из whisper_load чтобы 2 раза не загружать.
-def collect_voice_samples(text_segments: List[TextSegment], audio):
-    voices_samples = {}
-    # собрать в tmp по голосам файл
-    for segment in text_segments:
-        start, end = segment.original_timestamp
-        if segment.speaker not in voices_samples:
-            voices_samples[segment.speaker] = []
-        voices_samples[segment.speaker].extend(audio[int(start * SAMPLE_RATE):int(end * SAMPLE_RATE)])
+def collect_voice_samples(text_segments: SegmentTable, audio: AudioBuffer, project_id: str = "local"):
     voices_samples_files = {}
-    for speaker, audio_segments in voices_samples.items():
-        audio_temp_path = f"{PROCESSING_FILES_DIR_PATH}/sample_voice_{speaker}.wav"
-        combined_audio = np.array(audio_segments)
-        sf.write(audio_temp_path, combined_audio, SAMPLE_RATE)
+    # собрать в tmp по голосам файл
+    for speaker in text_segments.get_ordered_speakers():
+        speaker_indices = np.flatnonzero(text_segments.speakers == speaker)
+        audio_segments = [
+            audio.slice(start, end)
+            for start, end in zip(text_segments.starts[speaker_indices], text_segments.ends[speaker_indices])
+        ]
+        audio_temp_path = f"{PROCESSING_FILES_DIR_PATH}/{project_id}-sample_voice_{speaker}.wav"
+        # XTTS reads speaker voices from files
+        combined_audio = AudioBuffer.concatenate(audio_segments, sample_rate=audio.sample_rate, channels=1)
+        sf.write(audio_temp_path, combined_audio.samples, combined_audio.sample_rate)
         voices_samples_files[speaker] = audio_temp_path
     return voices_samples_files
 
 
-def collect_prepared_voice_samples(voice_ids):
+def collect_prepared_voice_samples(voice_ids, project_id: str = "local"):
     voice_ids_rez = {}
 
     with open('configs/tts-voices.json', 'r', encoding='utf-8') as file:
         voices_json = json.load(file)
         for voice in voices_json:
             if voice['voice_id'] in voice_ids:
-                filename = f"{PROCESSING_FILES_DIR_PATH}/voice_{voice['voice_id']}.ogg"
+                filename = f"{PROCESSING_FILES_DIR_PATH}/{project_id}-voice_{voice['voice_id']}.ogg"
                 download_audio(voice['sample'], filename)
                 voice_ids_rez[voice['voice_id']] = filename
     return voice_ids_rez
 
 
-def collect_voice_by_language(language: str):
-    filename = f"{PROCESSING_FILES_DIR_PATH}/ex-voice.ogg"
+def collect_voice_by_language(language: str, project_id: str = "local"):
+    filename = f"{PROCESSING_FILES_DIR_PATH}/{project_id}-ex-voice.ogg"
 
     # Открываем определенный конфиг с подготовленными голосами
     with open('configs/tts-voices.json', 'r', encoding='utf-8') as file:
@@ -86,20 +84,22 @@ def collect_voice_by_language(language: str):
 
 
 def detect_voice(
-        text_segments: List[TextSegment],
+        text_segments: SegmentTable,
         language: str,
         voice_ids: List[int],
         is_cloning: bool,
-        audio):
+        audio: AudioBuffer,
+        project_id: str = "local"):
+    # Sample files are named by project, so concurrent jobs never overwrite each other's voices
     if is_cloning:
-        return collect_voice_samples(text_segments, audio)
+        return collect_voice_samples(text_segments, audio, project_id)
     elif voice_ids and len(voice_ids) > 0:
         unique_speaker = get_ordered_unique_voice_ids(text_segments)
         # TODO change to exception
         assert len(unique_speaker) == len(voice_ids)
-        voice_ids_rez = collect_prepared_voice_samples(set(voice_ids))
+        voice_ids_rez = collect_prepared_voice_samples(set(voice_ids), project_id)
         result = {}
-        def_voice = collect_voice_by_language(language)[0]
+        def_voice = collect_voice_by_language(language, project_id)[0]
         for speaker, voice_id in zip(unique_speaker, voice_ids):
             if voice_id in voice_ids_rez:
                 result[speaker] = voice_ids_rez[voice_id]
@@ -107,7 +107,7 @@ def detect_voice(
                 result[speaker] = def_voice
         return result
     else:
-        return collect_voice_by_language(language)
+        return collect_voice_by_language(language, project_id)
 
 
 # TESTS ==================================================================
@@ -119,7 +119,7 @@ def test_detect_voice_with_voice_ids(test_text_segments, audio):
     result = detect_voice(test_text_segments, language, voice_ids, is_cloning, audio)
 
     assert result is not None
-    assert len(result) == len(set([segment.speaker for segment in test_text_segments]))
+    assert len(result) == len(test_text_segments.get_ordered_speakers())
 
     return result
 
@@ -136,7 +136,7 @@ def test_detect_voice_with_empty_voice_ids(test_text_segments, audio):
 
 if __name__ == "__main__":
     file_path = 'en_short_2_speakers.mp4'
-    audio = load_audio(file_path)
+    audio = AudioBuffer.from_file(file_path, sample_rate=SAMPLE_RATE)
     test_text_segments = [TextSegment(original_timestamp=(0.008488964346349746, 10.05942275042445),
                                       text='What about your development areas? What do you have identified as your '
                                            'greatest and biggest improvement areas? And what have you done to improve '
@@ -156,6 +156,7 @@ if __name__ == "__main__":
                                       speaker=0), TextSegment(original_timestamp=(29.92359932088285, 32.99660441426146),
                                                               text=' consciously hearing the ideas from other people.',
                                                               speaker=0)]
+    test_text_segments = SegmentTable.from_segments(test_text_segments)
     print(collect_voice_samples(test_text_segments, audio))
     print(test_detect_voice_with_voice_ids(test_text_segments, audio))
     print(test_detect_voice_with_empty_voice_ids(test_text_segments, audio))
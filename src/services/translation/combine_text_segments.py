@@ -1,15 +1,13 @@
-from typing import List
-
 from configs.logger import print_info_log
 from constants.log_tags import LogTag
-from models.text_segment import TextSegment
+from models.segment_table import SegmentTable
 
 
-def combine_text_segments(text_segments: List[TextSegment], show_logs: bool) -> str:
+def combine_text_segments(text_segments: SegmentTable, show_logs: bool) -> str:
     """
-    Combine the given TextSegments to the string, where segments are divided by [ and ] symbols.
+    Combine the given text segments to the string, where segments are divided by [ and ] symbols.
 
-    :param text_segments: The list of dictionaries with text segments and timestamps.
+    :param text_segments: The table of text segments and timestamps.
     :param show_logs: Determines whether to display logs while combining.
 
     :return: The string, where all text segments are divided by \\n symbol.
@@ -18,17 +16,15 @@ def combine_text_segments(text_segments: List[TextSegment], show_logs: bool) ->
     if show_logs:
         print_info_log(
             tag=LogTag.COMBINE_TEXT_SEGMENTS,
-            message=f"Combining text chunks: {text_segments}"
+            message=lambda: f"Combining text chunks: {text_segments}"
         )
 
-    formatted_text = ""
-    for segment in text_segments:
-        formatted_text += f" —\"{segment.text}\""
+    formatted_text = "".join(f" —\"{text}\"" for text in text_segments.texts)
 
     if show_logs:
         print_info_log(
             tag=LogTag.COMBINE_TEXT_SEGMENTS,
-            message=f"Combined text: {formatted_text}"
+            message=lambda: f"Combined text: {formatted_text}"
         )
 
     return formatted_text
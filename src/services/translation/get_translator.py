@@ -0,0 +1,28 @@
+from dataclasses import dataclass
+from functools import lru_cache
+
+from configs.env import TRANSLATOR_BACKEND
+from constants.backends import TranslatorBackend
+
+
+@dataclass
+class EchoTranslation:
+    text: str
+
+
+class EchoTranslator:
+    """Returns the text untranslated, so local runs and load tests make no calls to Google."""
+
+    def translate(self, text: str, dest: str, src: str) -> EchoTranslation:
+        return EchoTranslation(text=text)
+
+
+@lru_cache(maxsize=None)
+def get_translator():
+    """Returns the translator of the configured TRANSLATOR_BACKEND, created once per process."""
+    if TRANSLATOR_BACKEND == TranslatorBackend.ECHO:
+        return EchoTranslator()
+
+    from googletrans import Translator
+
+    return Translator()
@@ -1,17 +1,22 @@
+from functools import lru_cache
 from typing import List
 
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-
 from configs.logger import print_info_log, catch_error
 from constants.log_tags import LogTag
 
 CONTEXT_TOKENS_COUNT = 4000
 
-text_splitter = RecursiveCharacterTextSplitter(
-    chunk_size=CONTEXT_TOKENS_COUNT,
-    chunk_overlap=0,
-    separators=["."]
-)
+
+@lru_cache(maxsize=None)
+def get_text_splitter():
+    # langchain is slow to import, it is imported on the first split
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+    return RecursiveCharacterTextSplitter(
+        chunk_size=CONTEXT_TOKENS_COUNT,
+        chunk_overlap=0,
+        separators=["."]
+    )
 
 
 def split_text_to_chunks(text: str, project_id: str, show_logs: bool) -> List[str]:
@@ -32,7 +37,7 @@ def split_text_to_chunks(text: str, project_id: str, show_logs: bool) -> List[st
                 message=f"Splitting text by {CONTEXT_TOKENS_COUNT} tokens..."
             )
 
-        text_chunks = text_splitter.split_text(text)
+        text_chunks = get_text_splitter().split_text(text)
 
         if show_logs:
             print_info_log(
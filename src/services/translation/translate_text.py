@@ -1,29 +1,38 @@
+from __future__ import annotations
+
 import re
-from typing import List
+from typing import List, TYPE_CHECKING
 
 from configs.logger import catch_error, print_info_log
 from constants.log_tags import LogTag
+from models.pipeline_stage import PipelineStage
+from models.segment_table import SegmentTable
 from models.text_segment import TextSegment
 from services.translation.combine_text_segments import combine_text_segments
 from services.translation.split_text_to_chunks import split_text_to_chunks
 from services.translation.translate_text_chunk_with_google import translate_text_chunk_with_google
 
+if TYPE_CHECKING:
+    from services.firebase.firestore.project_progress import ProjectProgressReporter
+
 
 def translate_text(
-    text_segments: List[TextSegment],
+    text_segments: SegmentTable,
     language: str,
     project_id: str,
-    show_logs: bool = False
-) -> List[TextSegment]:
+    show_logs: bool = False,
+    progress_reporter: ProjectProgressReporter | None = None
+) -> SegmentTable:
     """
     Translate given text segments into the specified language.
 
     :param language: The target language for translation.
-    :param text_segments: The list of TextSegments with original text segments and timestamps.
+    :param text_segments: The table of original text segments and timestamps.
     :param project_id: The id of the processing project.
     :param show_logs: Determines whether to display logs while translating.
+    :param progress_reporter: Publishes the percent of translated text chunks.
 
-    :returns: The list of dictionaries with translated text segments and timestamps.
+    :returns: The table of translated text segments, timestamps are shared with the original table.
     """
 
     try:
@@ -40,11 +49,11 @@ def translate_text(
         if show_logs:
             print_info_log(
                 tag=LogTag.TRANSLATE_TEXT,
-                message=f"Translating text chunks - {text_chunks}"
+                message=lambda: f"Translating text chunks - {text_chunks}"
             )
 
         translated_text_chunks = []
-        for chuck in text_chunks:
+        for chunk_index, chuck in enumerate(text_chunks):
             translated_chunk = translate_text_chunk_with_google(
                 language=language,
                 text_chunk=chuck,
@@ -52,11 +61,13 @@ def translate_text(
                 show_logs=show_logs
             )
             translated_text_chunks.append(translated_chunk)
+            if progress_reporter:
+                progress_reporter.report(PipelineStage.TRANSLATION, chunk_index + 1, len(text_chunks))
 
         if show_logs:
             print_info_log(
                 tag=LogTag.TRANSLATE_TEXT,
-                message=f"Translated text chunks: {translated_text_chunks}"
+                message=lambda: f"Translated text chunks: {translated_text_chunks}"
             )
             print_info_log(
                 tag=LogTag.TRANSLATE_TEXT,
@@ -74,16 +85,15 @@ def translate_text(
         if show_logs:
             print_info_log(
                 tag=LogTag.TRANSLATE_TEXT,
-                message=f"Split translated text segments: {translated_text_segments}"
+                message=lambda: f"Split translated text segments: {translated_text_segments}"
             )
 
-        original_segments_count = len(text_segments)
-        translated_segments_count = len(translated_text_segments)
-        for segment_index in range(min(original_segments_count, translated_segments_count)):
-            translated_segment = translated_text_segments[segment_index]
-            text_segments[segment_index].text = translated_segment
+        # Segments without a translated counterpart keep their original text
+        translated_texts = list(text_segments.texts)
+        translated_count = min(len(text_segments), len(translated_text_segments))
+        translated_texts[:translated_count] = translated_text_segments[:translated_count]
 
-        return text_segments
+        return text_segments.with_texts(translated_texts)
 
     except Exception as e:
         catch_error(
@@ -123,9 +133,9 @@ if __name__ == "__main__":
     test_target_language = "ru"
     test_project_id = "07fsfECkwma6fVTDyqQf"
     test_translated_text_segments = translate_text(
-        text_segments=test_text_segments,
+        text_segments=SegmentTable.from_segments(test_text_segments),
         language=test_target_language,
         project_id=test_project_id,
         show_logs=True
     )
-    print(test_translated_text_segments)
+    print(test_translated_text_segments.texts)
@@ -1,9 +1,8 @@
-from googletrans import Translator
-
 from configs.logger import print_info_log, catch_error
 from constants.log_tags import LogTag
+from services.sentry.tracing import trace_span
+from services.translation.get_translator import get_translator
 
-translator = Translator()
 
 def translate_text_chunk_with_google(
     text_chunk: str,
@@ -27,10 +26,11 @@ def translate_text_chunk_with_google(
     if show_logs:
         print_info_log(
             tag=log_tag,
-            message=f"Translating text chunk: '{text_chunk}'"
+            message=lambda: f"Translating text chunk: '{text_chunk}'"
         )
 
-    translation = translator.translate(text_chunk,  dest=language, src="english")
+    with trace_span(op="http.client", description="google translate"):
+        translation = get_translator().translate(text_chunk,  dest=language, src="english")
 
     if len(translation.text) == 0:
         catch_error(
@@ -45,7 +45,7 @@ def translate_text_chunk_with_google(
     if show_logs:
         print_info_log(
             tag=log_tag,
-            message=f"Text chunk translated:  {translated_text}"
+            message=lambda: f"Text chunk translated:  {translated_text}"
         )
 
     return translated_text
@@ -0,0 +1,160 @@
+from typing import List, Tuple
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# Frames of 10 ms, fine enough for pauses between words
+ACTIVITY_FRAME_SECONDS = 0.01
+# Level of an all-zero frame, log10 of 0 is not defined
+MIN_LEVEL_DB = -120.0
+
+
+def audio_segment_to_samples(audio, keep_channels: bool = False) -> np.ndarray:
+    """
+    Returns the samples of a pydub AudioSegment as mono float32 in [-1, 1],
+    so levels in dBFS match the levels pydub reports for the segment.
+    With `keep_channels` the samples of a multichannel segment are (frames, channels) instead.
+    """
+    samples = np.array(audio.get_array_of_samples(), dtype=np.float32)
+    if audio.channels > 1:
+        samples = samples.reshape(-1, audio.channels)
+        if not keep_channels:
+            samples = samples.mean(axis=1)
+    return samples / float(1 << (8 * audio.sample_width - 1))
+
+
+def get_frame_levels_db(samples: np.ndarray, frame_size: int, hop_size: int | None = None) -> np.ndarray:
+    """
+    RMS level of every frame of the samples in dBFS, in one pass over strided frames.
+    The last partial frame is dropped.
+
+    :param samples: Mono float samples in [-1, 1].
+    :param frame_size: Samples per frame.
+    :param hop_size: Samples between frame starts, frames do not overlap by default.
+    """
+    hop_size = hop_size or frame_size
+    if len(samples) < frame_size:
+        return np.empty(0, dtype=np.float32)
+
+    samples = np.asarray(samples, dtype=np.float32)
+    if hop_size == frame_size:
+        frames_count = len(samples) // frame_size
+        frames = samples[:frames_count * frame_size].reshape(frames_count, frame_size)
+    else:
+        frames = sliding_window_view(samples, frame_size)[::hop_size]
+
+    # Sum of squares per frame without a squared copy of the frames
+    energies = np.einsum("ij,ij->i", frames, frames, dtype=np.float64) / frame_size
+    return np.maximum(10 * np.log10(np.maximum(energies, 1e-30)), MIN_LEVEL_DB).astype(np.float32)
+
+
+def get_noise_floor_db(levels_db: np.ndarray, percentile: float = 10, min_level_db: float = -60.0) -> float:
+    """
+    Level of the quietest frames, not below `min_level_db`:
+    in clean audio with digital silence between words every audible frame is above the floor.
+    """
+    return max(float(np.percentile(levels_db, percentile)), min_level_db)
+
+
+def get_runs(mask: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Start and end (exclusive) indices of the runs of True in the mask."""
+    edges = np.diff(np.concatenate(([0], mask.astype(np.int8), [0])))
+    return np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+
+
+def merge_close_runs(starts: np.ndarray, ends: np.ndarray, min_gap: float) -> Tuple[np.ndarray, np.ndarray]:
+    """Merges runs separated by less than `min_gap`, overlapping runs too. Starts and ends must both be sorted."""
+    if len(starts) == 0:
+        return starts, ends
+    is_new_run = np.concatenate(([True], starts[1:] - ends[:-1] >= min_gap))
+    is_last_of_run = np.concatenate((is_new_run[1:], [True]))
+    return starts[is_new_run], ends[is_last_of_run]
+
+
+def detect_active_intervals(
+    samples: np.ndarray,
+    sample_rate: int,
+    threshold_db: float,
+    hysteresis_db: float = 3.0,
+    min_silence_seconds: float = 0.0,
+    min_active_seconds: float = 0.0,
+    padding_seconds: float = 0.0,
+    merge_padded: bool = True,
+    relative_to_noise_floor: bool = False,
+    frame_seconds: float = ACTIVITY_FRAME_SECONDS
+) -> List[Tuple[float, float]]:
+    """
+    Finds intervals of sound, e.g. speech, by frame levels. Replaces pydub detect_nonsilent,
+    which computes RMS per millisecond in Python.
+
+    Sound starts at a frame above `threshold_db` and lasts while frames stay above `threshold_db - hysteresis_db`,
+    so a level hovering around the threshold does not split the interval.
+
+    :param samples: Mono float samples in [-1, 1].
+    :param sample_rate: The sample rate of the samples.
+    :param threshold_db: Frames above this level in dBFS start sound.
+    :param hysteresis_db: How far below the threshold the sound continues.
+    :param min_silence_seconds: Shorter silences are kept inside the interval.
+    :param min_active_seconds: Shorter sounds are dropped, e.g. clicks.
+    :param padding_seconds: Added at both ends of every interval, within the samples.
+    :param merge_padded: Merges intervals overlapping after padding, otherwise they are kept apart.
+    :param relative_to_noise_floor: The threshold is in dB above the noise floor of the samples, not in dBFS.
+    :param frame_seconds: Frame length of the level detection.
+    :return: Sorted (start, end) of the intervals in seconds.
+    """
+    frame_size = max(1, int(sample_rate * frame_seconds))
+    levels_db = get_frame_levels_db(samples, frame_size)
+    if len(levels_db) == 0:
+        return []
+
+    if relative_to_noise_floor:
+        threshold_db += get_noise_floor_db(levels_db)
+
+    # Runs above the release level which reach the attack level
+    starts, ends = get_runs(levels_db > threshold_db - hysteresis_db)
+    if len(starts) == 0:
+        return []
+    # Frames between runs are below the release level, so the sums per run only count its own frames
+    attack_counts = np.add.reduceat((levels_db > threshold_db).astype(np.int32), starts)
+    is_active = attack_counts > 0
+    starts, ends = starts[is_active], ends[is_active]
+
+    starts, ends = merge_close_runs(starts, ends, min_gap=min_silence_seconds / frame_seconds)
+    is_long_enough = (ends - starts) * frame_seconds >= min_active_seconds
+    starts, ends = starts[is_long_enough], ends[is_long_enough]
+
+    duration = len(samples) / sample_rate
+    start_seconds = np.maximum(starts * frame_size / sample_rate - padding_seconds, 0.0)
+    end_seconds = np.minimum(ends * frame_size / sample_rate + padding_seconds, duration)
+    if merge_padded:
+        # Padding is the same for all intervals, so their ends stay sorted. Touching intervals are merged too
+        start_seconds, end_seconds = merge_close_runs(start_seconds, end_seconds, min_gap=1e-9)
+
+    return [(float(start), float(end)) for start, end in zip(start_seconds, end_seconds)]
+
+
+def get_silent_intervals(active_intervals: List[Tuple[float, float]], duration: float) -> List[Tuple[float, float]]:
+    """Gaps between the active intervals within `duration` seconds."""
+    silent_intervals = []
+    previous_end = 0.0
+    for start, end in active_intervals:
+        if start > previous_end:
+            silent_intervals.append((previous_end, start))
+        previous_end = max(previous_end, end)
+    if duration > previous_end:
+        silent_intervals.append((previous_end, duration))
+    return silent_intervals
+
+
+def get_interval_gains(
+    intervals: List[Tuple[float, float]],
+    gain_db: float,
+    samples_count: int,
+    sample_rate: int
+) -> np.ndarray:
+    """Per-sample gain factors: `gain_db` inside the intervals, 1 elsewhere."""
+    gains = np.ones(samples_count, dtype=np.float32)
+    factor = 10 ** (gain_db / 20)
+    for start, end in intervals:
+        gains[int(start * sample_rate):int(end * sample_rate)] = factor
+    return gains
@@ -0,0 +1,173 @@
+from __future__ import annotations
+
+import subprocess
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from utils.audio_activity import audio_segment_to_samples
+from utils.pcm_file import decode_to_pcm_file, get_pcm_decode_command
+
+# Samples piped to ffmpeg at once when the audio is written to a file
+WRITE_CHUNK_SECONDS = 10
+
+
+class AudioBuffer:
+    """
+    Decoded audio passed between stages: float32 samples in [-1, 1] and their sample rate.
+
+    Samples are (frames,) for mono or (frames, channels). The buffer wraps the array without copying it,
+    e.g. a memmap of a PCM file, and slices are views of it. Audio in another rate or channel layout
+    is computed once per buffer and cached, so stages asking for the same layout share it.
+    """
+
+    def __init__(self, samples: np.ndarray, sample_rate: int):
+        self.samples = samples if samples.dtype == np.float32 else samples.astype(np.float32)
+        self.sample_rate = sample_rate
+        self.layouts: Dict[Tuple[int, int], AudioBuffer] = {}
+
+    def __len__(self) -> int:
+        return len(self.samples)
+
+    @property
+    def channels(self) -> int:
+        return 1 if self.samples.ndim == 1 else self.samples.shape[1]
+
+    @property
+    def duration(self) -> float:
+        return len(self.samples) / self.sample_rate
+
+    def slice(self, start: float, end: float | None = None) -> AudioBuffer:
+        """The audio between `start` and `end` seconds, a view of the samples."""
+        end_frame = len(self.samples) if end is None else int(end * self.sample_rate)
+        return AudioBuffer(self.samples[int(start * self.sample_rate):end_frame], self.sample_rate)
+
+    def to_layout(self, sample_rate: int | None = None, channels: int | None = None) -> AudioBuffer:
+        """
+        The audio resampled to `sample_rate` and mixed to `channels`, the buffer itself if it already has them.
+        Mono is (frames,), down mixing averages the channels and up mixing copies mono to every channel.
+        """
+        sample_rate = sample_rate or self.sample_rate
+        channels = channels or self.channels
+        if (sample_rate, channels) == (self.sample_rate, self.channels):
+            return self
+
+        layout = (sample_rate, channels)
+        if layout not in self.layouts:
+            samples = self.samples
+            if channels != self.channels:
+                mono_samples = samples if samples.ndim == 1 else samples.mean(axis=1, dtype=np.float32)
+                samples = mono_samples if channels == 1 else np.repeat(mono_samples[:, np.newaxis], channels, axis=1)
+            if sample_rate != self.sample_rate:
+                samples = resample(samples, self.sample_rate, sample_rate)
+            self.layouts[layout] = AudioBuffer(samples, sample_rate)
+        return self.layouts[layout]
+
+    def to_int16(self) -> np.ndarray:
+        return (np.clip(self.samples, -1.0, 1.0) * 32767).astype(np.int16)
+
+    def to_audio_segment(self):
+        """The audio as a pydub AudioSegment, for code which still works with pydub."""
+        from pydub import AudioSegment
+
+        return AudioSegment(
+            data=self.to_int16().tobytes(),
+            sample_width=2,
+            frame_rate=self.sample_rate,
+            channels=self.channels
+        )
+
+    def write(self, file_path: str, ffmpeg_params: List[str] | None = None):
+        """
+        Encodes the audio to a file, the format is chosen by ffmpeg from the file extension.
+        Samples are piped to ffmpeg in chunks, so a mapped buffer is not read into memory as a whole.
+        """
+        encode_process = subprocess.Popen(
+            [
+                "ffmpeg",
+                "-nostdin",
+                "-v", "error",
+                "-f", "f32le",
+                "-ar", str(self.sample_rate),
+                "-ac", str(self.channels),
+                "-i", "pipe:0",
+                *(ffmpeg_params or []),
+                "-y", file_path
+            ],
+            stdin=subprocess.PIPE,
+            stderr=subprocess.PIPE
+        )
+        chunk_size = WRITE_CHUNK_SECONDS * self.sample_rate
+        try:
+            for chunk_start in range(0, len(self.samples), chunk_size):
+                chunk = self.samples[chunk_start:chunk_start + chunk_size]
+                encode_process.stdin.write(np.ascontiguousarray(chunk, dtype="<f4").tobytes())
+        except BrokenPipeError:
+            # ffmpeg exited early, its errors are reported below
+            pass
+        except BaseException:
+            encode_process.kill()
+            encode_process.wait()
+            raise
+
+        _, encode_errors = encode_process.communicate()
+        if encode_process.returncode != 0:
+            raise RuntimeError(f"Failed to encode audio: {encode_errors.decode(errors='replace').strip()}")
+
+    @classmethod
+    def from_file(
+        cls,
+        file_path: str,
+        sample_rate: int,
+        channels: int = 1,
+        pcm_file_path: str | None = None
+    ) -> AudioBuffer:
+        """
+        Decodes the audio of a media file.
+
+        :param pcm_file_path: Decode to this raw PCM file and map it instead of reading the audio into memory.
+        """
+        if pcm_file_path:
+            samples = decode_to_pcm_file(file_path, pcm_file_path, sample_rate=sample_rate, channels=channels)
+        else:
+            decode_process = subprocess.run(
+                get_pcm_decode_command(file_path, "pipe:1", sample_rate=sample_rate, channels=channels),
+                capture_output=True
+            )
+            if decode_process.returncode != 0:
+                raise RuntimeError(f"Failed to decode audio: {decode_process.stderr.decode(errors='replace').strip()}")
+            samples = np.frombuffer(decode_process.stdout, dtype="<f4")
+            if channels > 1:
+                samples = samples.reshape(-1, channels)
+        return cls(samples, sample_rate)
+
+    @classmethod
+    def from_audio_segment(cls, audio_segment) -> AudioBuffer:
+        """The samples of a pydub AudioSegment, for code which still works with pydub."""
+        return cls(audio_segment_to_samples(audio_segment, keep_channels=True), audio_segment.frame_rate)
+
+    @classmethod
+    def silence(cls, duration: float, sample_rate: int, channels: int = 1) -> AudioBuffer:
+        frames_count = int(duration * sample_rate)
+        return cls(np.zeros(frames_count if channels == 1 else (frames_count, channels), dtype=np.float32), sample_rate)
+
+    @classmethod
+    def concatenate(cls, buffers: List[AudioBuffer], sample_rate: int, channels: int = 1) -> AudioBuffer:
+        """Joins the buffers one after another in one copy, each is converted to the layout first."""
+        if not buffers:
+            return cls.silence(0, sample_rate, channels)
+        return cls(
+            np.concatenate([buffer.to_layout(sample_rate, channels).samples for buffer in buffers]),
+            sample_rate
+        )
+
+
+def resample(samples: np.ndarray, sample_rate: int, target_sample_rate: int) -> np.ndarray:
+    """Band-limited resampling of (frames,) or (frames, channels) samples with torchaudio."""
+    import torch
+    import torchaudio.functional
+
+    # torchaudio resamples the last dimension
+    waveform = torch.from_numpy(np.ascontiguousarray(samples.T))
+    resampled = torchaudio.functional.resample(waveform, orig_freq=sample_rate, new_freq=target_sample_rate)
+    return np.ascontiguousarray(resampled.numpy().T)
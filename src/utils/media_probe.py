@@ -0,0 +1,62 @@
+import json
+import subprocess
+
+from models.media_info import MediaInfo
+
+PROBE_TIMEOUT_IN_SECONDS = 60
+
+
+def parse_frame_rate(frame_rate: str) -> float:
+    numerator, _, denominator = frame_rate.partition("/")
+    if not denominator or float(denominator) == 0:
+        return float(numerator or 0)
+    return float(numerator) / float(denominator)
+
+
+def probe_media(source: str) -> MediaInfo:
+    """
+    Reads the duration and stream layout of a media file with ffprobe, without decoding it.
+
+    :param source: A local path or a URL, e.g. a signed URL of a blob. ffprobe reads only the headers.
+    """
+    probe_process = subprocess.run(
+        [
+            "ffprobe",
+            "-v", "error",
+            "-print_format", "json",
+            "-show_format",
+            "-show_streams",
+            source
+        ],
+        capture_output=True,
+        timeout=PROBE_TIMEOUT_IN_SECONDS
+    )
+    if probe_process.returncode != 0:
+        raise Exception(f"Could not probe media: {probe_process.stderr.decode(errors='replace').strip()}")
+
+    probe = json.loads(probe_process.stdout)
+    streams = probe.get("streams", [])
+    audio_stream = next((stream for stream in streams if stream.get("codec_type") == "audio"), None)
+    # Cover art is a video stream of one frame
+    video_stream = next(
+        (
+            stream for stream in streams
+            if stream.get("codec_type") == "video" and not stream.get("disposition", {}).get("attached_pic")
+        ),
+        None
+    )
+
+    duration = float(probe.get("format", {}).get("duration") or 0)
+    if duration == 0:
+        duration = max((float(stream.get("duration") or 0) for stream in streams), default=0)
+
+    return MediaInfo(
+        duration=duration,
+        has_video=video_stream is not None,
+        has_audio=audio_stream is not None,
+        audio_sample_rate=int(audio_stream.get("sample_rate", 0)) if audio_stream else 0,
+        audio_channels=int(audio_stream.get("channels", 0)) if audio_stream else 0,
+        video_width=int(video_stream.get("width", 0)) if video_stream else 0,
+        video_height=int(video_stream.get("height", 0)) if video_stream else 0,
+        video_fps=parse_frame_rate(video_stream.get("avg_frame_rate", "0")) if video_stream else 0.0,
+    )
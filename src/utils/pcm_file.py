@@ -0,0 +1,122 @@
+import os
+import subprocess
+from typing import Iterable
+
+import numpy as np
+
+from services.scheduling.cpu_budget import get_ffmpeg_threads
+from utils.workspace import get_job_workspace_dir
+
+# ffmpeg raw sample formats and their NumPy types
+PCM_SAMPLE_FORMATS = {
+    "f32le": np.dtype("<f4"),
+    "s16le": np.dtype("<i2"),
+}
+
+
+def get_job_pcm_file_path(project_id: str, name: str, sample_format: str = "f32le") -> str:
+    """Path of a raw PCM file in the job workspace, e.g. `whisper.f32le`."""
+    return os.path.join(get_job_workspace_dir(project_id), f"{name}.{sample_format}")
+
+
+def get_pcm_decode_command(
+    source: str,
+    pcm_file_path: str,
+    sample_rate: int,
+    channels: int = 1,
+    sample_format: str = "f32le"
+) -> list:
+    """ffmpeg command decoding the first audio stream of the source to raw interleaved PCM."""
+    return [
+        "ffmpeg",
+        "-nostdin",
+        "-v", "error",
+        "-threads", str(get_ffmpeg_threads() or 0),
+        "-i", source,
+        "-map", "0:a:0",
+        "-f", sample_format,
+        "-ac", str(channels),
+        "-ar", str(sample_rate),
+        "-y", pcm_file_path
+    ]
+
+
+def open_pcm_file(
+    pcm_file_path: str,
+    channels: int = 1,
+    sample_format: str = "f32le",
+    mode: str = "r"
+) -> np.ndarray:
+    """
+    Maps a raw PCM file into memory without reading it, pages are loaded when samples are accessed.
+
+    :return: A memmap of shape (samples,) for mono or (samples, channels), an empty array for an empty file.
+    """
+    dtype = PCM_SAMPLE_FORMATS[sample_format]
+    frame_size = dtype.itemsize * channels
+    frames_count = os.path.getsize(pcm_file_path) // frame_size
+    shape = (frames_count,) if channels == 1 else (frames_count, channels)
+    # np.memmap can not map an empty file
+    if frames_count == 0:
+        return np.zeros(shape, dtype=dtype)
+    return np.memmap(pcm_file_path, dtype=dtype, mode=mode, shape=shape)
+
+
+def decode_to_pcm_file(
+    source: str,
+    pcm_file_path: str,
+    sample_rate: int,
+    channels: int = 1,
+    sample_format: str = "f32le"
+) -> np.ndarray:
+    """
+    Decodes the audio of a media file to a raw PCM file once, instead of holding the decoded audio in memory.
+    The file is written next to its path and renamed when complete, so an existing file is never partial.
+
+    :param source: A local path of the media file.
+    :param pcm_file_path: The path of the PCM file, e.g. from `get_job_pcm_file_path`.
+    :param sample_rate: Output sample rate, the audio is resampled by ffmpeg.
+    :param channels: Output channels, the audio is down or up mixed by ffmpeg.
+    :param sample_format: f32le or s16le.
+    :return: A read only memmap of the decoded samples, see `open_pcm_file`.
+    """
+    partial_file_path = f"{pcm_file_path}.tmp"
+    decode_process = subprocess.run(
+        get_pcm_decode_command(source, partial_file_path, sample_rate, channels, sample_format),
+        capture_output=True
+    )
+    if decode_process.returncode != 0:
+        if os.path.exists(partial_file_path):
+            os.remove(partial_file_path)
+        raise RuntimeError(f"Failed to decode audio: {decode_process.stderr.decode(errors='replace').strip()}")
+
+    os.replace(partial_file_path, pcm_file_path)
+    return open_pcm_file(pcm_file_path, channels=channels, sample_format=sample_format)
+
+
+def write_pcm_file(
+    pcm_file_path: str,
+    parts: Iterable[np.ndarray],
+    channels: int = 1,
+    sample_format: str = "f32le"
+) -> np.ndarray:
+    """
+    Writes the parts one after another to a raw PCM file as they come, instead of joining them in memory.
+    The file is written next to its path and renamed when complete, so an existing file is never partial.
+
+    :param parts: Samples of shape (frames,) for mono or (frames, channels), e.g. yielded by a generator.
+    :return: A read only memmap of the written samples, see `open_pcm_file`.
+    """
+    dtype = PCM_SAMPLE_FORMATS[sample_format]
+    partial_file_path = f"{pcm_file_path}.tmp"
+    try:
+        with open(partial_file_path, "wb") as pcm_file:
+            for part in parts:
+                pcm_file.write(np.ascontiguousarray(part, dtype=dtype).tobytes())
+    except BaseException:
+        if os.path.exists(partial_file_path):
+            os.remove(partial_file_path)
+        raise
+
+    os.replace(partial_file_path, pcm_file_path)
+    return open_pcm_file(pcm_file_path, channels=channels, sample_format=sample_format)
@@ -0,0 +1,20 @@
+import os
+
+from constants.files import JOB_WORKSPACES_DIR_PATH
+
+
+def get_job_workspace_dir(project_id: str, create: bool = True) -> str:
+    """
+    Returns the workspace directory of the project job, where the job keeps its files.
+
+    :param project_id: The id of the processing project.
+    :param create: Determines whether to create the directory if it does not exist.
+    """
+    workspace_dir = os.path.join(JOB_WORKSPACES_DIR_PATH, project_id)
+    # Project ids come from requests, the workspace must stay inside the workspaces dir
+    if os.path.dirname(os.path.abspath(workspace_dir)) != os.path.abspath(JOB_WORKSPACES_DIR_PATH):
+        raise ValueError(f"Invalid project id for a workspace: {project_id}")
+
+    if create:
+        os.makedirs(workspace_dir, exist_ok=True)
+    return workspace_dir
@@ -0,0 +1,242 @@
+"""
+Worker process: claims dub jobs from the shared job queue and runs them, separately from the HTTP app.
+
+Jobs are queued by the /enqueue endpoint. A claimed job is leased to the worker, which renews the lease
+while the job runs. If the worker dies, the lease expires and another worker claims the job again.
+
+Run like the app:
+    python3 src/worker.py
+"""
+import os
+import signal
+import socket
+import threading
+
+from configs.env import JOB_HEARTBEAT_INTERVAL, WORKER_POLL_INTERVAL, WORKER_CONCURRENCY, WARM_UP_MODELS
+from configs.logger import log_context, print_info_log
+from constants.log_tags import LogTag
+from constants.ml_models import MlModel
+from models.dub_job import DubJob
+from services.job_queue.get_job_queue import get_job_queue
+from services.job_queue.job_queue import JobQueue, LeaseLostError
+from services.ml_models.model_registry import warm_up_models
+from services.scheduling.admission_controller import JobRejectedError
+from services.scheduling.job_cancellation import (
+    cancellable_job, cancel_job_token, CancellationToken, JobCancelledError
+)
+from services.scheduling.job_deduplication import deduplicate_job
+from services.sentry.init_sentry import init_sentry
+
+
+class LeaseHeartbeat:
+    """
+    Renews the lease of the running job every `interval` seconds in a background thread.
+    The job is cancelled once the lease is lost, its result would not be recorded anyway.
+    Only this run of the job is cancelled, another worker thread may have claimed the same job again.
+    """
+
+    def __init__(
+        self,
+        job_queue: JobQueue,
+        job_id: str,
+        worker_id: str,
+        cancellation_token: CancellationToken,
+        interval: float = JOB_HEARTBEAT_INTERVAL
+    ):
+        self.job_queue = job_queue
+        self.job_id = job_id
+        self.worker_id = worker_id
+        self.cancellation_token = cancellation_token
+        self.interval = interval
+        self.stop_event = threading.Event()
+        self.is_lease_lost = False
+        self.thread = threading.Thread(target=self.renew, daemon=True)
+
+    def renew(self):
+        while not self.stop_event.wait(self.interval):
+            try:
+                self.job_queue.renew_lease(self.job_id, self.worker_id)
+            except LeaseLostError:
+                # The job is cancelled or another worker has claimed it, its result will not be recorded by this worker
+                self.is_lease_lost = True
+                print_info_log(
+                    tag=LogTag.WORKER,
+                    message=f"Worker {self.worker_id} lost the lease of job {self.job_id}"
+                )
+                cancel_job_token(
+                    token=self.cancellation_token,
+                    reason=f"lease of job {self.job_id} is lost",
+                    show_logs=True
+                )
+                return
+            except Exception as e:
+                # Renewed on the next beat, the lease outlives a few failed beats
+                print_info_log(
+                    tag=LogTag.WORKER,
+                    message=f"Could not renew the lease of job {self.job_id}: {e}"
+                )
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        self.thread.join()
+
+
+def run_admitted_job(job: DubJob, cancellation_token: CancellationToken):
+    """
+    Runs the job through admission control and profiling, like the generate endpoint.
+    A job the node can not take now waits for resources while the worker keeps its lease,
+    a job over the node limits fails.
+    """
+    # Stage modules are imported by the first job, like in the app
+    from controllers.generate import run_dub_job
+
+    while True:
+        try:
+            return run_dub_job(
+                project_id=job.project_id,
+                target_language=job.target_language,
+                original_file_location=job.original_file_location,
+                voice_ids=job.voice_ids,
+                is_cloning=job.is_cloning,
+                num_speakers=job.num_speakers,
+                priority=job.priority
+            )
+        except JobRejectedError as e:
+            if e.status_code != 429:
+                raise
+            print_info_log(
+                tag=LogTag.WORKER,
+                message=f"Job {job.id} waits for resources of the node: {e}"
+            )
+            cancellation_token.cancelled_event.wait(e.retry_after or WORKER_POLL_INTERVAL)
+            cancellation_token.raise_if_cancelled()
+
+
+def run_job(job_queue: JobQueue, job: DubJob, worker_id: str):
+    print_info_log(
+        tag=LogTag.WORKER,
+        message=f"Worker {worker_id} runs job {job.id} of project {job.project_id}, attempt {job.attempts}"
+    )
+
+    heartbeat = None
+    error = None
+    try:
+        with (
+            log_context(job_id=job.id, worker_id=worker_id),
+            cancellable_job(project_id=job.project_id, show_logs=True) as cancellation_token
+        ):
+            heartbeat = LeaseHeartbeat(
+                job_queue=job_queue,
+                job_id=job.id,
+                worker_id=worker_id,
+                cancellation_token=cancellation_token
+            )
+            heartbeat.start()
+            # A duplicate job of a project already running in this worker shares its result
+            deduplicate_job(
+                project_id=job.project_id,
+                original_file_location=job.original_file_location,
+                job=lambda: run_admitted_job(job=job, cancellation_token=cancellation_token),
+                show_logs=True,
+                target_language=job.target_language,
+                voice_ids=job.voice_ids,
+                is_cloning=job.is_cloning,
+                num_speakers=job.num_speakers
+            )
+    except JobCancelledError as e:
+        print_info_log(
+            tag=LogTag.WORKER,
+            message=f"Worker {worker_id} stopped job {job.id}: {e}"
+        )
+        if heartbeat is None or not heartbeat.is_lease_lost:
+            # Cancelled by the user, not by losing the lease: the job is not run again
+            try:
+                job_queue.cancel(job.id)
+            except Exception as cancel_error:
+                print_info_log(
+                    tag=LogTag.WORKER,
+                    message=f"Job {job.id} could not be marked cancelled: {cancel_error}"
+                )
+        return
+    except Exception as e:
+        # The error is already logged and reported by the pipeline
+        error = str(e) or repr(e)
+    finally:
+        if heartbeat is not None:
+            heartbeat.stop()
+
+    try:
+        if error is None:
+            job_queue.complete(job.id, worker_id)
+        else:
+            job_queue.fail(job.id, worker_id, error)
+    except LeaseLostError:
+        print_info_log(
+            tag=LogTag.WORKER,
+            message=f"Job {job.id} finished after its lease was lost, the result is not recorded"
+        )
+
+
+def work(worker_id: str, stop_event: threading.Event):
+    """Claims and runs jobs one by one until `stop_event` is set."""
+    job_queue = get_job_queue()
+
+    while not stop_event.is_set():
+        try:
+            job = job_queue.claim(worker_id)
+        except Exception as e:
+            print_info_log(
+                tag=LogTag.WORKER,
+                message=f"Worker {worker_id} could not claim a job: {e}"
+            )
+            job = None
+
+        if job is None:
+            stop_event.wait(WORKER_POLL_INTERVAL)
+            continue
+
+        run_job(job_queue=job_queue, job=job, worker_id=worker_id)
+
+
+def main():
+    init_sentry()
+    warm_up_models([MlModel(model) for model in WARM_UP_MODELS], show_logs=True)
+
+    stop_event = threading.Event()
+
+    def stop(signal_number, frame):
+        # Running jobs are finished, no new jobs are claimed
+        print_info_log(
+            tag=LogTag.WORKER,
+            message="Stopping after the running jobs..."
+        )
+        stop_event.set()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    worker_id_prefix = f"{socket.gethostname()}-{os.getpid()}"
+    threads = [
+        threading.Thread(target=work, args=(f"{worker_id_prefix}-{index}", stop_event))
+        for index in range(WORKER_CONCURRENCY)
+    ]
+    for thread in threads:
+        thread.start()
+
+    print_info_log(
+        tag=LogTag.WORKER,
+        message=f"Worker {worker_id_prefix} started with {WORKER_CONCURRENCY} job threads"
+    )
+
+    # The main thread waits on the event, so signals are handled right away
+    while not stop_event.wait(1):
+        pass
+    for thread in threads:
+        thread.join()
+
+
+if __name__ == "__main__":
+    main()